@@ -0,0 +1,135 @@
+"""
+Control de admisión por clase de endpoint (load shedding).
+
+Cada endpoint pertenece a una clase (ej: 'light' para login y lecturas por id,
+'heavy' para reportes y exportaciones) y consume `weight` unidades de la
+capacidad de su clase mientras se atiende. Si la clase está llena la petición
+espera en una cola acotada hasta `timeout` segundos; si la cola también está
+llena o vence el plazo se rechaza de inmediato (503 + Retry-After) en lugar de
+acumularse y arrastrar al resto de la aplicación.
+
+Los límites se pueden cambiar en caliente con AdmissionController.configure().
+"""
+import threading
+import time
+
+
+class AdmissionClass:
+    def __init__(self, name, limit, max_queue=0, timeout=0.0, retry_after=1):
+        self.name = name
+        self.limit = limit              # Unidades de capacidad (un endpoint puede pesar más de 1)
+        self.max_queue = max_queue      # Peticiones que pueden esperar; 0 = rechazar si está lleno
+        self.timeout = timeout          # Espera máxima en cola (segundos)
+        self.retry_after = retry_after  # Segundos sugeridos al cliente en el 503
+        self.in_use = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = {'queue_full': 0, 'timeout': 0}
+        self._cond = threading.Condition()
+
+    def try_acquire(self, weight=1):
+        """
+        Retorna (admitido, motivo_de_rechazo, segundos_en_cola, peso_tomado). Al terminar se
+        llama release(peso_tomado): el límite puede cambiar mientras tanto con configure().
+        """
+        start = time.monotonic()
+        with self._cond:
+            taken = self._capped(weight)
+            if self.in_use + taken <= self.limit and not self.queued:
+                self.in_use += taken
+                self.admitted += 1
+                return True, None, 0.0, taken
+            if self.queued >= self.max_queue:
+                self.shed['queue_full'] += 1
+                return False, 'queue_full', 0.0, 0
+
+            self.queued += 1
+            deadline = start + self.timeout
+            try:
+                while self.in_use + self._capped(weight) > self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed['timeout'] += 1
+                        return False, 'timeout', time.monotonic() - start, 0
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+            taken = self._capped(weight)
+            self.in_use += taken
+            self.admitted += 1
+            return True, None, time.monotonic() - start, taken
+
+    def release(self, taken):
+        """Devuelve exactamente el peso que retornó try_acquire()."""
+        with self._cond:
+            self.in_use -= taken
+            self._cond.notify_all()
+
+    def configure(self, limit=None, max_queue=None, timeout=None, retry_after=None):
+        with self._cond:
+            if limit is not None:
+                self.limit = int(limit)
+            if max_queue is not None:
+                self.max_queue = int(max_queue)
+            if timeout is not None:
+                self.timeout = float(timeout)
+            if retry_after is not None:
+                self.retry_after = int(retry_after)
+            # Con un límite mayor pueden entrar peticiones que ya esperan
+            self._cond.notify_all()
+
+    def _capped(self, weight):
+        # Un peso mayor que el límite nunca cabría: se acota para que el endpoint siga siendo usable
+        return min(weight, max(1, self.limit))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'max_queue': self.max_queue,
+                'timeout': self.timeout,
+                'retry_after': self.retry_after,
+                'in_use': self.in_use,
+                'queued': self.queued,
+                'admitted': self.admitted,
+                'shed_queue_full': self.shed['queue_full'],
+                'shed_timeout': self.shed['timeout'],
+            }
+
+
+class AdmissionController:
+    """
+    endpoints: {endpoint: (clase, peso)}. Los endpoints no listados usan `default_class`
+    con peso 1; los de `exempt` (métricas, salud) no pasan por admisión.
+    """
+
+    def __init__(self, classes, endpoints, default_class='default', exempt=(), enabled=True):
+        self.classes = {cls.name: cls for cls in classes}
+        self.endpoints = dict(endpoints)
+        self.default_class = default_class
+        self.exempt = set(exempt)
+        self.enabled = enabled
+
+    def lookup(self, endpoint):
+        """Retorna (AdmissionClass, peso) o None si el endpoint no pasa por admisión."""
+        if not self.enabled or endpoint is None or endpoint in self.exempt:
+            return None
+        name, weight = self.endpoints.get(endpoint, (self.default_class, 1))
+        return self.classes[name], weight
+
+    def configure(self, settings):
+        """settings: {clase: {limit, max_queue, timeout, retry_after}}. Lanza KeyError/ValueError."""
+        for name in settings:
+            if name not in self.classes:
+                raise KeyError(name)
+        for name, values in settings.items():
+            self.classes[name].configure(**{k: values[k] for k in
+                                            ('limit', 'max_queue', 'timeout', 'retry_after') if k in values})
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'classes': {name: cls.stats() for name, cls in self.classes.items()},
+            'endpoints': {endpoint: {'class': name, 'weight': weight}
+                          for endpoint, (name, weight) in sorted(self.endpoints.items())},
+        }
@@ -1,51 +1,343 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash
-import mysql.connector
+from flask import Flask, Response, request, jsonify, render_template, send_file, session, redirect, url_for, flash, g, has_app_context
 from mysql.connector import Error
+from werkzeug.datastructures import ContentRange
+from werkzeug.exceptions import HTTPException
 import os
 from flasgger import Swagger
+from dotenv import load_dotenv
 import datetime
+import decimal
+import base64
+import contextvars
+import csv
+import io
+import json
+import hashlib
+import re
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+from admission import AdmissionClass, AdmissionController
+from change_feed import ChangeFeed, settled
+from circuit_breaker import CircuitBreaker
+from db_pool import ConnectionPool, PoolTimeout, is_connection_error
+import metrics
+import batch_ops
+import document_store
+import importer
+from image_variants import VARIANTS as IMAGE_VARIANTS, ImagePipeline, VariantCache
+from json_provider import FastJSONProvider
+from openapi_spec import StaleSpecError, check_spec, export_spec, load_spec, precompile_templates, precompiled_swagger_config
+from query_cache import MemoryCacheBackend, QueryCache, RedisCacheBackend, make_key
+from replicas import Replica, ReplicaRouter
+from rowset import RowSet
+from social_queue import NETWORKS, HttpSocialClient, MockSocialClient, PublishQueue
+
+load_dotenv()  # Variables de un archivo .env (ver .env.example); las del entorno tienen prioridad
+
+APP_ENV = os.getenv('APP_ENV', 'development')
 
 app = Flask(__name__)
-app.secret_key = 'SUPER_SECRET_KEY_CAMBIAR_EN_PROD' # Necesario para sesiones
-swagger = Swagger(app, template={
+app.json = FastJSONProvider(app)
+app.json.decimal_as = os.getenv('JSON_DECIMAL_AS', 'string')
+app.json.date_format = os.getenv('JSON_DATE_FORMAT', 'http')
+app.json.stream_threshold = int(os.getenv('JSON_STREAM_THRESHOLD', 5000))
+app.secret_key = os.getenv('SECRET_KEY') # Necesario para sesiones
+if not app.secret_key:
+    if APP_ENV == 'production':
+        raise RuntimeError("SECRET_KEY es obligatorio con APP_ENV=production")
+    app.secret_key = 'SUPER_SECRET_KEY_CAMBIAR_EN_PROD'
+
+# Spec OpenAPI: en producción (OPENAPI_PRECOMPILED=1) se sirve el artefacto generado con
+# `flask --app app export-openapi` y flasgger no parsea los docstrings
+OPENAPI_SPEC_FILE = os.getenv('OPENAPI_SPEC_FILE', os.path.join(app.root_path, 'openapi.json'))
+OPENAPI_PRECOMPILED = os.getenv('OPENAPI_PRECOMPILED', '0') == '1'
+SWAGGER_TEMPLATE = {
     "info": {
         "title": "API Inmobiliaria Atiqa",
         "description": "API para gestión de propiedades, ventas y agentes.",
         "version": "1.0.0"
     }
-})
+}
+if OPENAPI_PRECOMPILED:
+    openapi_spec = load_spec(OPENAPI_SPEC_FILE)
+    swagger = Swagger(app, template=openapi_spec, config=precompiled_swagger_config(Swagger.DEFAULT_CONFIG))
+else:
+    openapi_spec = None
+    swagger = Swagger(app, template=SWAGGER_TEMPLATE)
 
-# Configuración de la Base de Datos
-# En producción, usa variables de entorno (os.getenv)
+# Plantillas compiladas al arrancar, con caché de bytecode compartido entre workers
+JINJA_PRECOMPILE = os.getenv('JINJA_PRECOMPILE', '0') == '1'
+JINJA_CACHE_DIR = os.getenv('JINJA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'atiqa-jinja'))
+
+# Configuración de la Base de Datos (variables de entorno o .env)
 DB_CONFIG = {
-    'host': 'localhost',
-    'user': 'root',
-    'password': 'root', 
-    'database': 'arteca'
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', 'root'),
+    'database': os.getenv('DB_NAME', 'arteca'),
+    # Timeouts explícitos: un servidor caído o colgado no debe bloquear un hilo indefinidamente
+    'connection_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 3)),
+    'read_timeout': int(os.getenv('DB_READ_TIMEOUT', 30)),
+    'write_timeout': int(os.getenv('DB_WRITE_TIMEOUT', 30)),
 }
 
-def get_db_connection():
-    """Crea y retorna una conexión a la base de datos."""
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
+# Pool de conexiones (una conexión por petición Flask, compartida por todos los helpers)
+# Es por proceso: con varios workers cada uno tiene el suyo, dimensionado según sus hilos (WEB_THREADS)
+POOL_CONFIG = {
+    'size': int(os.getenv('DB_POOL_SIZE', os.getenv('WEB_THREADS', 5))),
+    'max_overflow': int(os.getenv('DB_POOL_MAX_OVERFLOW', 10)),
+    'recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    'pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1',
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+    'max_prepared': int(os.getenv('DB_POOL_MAX_PREPARED', 64)),
+}
+db_pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+# Si el servidor hace fork después de importar la app (preload), el hijo no debe usar los sockets del padre
+os.register_at_fork(after_in_child=db_pool.reset_after_fork)
+
+# Réplicas de lectura: DB_REPLICAS=host1:3306,host2:3306 (mismo usuario/BD que el primario salvo
+# DB_REPLICA_USER/DB_REPLICA_PASSWORD). Sin réplicas todas las consultas van al primario.
+def replica_config(address):
+    host, _, port = address.strip().partition(':')
+    return {**DB_CONFIG, 'host': host, 'port': int(port or 3306),
+            'user': os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+            'password': os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password'])}
+
+REPLICA_POOL_CONFIG = {**POOL_CONFIG, 'size': int(os.getenv('DB_REPLICA_POOL_SIZE', POOL_CONFIG['size']))}
+replica_router = ReplicaRouter(
+    [Replica(address.strip(), ConnectionPool(replica_config(address), **REPLICA_POOL_CONFIG))
+     for address in os.getenv('DB_REPLICAS', '').split(',') if address.strip()],
+    max_lag=float(os.getenv('DB_REPLICA_MAX_LAG', 5)),
+    check_interval=float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 1)),
+)
+os.register_at_fork(after_in_child=replica_router.reset_after_fork)
+
+# Read-your-writes: GTID set del primario tras la última escritura que las lecturas deben ver.
+# Se toma de la sesión (o del header X-Consistency-Token para clientes de la API) al iniciar
+# la petición. Tras una escritura vale '' (no verificable: el resto de la petición lee en el
+# primario) y al responder se guarda el gtid_executed del primario.
+read_after = contextvars.ContextVar('read_after', default=None)
+CONSISTENCY_HEADER = 'X-Consistency-Token'
+
+# Procedimientos sin escrituras: pueden ir a una réplica. Cualquier otro se trata como escritura.
+READ_ONLY_PROCEDURES = {
+    'sp_User_List', 'sp_Property_List', 'sp_Property_Version', 'sp_Property_Detail',
+    'sp_Property_Search', 'sp_Report_Sales', 'sp_Report_SalesRollup', 'sp_Dashboard_Summary',
+    'sp_Sync_Snapshot',
+}
+
+# Circuit breaker: tras N fallos de conexión seguidos se deja de intentar conectar por un tiempo
+db_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('DB_BREAKER_THRESHOLD', 5)),
+    reset_timeout=float(os.getenv('DB_BREAKER_RESET', 10)),
+    on_change=lambda old, new: metrics.db_circuit_transitions.inc(new),
+)
+
+# Caché de lectura para datos de referencia (usuarios, clientes, nombres de agente/propietario)
+# CACHE_URL=redis://... activa el backend compartido entre workers
+# Con el circuito abierto las lecturas cacheadas se sirven aunque hayan vencido (CACHE_STALE_TTL)
+CACHE_URL = os.getenv('CACHE_URL')
+CACHE_STALE_TTL = int(os.getenv('CACHE_STALE_TTL', 3600))
+query_cache = QueryCache(
+    RedisCacheBackend(CACHE_URL, stale_ttl=CACHE_STALE_TTL) if CACHE_URL
+    else MemoryCacheBackend(int(os.getenv('CACHE_MAX_BYTES', 64 * 1024 * 1024)), stale_ttl=CACHE_STALE_TTL),
+    enabled=os.getenv('CACHE_ENABLED', '1') == '1',
+    serve_stale=db_breaker.is_open,
+)
+CACHE_TTL_REFERENCE = int(os.getenv('CACHE_TTL_REFERENCE', 300))
+CACHE_TTL_DASHBOARD = int(os.getenv('CACHE_TTL_DASHBOARD', 5))
+
+# Consultas más lentas que este umbral se registran en el log 'atiqa.slow_query'
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', 500)) / 1000
+
+def get_db_connection(readonly=False):
+    """
+    Retorna una conexión del pool.
+    Dentro de una petición se reutiliza la misma conexión (flask.g) para todas las consultas.
+    Con readonly=True puede ser de una réplica al día (ver replica_router); si ninguna sirve
+    se usa la del primario.
+    """
+    if readonly and replica_router.enabled and not in_atomic_batch():
+        conn = get_replica_connection()
+        if conn is not None:
             return conn
+    if has_app_context() and 'db_conn' in g:
+        return g.db_conn
+    if not db_breaker.allow():
+        # Circuito abierto: fallar al instante en lugar de esperar el timeout de conexión
+        metrics.db_circuit_rejections.inc()
+        return None
+    start = time.perf_counter()
+    try:
+        conn = db_pool.acquire()
+    except PoolTimeout as e:
+        # Pool agotado: es carga, no una caída de la base de datos
+        db_breaker.record_neutral()
+        app.logger.warning("Pool de MySQL agotado: %s", e)
+        return None
+    except Error as e:
+        db_breaker.record_failure(e)
+        app.logger.exception("Error conectando a MySQL: %s", e)
+        return None
+    finally:
+        metrics.db_connection_acquire.observe(time.perf_counter() - start)
+    if has_app_context():
+        g.db_conn = conn
+    return conn
+
+def get_replica_connection():
+    """
+    Conexión de réplica para una lectura, reutilizada durante la petición mientras la réplica
+    siga al día para el token de consistencia. Retorna None para leer en el primario.
+    """
+    floor = read_after.get()
+    current = g.get('db_replica') if has_app_context() else None
+    if current is not None:
+        if replica_router.eligible(replica_router.owner(current), floor):
+            return current
+        # La réplica quedó atrasada o la petición escribió: se devuelve y se elige otra
+        replica_router.release(g.pop('db_replica'))
+    conn = acquire_replica_connection(floor)
+    if conn is not None and has_app_context():
+        g.db_replica = conn
+    return conn
+
+def acquire_replica_connection(floor):
+    """Toma una conexión de una réplica que haya aplicado las escrituras hasta `floor`, o None."""
+    replica, _ = replica_router.choose(floor)
+    if replica is None:
+        return None
+    start = time.perf_counter()
+    try:
+        return replica_router.acquire(replica)
+    except PoolTimeout:
+        return None
     except Error as e:
-        print(f"Error conectando a MySQL: {e}")
-    return None
+        # Réplica caída: sale de la rotación y la lectura va al primario
+        replica_router.mark_failed(replica, e)
+        app.logger.warning("Error conectando a la réplica %s: %s", replica.name, e)
+        return None
+    finally:
+        metrics.db_connection_acquire.observe(time.perf_counter() - start)
+
+def release_db_connection(conn):
+    """Devuelve la conexión a su pool, salvo las de la petición actual (se liberan en teardown)."""
+    if has_app_context() and (g.get('db_conn') is conn or g.get('db_replica') is conn):
+        return
+    if replica_router.owner(conn) is not None:
+        replica_router.release(conn)
+    else:
+        db_pool.release(conn)
+
+def pool_for(conn):
+    """Pool al que pertenece la conexión (primario o réplica)."""
+    replica = replica_router.owner(conn)
+    return replica.pool if replica is not None else db_pool
+
+def note_db_error(e, conn=None):
+    """
+    Informa un error al circuit breaker: los de red (conexión perdida, timeout de lectura)
+    cuentan como fallo; un error de SQL prueba que el servidor responde.
+    Los errores de red de una réplica la sacan de la rotación sin tocar el circuito del primario.
+    """
+    replica = replica_router.owner(conn) if conn is not None else None
+    if replica is not None:
+        if is_connection_error(e):
+            replica_router.mark_failed(replica, e)
+    elif isinstance(e, PoolTimeout):
+        db_breaker.record_neutral()
+    elif is_connection_error(e):
+        db_breaker.record_failure(e)
+    else:
+        db_breaker.record_success()
 
-def execute_procedure(proc_name, args=()):
+def note_db_success(conn):
+    """Una consulta completada (no solo un ping) confirma que el primario responde."""
+    if replica_router.owner(conn) is None:
+        db_breaker.record_success()
+
+def note_write():
+    """
+    Registra una escritura: las lecturas siguientes de la petición van al primario y al
+    responder la sesión recibe el GTID set que las réplicas deben tener (save_consistency_token).
+    """
+    read_after.set('')
+    if has_app_context():
+        g.db_written = True
+
+def is_read_statement(sql):
+    """SELECT/WITH/SHOW sin bloqueo (FOR UPDATE/SHARE): se puede ejecutar en una réplica."""
+    return READ_STATEMENT.match(sql) is not None and LOCKING_READ.search(sql) is None
+
+READ_STATEMENT = re.compile(r'\s*(SELECT|WITH|SHOW)\b', re.IGNORECASE)
+LOCKING_READ = re.compile(r'\b(FOR\s+UPDATE|FOR\s+SHARE|LOCK\s+IN\s+SHARE\s+MODE)\b', re.IGNORECASE)
+
+def in_atomic_batch():
+    """True dentro de un /api/batch atómico: todas las operaciones comparten una transacción."""
+    return has_app_context() and g.get('db_atomic', False)
+
+def commit_unless_atomic(conn):
+    # En un batch atómico el commit (o rollback) lo hace batch_operations al terminar
+    if not in_atomic_batch():
+        conn.commit()
+
+def invalidate_cache(*tags):
+    """
+    Invalida etiquetas del caché de consultas. En un batch atómico se difiere hasta que el batch
+    confirma: invalidar antes dejaría que otra petición guarde la fila vieja (todavía confirmada)
+    con una generación nueva y se sirva hasta su TTL.
+    """
+    if in_atomic_batch():
+        g.cache_tags_pending.update(tags)
+    else:
+        query_cache.invalidate(*tags)
+
+def rollback_quietly(conn):
+    """Descarta cambios a medias para no dejarlos en la conexión compartida de la petición."""
+    try:
+        conn.rollback()
+    except Error:
+        pass
+
+@app.teardown_appcontext
+def close_db_connection(exc):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+    conn = g.pop('db_replica', None)
+    if conn is not None:
+        replica_router.release(conn)
+
+def execute_procedure(proc_name, args=(), all_results=False, cache_ttl=None, cache_tags=(), primary=False):
     """
     Helper para ejecutar procedimientos almacenados.
     Maneja tanto consultas (SELECT) como acciones (INSERT/DELETE).
+    Con all_results=True retorna la lista de todos los result sets del SP.
+    Con cache_ttl (segundos) el resultado se lee/guarda en query_cache bajo las etiquetas cache_tags.
+    Los SP de READ_ONLY_PROCEDURES pueden leerse en una réplica (salvo primary=True);
+    el resto va al primario y cuenta como escritura para read-your-writes.
     """
-    conn = get_db_connection()
+    if cache_ttl and not in_atomic_batch():
+        # La caché se llena desde el primario: una réplica atrasada dejaría guardado
+        # durante todo el TTL un dato que una escritura acaba de invalidar
+        # (en un batch atómico no se usa: guardaría datos sin confirmar que un rollback descarta)
+        return query_cache.fetch(
+            make_key('proc', proc_name, args),
+            lambda: execute_procedure(proc_name, args, all_results, primary=True),
+            cache_ttl, cache_tags)
+
+    read_only = proc_name in READ_ONLY_PROCEDURES
+    conn = get_db_connection(readonly=read_only and not primary)
     if conn is None:
         return None, "No se pudo conectar a la base de datos"
     
     cursor = conn.cursor(dictionary=True)
     result = None
     error = None
+    start = time.perf_counter()
     
     try:
         # callproc retorna los argumentos modificados, no el resultado directo
@@ -54,50 +346,487 @@ def execute_procedure(proc_name, args=()):
         # Iterar sobre los resultados almacenados (para SELECTs dentro de SPs)
         stored_results = list(cursor.stored_results())
         
-        if stored_results:
+        if stored_results and all_results:
+            # SPs con varios SELECT (ej: sp_Property_Search)
+            result = [res.fetchall() for res in stored_results]
+        elif stored_results:
             # Si el SP devuelve datos (ej: sp_User_List), los tomamos
             result = stored_results[0].fetchall()
         else:
             # Si no devuelve datos (ej: sp_User_Create), hacemos commit
-            conn.commit()
+            commit_unless_atomic(conn)
             result = {"message": "Operación realizada con éxito"}
             
     except Error as e:
         error = str(e)
+        note_db_error(e, conn)
+        rollback_quietly(conn)
+    else:
+        note_db_success(conn)
+        if not read_only:
+            note_write()
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+        metrics.observe_db('procedure', proc_name, time.perf_counter() - start, count_rows(result),
+                           error, SLOW_QUERY_SECONDS, args)
         
     return result, error
 
-def execute_query(query, params=(), commit=False):
+def execute_query(query, params=(), commit=False, cache_ttl=None, cache_tags=(), prepared=False, rowset=False,
+                  primary=False):
     """
     Helper para ejecutar consultas SQL directas (cuando no hay SP).
     Útil para operaciones CRUD simples que no requieren lógica compleja de BD.
+    Con cache_ttl (segundos) las lecturas pasan por query_cache (ver execute_procedure).
+    Con prepared=True la sentencia se prepara una vez por conexión del pool y se reejecuta
+    con el protocolo binario (para sentencias calientes con parámetros).
+    Con rowset=True las lecturas retornan un RowSet (tuplas + columnas) en lugar de dicts.
+    Las lecturas sin bloqueo pueden ir a una réplica (salvo primary=True); con commit=True
+    la consulta va al primario y cuenta como escritura para read-your-writes.
     """
-    conn = get_db_connection()
+    if cache_ttl and not commit and not in_atomic_batch():
+        # Se llena desde el primario (ver execute_procedure)
+        return query_cache.fetch(
+            make_key('rowset' if rowset else 'query', query, params),
+            lambda: execute_query(query, params, prepared=prepared, rowset=rowset, primary=True),
+            cache_ttl, cache_tags)
+
+    conn = get_db_connection(readonly=not commit and not primary and is_read_statement(query))
     if conn is None:
         return None, "No se pudo conectar a la base de datos"
     
-    cursor = conn.cursor(dictionary=True)
+    if prepared:
+        cursor = pool_for(conn).prepared(conn, query)
+    else:
+        cursor = conn.cursor(dictionary=not rowset)
     result = None
     error = None
+    start = time.perf_counter()
     
     try:
         cursor.execute(query, params)
         if commit:
-            conn.commit()
+            commit_unless_atomic(conn)
             result = {"affected_rows": cursor.rowcount, "last_id": cursor.lastrowid}
+        elif prepared or rowset:
+            result = RowSet(cursor.column_names, cursor.fetchall())
+            if not rowset:
+                result = result.records()
         else:
             result = cursor.fetchall()
     except Error as e:
         error = str(e)
+        note_db_error(e, conn)
+        rollback_quietly(conn)
+        if prepared:
+            pool_for(conn).discard_prepared(conn, query)
+    else:
+        note_db_success(conn)
+        if commit:
+            note_write()
+    finally:
+        if not prepared:
+            # Los cursores preparados pertenecen al registro de la conexión
+            cursor.close()
+        release_db_connection(conn)
+        metrics.observe_db('query', metrics.fingerprint(query), time.perf_counter() - start,
+                           None if commit else count_rows(result), error, SLOW_QUERY_SECONDS, params)
+        
+    return result, error
+
+def execute_many(query, rows):
+    """
+    Helper para inserciones masivas: un solo executemany y un commit para todas las filas.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        return None, "No se pudo conectar a la base de datos"
+    
+    cursor = conn.cursor()
+    result = None
+    error = None
+    start = time.perf_counter()
+    
+    try:
+        cursor.executemany(query, rows)
+        commit_unless_atomic(conn)
+        result = {"affected_rows": cursor.rowcount}
+    except Error as e:
+        error = str(e)
+        note_db_error(e, conn)
+        rollback_quietly(conn)
+    else:
+        note_db_success(conn)
+        note_write()
     finally:
         cursor.close()
-        conn.close()
+        release_db_connection(conn)
+        metrics.observe_db('many', metrics.fingerprint(query), time.perf_counter() - start,
+                           None, error, SLOW_QUERY_SECONDS)
         
     return result, error
 
+def count_rows(result):
+    """Filas de un resultado de los helpers (lista de filas, RowSet o lista de result sets)."""
+    if isinstance(result, RowSet):
+        return len(result)
+    if not isinstance(result, list):
+        return None
+    return sum(len(r) if isinstance(r, list) else 1 for r in result)
+
+# ==========================================
+# MÉTRICAS POR PETICIÓN
+# ==========================================
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        endpoint = request.endpoint or 'not_found'
+        metrics.http_request_duration.observe(
+            time.perf_counter() - start, endpoint, request.method, str(response.status_code))
+        if not response.is_streamed and response.content_length is not None:
+            metrics.http_response_bytes.observe(response.content_length, endpoint)
+    return response
+
+# ==========================================
+# CONSISTENCIA DE LECTURA (Read-your-writes con réplicas)
+# ==========================================
+
+CONSISTENCY_TOKEN = re.compile(r'[0-9A-Za-z_:,\-]{0,4096}')
+
+def parse_consistency_token(value):
+    """GTID set de un token de sesión/header. Uno con otros caracteres se ignora; '' obliga a leer en el primario."""
+    if value is None:
+        return None
+    value = re.sub(r'\s+', '', value)
+    return value if CONSISTENCY_TOKEN.fullmatch(value) else None
+
+@app.before_request
+def load_consistency_token():
+    # La réplica debe tener las escrituras de esta sesión (cookie) y del cliente de la API (header)
+    tokens = [parse_consistency_token(session.get('db_gtid')),
+              parse_consistency_token(request.headers.get(CONSISTENCY_HEADER))]
+    tokens = [t for t in tokens if t is not None]
+    read_after.set(None if not tokens else '' if '' in tokens else ','.join(tokens))
+
+@app.after_request
+def save_consistency_token(response):
+    if g.pop('db_written', False):
+        # Incluye la transacción de esta petición (ya confirmada) y quizás otras: basta que esté
+        data, error = execute_query("SELECT @@GLOBAL.gtid_executed AS gtid", primary=True)
+        # Sin GTID (gtid_mode=OFF o error) el token queda vacío y esta sesión lee en el primario
+        token = re.sub(r'\s+', '', data[0]['gtid'] or '') if not error and data else ''
+        session['db_gtid'] = token
+        response.headers[CONSISTENCY_HEADER] = token
+    return response
+
+@app.teardown_request
+def clear_consistency_token(exc):
+    # El hilo atiende otras peticiones: no heredar el token de esta
+    # (las operaciones de un /api/batch siguen dentro de la petición del batch)
+    if not is_batch_operation():
+        read_after.set(None)
+
+# ==========================================
+# CONTROL DE ADMISIÓN (Load shedding por clase de endpoint)
+# ==========================================
+
+def admission_class(name, limit, max_queue, timeout, retry_after):
+    """Clase con valores por defecto sobreescribibles vía ADMISSION_<CLASE>_{LIMIT,QUEUE,TIMEOUT,RETRY_AFTER}."""
+    prefix = f'ADMISSION_{name.upper()}_'
+    return AdmissionClass(
+        name,
+        limit=int(os.getenv(prefix + 'LIMIT', limit)),
+        max_queue=int(os.getenv(prefix + 'QUEUE', max_queue)),
+        timeout=float(os.getenv(prefix + 'TIMEOUT', timeout)),
+        retry_after=int(os.getenv(prefix + 'RETRY_AFTER', retry_after)),
+    )
+
+# Límites por proceso (con varios workers la capacidad total es límite x WEB_CONCURRENCY).
+# 'light': búsquedas por id y login, nunca deben esperar detrás de un reporte.
+# 'heavy': reportes, exportaciones e importaciones; el peso indica cuántas unidades consume.
+# Se derivan de los hilos del worker (WEB_THREADS): un límite mayor que los hilos no limita nada
+# y la petición espera en la cola de accept de gunicorn, donde nunca se descarta. Las peticiones
+# en la cola de una clase también ocupan un hilo, por eso las colas son cortas.
+WEB_THREADS = int(os.getenv('WEB_THREADS', 4))
+ADMISSION_ENDPOINTS = {
+    'login': ('light', 1),
+    'login_view': ('light', 1),
+    'logout': ('light', 1),
+    'index': ('light', 1),
+    'manage_property': ('light', 1),
+    'manage_client': ('light', 1),
+    'manage_user': ('light', 1),
+    'get_contract_data': ('light', 1),
+    'social_job_status': ('light', 1),
+    'dashboard_summary': ('light', 1),
+    'dashboard_view': ('light', 1),
+    'report_sales': ('heavy', 1),
+    'sales_view': ('heavy', 1),
+    'export_data': ('heavy', 2),
+    'bulk_import': ('heavy', 2),
+    'bulk_approve_sales': ('heavy', 1),
+    'batch_operations': ('default', 2),
+    'dashboard_reconcile': ('heavy', 2),
+    'event_stream': ('stream', 1),
+}
+# Cada suscriptor SSE ocupa un hilo del worker gthread hasta que se desconecta: por defecto se
+# reserva la mitad de los hilos. Con WORKER_CLASS=gevent son greenlets y el límite puede ser alto.
+if os.getenv('WORKER_CLASS') in ('gevent', 'eventlet'):
+    SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', 1000))
+else:
+    SSE_MAX_SUBSCRIBERS = int(os.getenv('SSE_MAX_SUBSCRIBERS', max(1, WEB_THREADS // 2)))
+# Con 4 hilos: heavy 1 (+1 en cola) deja siempre 2 hilos libres; default 3 deja uno para light
+HEAVY_LIMIT = max(1, WEB_THREADS // 4)
+admission = AdmissionController(
+    [
+        admission_class('light', limit=WEB_THREADS, max_queue=WEB_THREADS, timeout=2, retry_after=1),
+        admission_class('default', limit=max(1, WEB_THREADS - 1), max_queue=max(1, WEB_THREADS // 2),
+                        timeout=5, retry_after=2),
+        admission_class('heavy', limit=HEAVY_LIMIT, max_queue=HEAVY_LIMIT, timeout=10, retry_after=10),
+        admission_class('stream', limit=SSE_MAX_SUBSCRIBERS, max_queue=0, timeout=0, retry_after=5),
+    ],
+    ADMISSION_ENDPOINTS,
+    exempt=('static', 'metrics_endpoint', 'health', 'pool_stats', 'cache_stats', 'admission_settings',
+            'replica_stats'),
+    enabled=os.getenv('ADMISSION_ENABLED', '1') == '1',
+)
+
+@app.before_request
+def admit_request():
+    entry = admission.lookup(request.endpoint)
+    if entry is None:
+        return None
+    cls, weight = entry
+    admitted, reason, waited, taken = cls.try_acquire(weight)
+    metrics.admission_wait.observe(waited, cls.name)
+    if not admitted:
+        metrics.admission_shed.inc(cls.name, reason)
+        response = jsonify({"error": "Servidor ocupado, reintente más tarde", "class": cls.name, "reason": reason})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(cls.retry_after)
+        return response
+
+    # Se libera el peso tomado, no el del endpoint acotado al límite actual (puede haber cambiado)
+    g.admission_weight = taken
+    released = []
+    def release():
+        if not released:
+            released.append(True)
+            cls.release(taken)
+    g.admission_release = release
+
+@app.after_request
+def defer_admission_release(response):
+    # Las respuestas en streaming (exportaciones) conservan el cupo hasta terminar de enviarse
+    release = g.pop('admission_release', None)
+    if release is not None:
+        response.call_on_close(release)
+    return response
+
+@app.teardown_request
+def release_admission(exc):
+    # Si la petición falló antes de after_request, el cupo se libera aquí
+    if is_batch_operation():
+        return  # g es el del batch: su cupo se libera al terminar el batch
+    release = g.pop('admission_release', None)
+    if release is not None:
+        release()
+
+# ==========================================
+# PAGINACIÓN (Cursor keyset sobre createdAt, id)
+# ==========================================
+
+PAGE_DEFAULT_LIMIT = 50
+PAGE_MAX_LIMIT = 200
+
+def encode_cursor(created_at, row_id):
+    """Cursor opaco para el cliente: base64 de 'createdAt|id' de la última fila entregada."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Retorna (createdAt, id). Lanza ValueError si el cursor fue alterado."""
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+    created_at, row_id = raw.split('|')
+    return datetime.datetime.fromisoformat(created_at), int(row_id)
+
+def parse_property_filters(args):
+    """Filtros opcionales del listado de propiedades tomados de la query string."""
+    exclusive = args.get('exclusive')
+    return {
+        'status': args.get('status') or None,
+        'agentId': args.get('agentId', type=int),
+        'city': args.get('city') or None,
+        'operation': args.get('operation') or None,
+        'minPrice': args.get('minPrice', type=float),
+        'maxPrice': args.get('maxPrice', type=float),
+        'exclusive': None if not exclusive else int(exclusive.lower() in ('1', 'true')),
+    }
+
+def fetch_property_page(filters, viewer_role, viewer_id, cursor=None, limit=PAGE_DEFAULT_LIMIT):
+    """
+    Obtiene una página del inventario vía sp_Property_List.
+    Retorna (filas, cursor_siguiente, error). Lanza ValueError si el cursor es inválido.
+    """
+    after_created, after_id = decode_cursor(cursor) if cursor else (None, None)
+    limit = max(1, min(limit or PAGE_DEFAULT_LIMIT, PAGE_MAX_LIMIT))
+    args = (
+        filters['status'], filters['agentId'], viewer_role, viewer_id,
+        filters['city'], filters['operation'], filters['minPrice'], filters['maxPrice'], filters['exclusive'],
+        after_created, after_id, limit + 1  # Pedimos una fila extra para saber si hay página siguiente
+    )
+    data, error = execute_procedure('sp_Property_List', args)
+    if error: return None, None, error
+
+    next_cursor = None
+    if len(data) > limit:
+        data = data[:limit]
+        next_cursor = encode_cursor(data[-1]['createdAt'], data[-1]['id'])
+    return add_photo_variants(data), next_cursor, None
+
+# ==========================================
+# DASHBOARD (Contadores materializados)
+# ==========================================
+
+def empty_dashboard_stats():
+    return {
+        'inventory_status': [],
+        'active_agents': 0,
+        'monthly_sales': {'total_income': 0, 'sales_count': 0},
+        'pending_approvals': 0,
+    }
+
+def get_dashboard_stats():
+    """
+    Lee los contadores del Dashboard desde DashboardCounters (mantenidos por triggers).
+    Retorna (stats, error) con la misma forma que las antiguas consultas agregadas.
+    """
+    # TTL corto: absorbe ráfagas de la home y permite mostrar datos recientes si la BD cae
+    rows, error = execute_procedure('sp_Dashboard_Summary', cache_ttl=CACHE_TTL_DASHBOARD, cache_tags=('dashboard',))
+    if error: return None, error
+
+    stats = empty_dashboard_stats()
+    for row in rows:
+        name, value = row['name'], row['value']
+        if name.startswith('properties:'):
+            if value > 0:
+                stats['inventory_status'].append({'status': name.split(':', 1)[1], 'count': int(value)})
+        elif name == 'users:active':
+            stats['active_agents'] = int(value)
+        elif name == 'sales:pending':
+            stats['pending_approvals'] = int(value)
+        elif name.startswith('sales:count:'):
+            stats['monthly_sales']['sales_count'] = int(value)
+        elif name.startswith('sales:income:'):
+            stats['monthly_sales']['total_income'] = value
+    return stats, None
+
+# ==========================================
+# BÚSQUEDA FULL-TEXT Y FACETAS
+# ==========================================
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_FACETS = ('city', 'operation', 'status', 'currency', 'priceBucket')
+
+def build_fulltext_query(text):
+    """
+    Convierte el texto libre en una consulta BOOLEAN MODE: todas las palabras obligatorias
+    y con prefijo ('casa play' -> '+casa* +play*'). Se descartan los operadores del usuario.
+    """
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'+{word}*' for word in words)
+
+def search_properties(text, filters, viewer_role, viewer_id, limit=SEARCH_DEFAULT_LIMIT, offset=0):
+    """
+    Ejecuta sp_Property_Search. Retorna ({items, total, facets}, error).
+    Las facetas se suman en Python desde los conteos combinados que devuelve el SP.
+    """
+    limit = max(1, min(limit or SEARCH_DEFAULT_LIMIT, SEARCH_MAX_LIMIT))
+    args = (
+        build_fulltext_query(text), filters['status'], filters['city'], filters['operation'],
+        filters['currency'], filters['minPrice'], filters['maxPrice'],
+        viewer_role, viewer_id, limit, max(0, offset or 0)
+    )
+    results, error = execute_procedure('sp_Property_Search', args, all_results=True)
+    if error: return None, error
+
+    items, combos = results
+    facets = {name: {} for name in SEARCH_FACETS}
+    for combo in combos:
+        for name in SEARCH_FACETS:
+            facets[name][combo[name]] = facets[name].get(combo[name], 0) + combo['count']
+    return {
+        'items': add_photo_variants(items),
+        'total': sum(combo['count'] for combo in combos),
+        'facets': {
+            name: sorted(({'value': value, 'count': count} for value, count in counts.items()),
+                         key=lambda f: -f['count'])
+            for name, counts in facets.items()
+        },
+    }, None
+
+# ==========================================
+# DETALLE DE PROPIEDAD (Una consulta + ETag)
+# ==========================================
+
+def property_etag(version):
+    """ETag derivado de fn_PropertyVersion (updatedAt + versiones de documentos, publicaciones y venta)."""
+    return hashlib.sha1(version.encode()).hexdigest()
+
+def nested_rows(text, *dates):
+    """
+    Filas armadas con JSON_OBJECT en SQL (objeto o lista). Los montos vuelven como Decimal y las
+    fechas `dates` como datetime, para que el proveedor JSON les dé el mismo formato que a las
+    columnas de la fila principal (JSON_DATE_FORMAT).
+    """
+    value = json.loads(text, parse_float=decimal.Decimal)
+    for row in value if isinstance(value, list) else [value]:
+        for field in dates:
+            if row.get(field):
+                row[field] = datetime.datetime.fromisoformat(row[field])
+    return value
+
+def fetch_property_detail(id):
+    """
+    Propiedad con fotos, documentos, publicaciones y venta en un solo round trip (sp_Property_Detail).
+    Retorna (propiedad, error); propiedad es None si no existe.
+    """
+    data, error = execute_procedure('sp_Property_Detail', (id,))
+    if error: return None, error
+    if not data: return None, None
+
+    prop = data[0]
+    prop['documents'] = nested_rows(prop['documents'], 'uploadedAt')
+    prop['socialLogs'] = nested_rows(prop['socialLogs'], 'postedAt')
+    prop['sale'] = nested_rows(prop['sale'], 'closedAt') if prop['sale'] else None
+    photos = sorted(json.loads(prop['photos']), key=lambda photo: (photo['position'], photo['id']))
+    prop['photos'] = [{**photo, 'variants': image_variant_urls(photo['sha256'])} for photo in photos]
+    prop['AgentPhotoVariants'] = photo_url_variants(prop['AgentPhoto'])
+    return prop, None
+
+# ==========================================
+# REPORTES DE VENTAS
+# ==========================================
+
+REPORT_GRANULARITIES = ('day', 'month', 'agent')
+
+def fetch_sales_report(start, end, granularity=None):
+    """
+    Sin granularidad retorna el detalle de ventas (sp_Report_Sales).
+    Con granularidad lee los totales pre-agregados de SalesDailyRollup.
+    """
+    if granularity:
+        return execute_procedure('sp_Report_SalesRollup', (start, end, granularity))
+    return execute_procedure('sp_Report_Sales', (start, end))
+
 # ==========================================
 # RUTAS DE INTERFAZ DE USUARIO (FRONTEND)
 # ==========================================
@@ -114,10 +843,10 @@ def login_view():
         email = request.form.get('email')
         password = request.form.get('password')
         sql = "SELECT id, fullName, role, photoUrl FROM Users WHERE email = %s AND password = %s AND isActive = 1"
-        user, error = execute_query(sql, (email, password))
+        user, error = execute_query(sql, (email, password), prepared=True, rowset=True)
         
         if user:
-            session['user'] = user[0]
+            session['user'] = user.first()
             return redirect(url_for('dashboard_view'))
         else:
             flash('Credenciales inválidas')
@@ -133,37 +862,35 @@ def logout():
 def dashboard_view():
     if 'user' not in session: return redirect(url_for('login_view'))
     
-    # Reutilizamos la lógica del endpoint de dashboard
-    # Nota: En un entorno real, refactorizaríamos la lógica a una función separada
-    # para no llamar a la ruta API, pero aquí duplicaré la lógica de consulta por simplicidad.
-    stats = {}
-    res_prop, _ = execute_query("SELECT status, COUNT(*) as count FROM Properties GROUP BY status")
-    stats['inventory_status'] = res_prop or []
-    res_users, _ = execute_query("SELECT COUNT(*) as count FROM Users WHERE isActive=1")
-    stats['active_agents'] = res_users[0]['count'] if res_users else 0
-    sql_sales = """SELECT SUM(totalCommission) as total_income, COUNT(*) as sales_count 
-                   FROM Sales WHERE MONTH(closedAt) = MONTH(CURRENT_DATE()) 
-                   AND YEAR(closedAt) = YEAR(CURRENT_DATE()) AND status = 'APROBADO'"""
-    res_sales, _ = execute_query(sql_sales)
-    stats['monthly_sales'] = res_sales[0] if res_sales else {}
-    res_pending, _ = execute_query("SELECT COUNT(*) as count FROM Sales WHERE status = 'PENDIENTE'")
-    stats['pending_approvals'] = res_pending[0]['count'] if res_pending else 0
+    stats, error = get_dashboard_stats()
+    if error:
+        flash(f"Error al cargar estadísticas: {error}", 'error')
+        stats = empty_dashboard_stats()
     
     return render_template('dashboard.html', stats=stats)
 
 @app.route('/ui/properties')
 def properties_view():
     if 'user' not in session: return redirect(url_for('login_view'))
-    status = request.args.get('status')
+    filters = parse_property_filters(request.args)
     
     # Llamada al SP con datos de sesión
-    data, error = execute_procedure('sp_Property_List', (status, None, session['user']['role'], session['user']['id']))
+    try:
+        data, next_cursor, error = fetch_property_page(
+            filters, session['user']['role'], session['user']['id'],
+            request.args.get('cursor'), request.args.get('limit', PAGE_DEFAULT_LIMIT, type=int))
+    except ValueError:
+        return redirect(url_for('properties_view'))
     
     if error:
         flash(f"Error al cargar propiedades: {error}", 'error')
-        data = []
+        data, next_cursor = [], None
+    
+    next_url = None
+    if next_cursor:
+        next_url = url_for('properties_view', **{**request.args.to_dict(), 'cursor': next_cursor})
         
-    return render_template('properties.html', properties=data or [])
+    return render_template('properties.html', properties=data or [], next_url=next_url)
 
 @app.route('/ui/properties/new', methods=['GET', 'POST'])
 def property_create_view():
@@ -189,14 +916,9 @@ def property_create_view():
 def property_detail_view(id):
     if 'user' not in session: return redirect(url_for('login_view'))
     # Reutilizar lógica de get property
-    sql_prop = """SELECT p.*, u.fullName as AgentName, c.fullName as OwnerName 
-                  FROM Properties p 
-                  JOIN Users u ON p.agentId = u.id 
-                  JOIN Clients c ON p.ownerId = c.id 
-                  WHERE p.id = %s"""
-    prop, _ = execute_query(sql_prop, (id,))
+    prop, _ = fetch_property_detail(id)
     if not prop: return "Propiedad no encontrada", 404
-    return render_template('property_form.html', property=prop[0]) # Podrías hacer un template de detalle solo lectura
+    return render_template('property_form.html', property=prop) # Podrías hacer un template de detalle solo lectura
 
 @app.route('/ui/clients', methods=['GET'])
 def clients_view():
@@ -220,7 +942,7 @@ def clients_create_view():
 @app.route('/ui/users')
 def users_view():
     if 'user' not in session or session['user']['role'] != 'ADMIN': return redirect(url_for('dashboard_view'))
-    data, error = execute_procedure('sp_User_List')
+    data, error = execute_procedure('sp_User_List', cache_ttl=CACHE_TTL_REFERENCE, cache_tags=('users',))
     
     if error:
         flash(f"Error al cargar usuarios: {error}", 'error')
@@ -231,16 +953,18 @@ def users_view():
 @app.route('/ui/sales')
 def sales_view():
     if 'user' not in session: return redirect(url_for('login_view'))
-    start = request.args.get('startDate', datetime.date.today().replace(day=1))
-    end = request.args.get('endDate', datetime.date.today())
+    start = request.args.get('startDate') or datetime.date.today().replace(day=1)
+    end = request.args.get('endDate') or datetime.date.today()
+    granularity = request.args.get('granularity') or None
+    if granularity not in REPORT_GRANULARITIES: granularity = None
     
-    data, error = execute_procedure('sp_Report_Sales', (start, end))
+    data, error = fetch_sales_report(start, end, granularity)
     
     if error:
         flash(f"Error al cargar reporte de ventas: {error}", 'error')
         data = []
         
-    return render_template('sales.html', sales=data or [])
+    return render_template('sales.html', sales=data or [], granularity=granularity)
 
 
 # ==========================================
@@ -273,12 +997,12 @@ def login():
     
     # Consulta directa para verificar credenciales
     sql = "SELECT id, fullName, role, photoUrl FROM Users WHERE email = %s AND password = %s AND isActive = 1"
-    user, error = execute_query(sql, (email, password))
+    user, error = execute_query(sql, (email, password), prepared=True, rowset=True)
     
     if error: return jsonify({"error": error}), 500
     if not user: return jsonify({"error": "Credenciales inválidas"}), 401
     
-    return jsonify({"message": "Login exitoso", "user": user[0]})
+    return jsonify({"message": "Login exitoso", "user": user.first()})
 
 # ==========================================
 # RUTAS: USUARIOS (Agentes/Admin)
@@ -295,7 +1019,7 @@ def list_users():
       200:
         description: Lista de usuarios
     """
-    data, error = execute_procedure('sp_User_List')
+    data, error = execute_procedure('sp_User_List', cache_ttl=CACHE_TTL_REFERENCE, cache_tags=('users',))
     if error: return jsonify({"error": error}), 500
     return jsonify(data)
 
@@ -328,6 +1052,7 @@ def create_user():
     args = (req.get('email'), req.get('password'), req.get('fullName'), req.get('phone'), req.get('role', 'AGENTE'))
     data, error = execute_procedure('sp_User_Create', args)
     if error: return jsonify({"error": error}), 500
+    invalidate_cache('users')
     return jsonify(data), 201
 
 @app.route('/api/users/<int:id>', methods=['GET', 'PUT', 'DELETE'])
@@ -367,9 +1092,10 @@ def manage_user(id):
     """
     if request.method == 'GET':
         sql = "SELECT id, email, fullName, phone, role, photoUrl, isActive, createdAt FROM Users WHERE id = %s"
-        data, error = execute_query(sql, (id,))
+        data, error = execute_query(sql, (id,), cache_ttl=CACHE_TTL_REFERENCE, cache_tags=(f'user:{id}',),
+                                    prepared=True, rowset=True)
         if error: return jsonify({"error": error}), 500
-        return jsonify(data[0] if data else {})
+        return jsonify(data.first() or {})
 
     if request.method == 'PUT':
         req = request.json
@@ -379,6 +1105,7 @@ def manage_user(id):
         vals = (req.get('fullName'), req.get('phone'), req.get('role'), req.get('photoUrl'), id)
         data, error = execute_query(sql, vals, commit=True)
         if error: return jsonify({"error": error}), 500
+        invalidate_cache('users', f'user:{id}')
         return jsonify({"message": "Usuario actualizado"})
 
     if request.method == 'DELETE':
@@ -386,6 +1113,7 @@ def manage_user(id):
         sql = "UPDATE Users SET isActive = 0 WHERE id = %s"
         data, error = execute_query(sql, (id,), commit=True)
         if error: return jsonify({"error": error}), 500
+        invalidate_cache('users', f'user:{id}')
         return jsonify({"message": "Usuario desactivado"})
 
 # ==========================================
@@ -395,7 +1123,7 @@ def manage_user(id):
 @app.route('/api/properties', methods=['GET'])
 def list_properties():
     """
-    Listar propiedades con filtros
+    Listar propiedades con filtros (paginado por cursor)
     ---
     tags:
       - Properties
@@ -407,18 +1135,110 @@ def list_properties():
       - name: agentId
         in: query
         type: integer
+      - name: city
+        in: query
+        type: string
+      - name: operation
+        in: query
+        type: string
+        enum: ['VENTA', 'ALQUILER']
+      - name: minPrice
+        in: query
+        type: number
+      - name: maxPrice
+        in: query
+        type: number
+      - name: exclusive
+        in: query
+        type: boolean
+      - name: limit
+        in: query
+        type: integer
+        default: 50
+      - name: cursor
+        in: query
+        type: string
+        description: Valor 'next' de la página anterior
     responses:
       200:
-        description: Lista de propiedades
+        description: "Página de propiedades: {items: [...], next: cursor|null}"
+      400:
+        description: Cursor inválido
     """
-    # Filtros opcionales: ?status=DISPONIBLE&agentId=1
-    status = request.args.get('status') 
-    agent_id = request.args.get('agentId')
+    # Filtros opcionales: ?status=DISPONIBLE&agentId=1&city=Ilo&minPrice=50000
+    filters = parse_property_filters(request.args)
     # Simulamos obtener el usuario actual de la sesión/token (Hardcodeado para ejemplo)
     current_user_role = request.headers.get('X-Role', 'AGENTE') 
     current_user_id = request.headers.get('X-User-Id', 0)
     
-    data, error = execute_procedure('sp_Property_List', (status, agent_id, current_user_role, current_user_id))
+    try:
+        data, next_cursor, error = fetch_property_page(
+            filters, current_user_role, current_user_id,
+            request.args.get('cursor'), request.args.get('limit', PAGE_DEFAULT_LIMIT, type=int))
+    except ValueError:
+        return jsonify({"error": "Cursor inválido"}), 400
+    if error: return jsonify({"error": error}), 500
+    return jsonify({"items": data, "next": next_cursor})
+
+@app.route('/api/properties/search', methods=['GET'])
+def search_properties_api():
+    """
+    Búsqueda full-text de propiedades con facetas
+    ---
+    tags:
+      - Properties
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Palabras a buscar en título, descripción y dirección
+      - name: status
+        in: query
+        type: string
+      - name: city
+        in: query
+        type: string
+      - name: operation
+        in: query
+        type: string
+        enum: ['VENTA', 'ALQUILER']
+      - name: currency
+        in: query
+        type: string
+        enum: ['USD', 'PEN']
+      - name: minPrice
+        in: query
+        type: number
+      - name: maxPrice
+        in: query
+        type: number
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+      - name: offset
+        in: query
+        type: integer
+        default: 0
+    responses:
+      200:
+        description: "Resultados por relevancia {items, total, facets: {city, operation, status, currency, priceBucket}}"
+      400:
+        description: Falta el texto de búsqueda
+    """
+    text = request.args.get('q')
+    if not build_fulltext_query(text):
+        return jsonify({"error": "Falta el parámetro q"}), 400
+
+    filters = parse_property_filters(request.args)
+    filters['currency'] = request.args.get('currency') or None
+    current_user_role = request.headers.get('X-Role', 'AGENTE')
+    current_user_id = request.headers.get('X-User-Id', 0)
+
+    data, error = search_properties(
+        text, filters, current_user_role, current_user_id,
+        request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), request.args.get('offset', 0, type=int))
     if error: return jsonify({"error": error}), 500
     return jsonify(data)
 
@@ -472,9 +1292,14 @@ def manage_property(id):
         type: integer
         required: true
     get:
-      summary: Obtener detalle de propiedad y documentos
+      summary: Obtener detalle de propiedad, documentos, publicaciones y venta
+      parameters:
+        - name: If-None-Match
+          in: header
+          type: string
       responses:
-        200: {description: Detalle de propiedad}
+        200: {description: Detalle de propiedad (con cabecera ETag)}
+        304: {description: Sin cambios respecto al ETag enviado}
     put:
       summary: Actualizar propiedad
       parameters:
@@ -490,22 +1315,27 @@ def manage_property(id):
         200: {description: Propiedad actualizada}
     """
     if request.method == 'GET':
-        # Obtener propiedad + documentos
-        sql_prop = """SELECT p.*, u.fullName as AgentName, c.fullName as OwnerName 
-                      FROM Properties p 
-                      JOIN Users u ON p.agentId = u.id 
-                      JOIN Clients c ON p.ownerId = c.id 
-                      WHERE p.id = %s"""
-        prop, error = execute_query(sql_prop, (id,))
+        # GET condicional: si el cliente ya tiene la versión actual basta una búsqueda indexada
+        if request.if_none_match:
+            data, error = execute_procedure('sp_Property_Version', (id,))
+            if error: return jsonify({"error": error}), 500
+            if not data: return jsonify({"error": "Propiedad no encontrada"}), 404
+            etag = property_etag(data[0]['version'])
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+        # Obtener propiedad + documentos + publicaciones + venta
+        prop, error = fetch_property_detail(id)
         if error: return jsonify({"error": error}), 500
         if not prop: return jsonify({"error": "Propiedad no encontrada"}), 404
         
-        sql_docs = "SELECT * FROM Documents WHERE propertyId = %s"
-        docs, _ = execute_query(sql_docs, (id,))
-        
-        result = prop[0]
-        result['documents'] = docs
-        return jsonify(result)
+        etag = property_etag(prop.pop('version'))
+        response = jsonify(prop)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
     if request.method == 'PUT':
         req = request.json
@@ -514,6 +1344,7 @@ def manage_property(id):
         vals = (req.get('title'), req.get('description'), req.get('price'), req.get('status'), req.get('commissionPct'), id)
         data, error = execute_query(sql, vals, commit=True)
         if error: return jsonify({"error": error}), 500
+        invalidate_cache(f'property:{id}')
         return jsonify({"message": "Propiedad actualizada"})
 
 @app.route('/api/properties/<int:id>', methods=['DELETE'])
@@ -533,6 +1364,7 @@ def delete_property(id):
     # Este SP maneja la transacción y borrado en cascada de documentos y ventas
     data, error = execute_procedure('sp_Property_Delete', (id,))
     if error: return jsonify({"error": error}), 500
+    invalidate_cache(f'property:{id}')
     return jsonify(data)
 
 # ==========================================
@@ -558,13 +1390,16 @@ def get_contract_data(id):
     Solo accesible por ADMIN (validar en frontend/middleware).
     """
     sql = """SELECT p.address, p.price, p.commissionPct, p.exclusive,
-             c.fullName as OwnerName, c.dniRuc as OwnerDNI,
-             u.fullName as AgentName
+             p.ownerId, c.fullName as OwnerName, c.dniRuc as OwnerDNI,
+             p.agentId, u.fullName as AgentName
              FROM Properties p
              JOIN Clients c ON p.ownerId = c.id
              JOIN Users u ON p.agentId = u.id
              WHERE p.id = %s"""
-    data, error = execute_query(sql, (id,))
+    # Se etiqueta con la propiedad, su agente y su propietario para invalidar al editar cualquiera
+    data, error = execute_query(
+        sql, (id,), cache_ttl=CACHE_TTL_REFERENCE, prepared=True,
+        cache_tags=lambda rows: [f'property:{id}'] + [tag for r in rows for tag in (f"user:{r['agentId']}", f"client:{r['ownerId']}")])
     if error: return jsonify({"error": error}), 500
     if not data: return jsonify({"error": "Propiedad no encontrada"}), 404
     
@@ -578,6 +1413,20 @@ def get_contract_data(id):
 # RUTAS: DOCUMENTOS
 # ==========================================
 
+def document_storage_backend():
+    """DOCUMENT_STORAGE=local (por defecto) o s3: boto3 si hay DOCUMENT_S3_ENDPOINT, si no LocalS3Client."""
+    root = os.getenv('DOCUMENT_STORAGE_PATH', os.path.join(app.root_path, 'var', 'documents'))
+    if os.getenv('DOCUMENT_STORAGE', 'local') == 's3':
+        endpoint = os.getenv('DOCUMENT_S3_ENDPOINT')
+        client = document_store.boto3_client(endpoint) if endpoint else document_store.LocalS3Client(root)
+        return document_store.S3Storage(client, os.getenv('DOCUMENT_S3_BUCKET', 'atiqa-documents'))
+    return document_store.LocalStorage(root)
+
+document_storage = document_storage_backend()
+DOCUMENT_MAX_BYTES = int(os.getenv('DOCUMENT_MAX_MB', 25)) * 1024 * 1024
+# Un blob nunca cambia (la URL de un documento apunta siempre al mismo hash); private: son datos personales
+DOCUMENT_CACHE_CONTROL = 'private, max-age=31536000, immutable'
+
 @app.route('/api/documents', methods=['POST'])
 def add_document():
     """
@@ -585,9 +1434,13 @@ def add_document():
     ---
     tags:
       - Documents
+    consumes:
+      - application/json
+      - multipart/form-data
     parameters:
       - name: body
         in: body
+        description: "JSON: registra un enlace externo (url)"
         schema:
           type: object
           properties:
@@ -595,9 +1448,17 @@ def add_document():
             url: {type: string}
             type: {type: string}
             propertyId: {type: integer}
+      - name: file
+        in: formData
+        type: file
+        description: "multipart/form-data: sube el archivo al almacén (con los campos name, type y propertyId)"
     responses:
-      201: {description: Documento registrado}
+      201: {description: "Documento registrado (multipart: con sha256, size y deduplicated)"}
+      400: {description: Multipart inválido o faltan campos}
+      413: {description: Archivo mayor que DOCUMENT_MAX_MB}
     """
+    if request.mimetype == 'multipart/form-data':
+        return upload_document()
     req = request.json
     # Args: name, url, type, propertyId
     args = (req.get('name'), req.get('url'), req.get('type'), req.get('propertyId'))
@@ -605,31 +1466,37 @@ def add_document():
     if error: return jsonify({"error": error}), 500
     return jsonify(data), 201
 
-@app.route('/api/documents', methods=['GET'])
-def list_documents():
+def upload_document():
     """
-    Listar documentos de una propiedad
-    ---
-    tags:
-      - Documents
-    parameters:
-      - name: propertyId
-        in: query
-        type: integer
-    responses:
-      200: {description: Lista de documentos}
+    Sube el archivo de un multipart directo al almacén (bloque a bloque, con su hash) y registra
+    el documento. El blob se guarda antes que la fila: si el registro falla queda huérfano y lo
+    borra purge-document-blobs.
     """
-    prop_id = request.args.get('propertyId')
-    if not prop_id: return jsonify({"error": "Falta propertyId"}), 400
-    sql = "SELECT * FROM Documents WHERE propertyId = %s"
-    data, error = execute_query(sql, (prop_id,))
+    boundary = request.mimetype_params.get('boundary')
+    if not boundary: return jsonify({"error": "Falta el boundary del multipart"}), 400
+    try:
+        fields, upload = document_store.receive_multipart(
+            request.stream, boundary, lambda: document_storage.writer(DOCUMENT_MAX_BYTES))
+    except document_store.BlobTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except ValueError as e:
+        return jsonify({"error": f"Multipart inválido: {e}"}), 400
+    if upload is None: return jsonify({"error": "Falta el archivo (campo file)"}), 400
+    if not fields.get('type') or not fields.get('propertyId'):
+        return jsonify({"error": "Faltan type o propertyId"}), 400
+
+    blob, filename, content_type = upload
+    args = ((fields.get('name') or filename or blob.digest)[:100], fields['type'], fields['propertyId'],
+            blob.digest, blob.size, content_type or 'application/octet-stream')
+    rows, error = execute_procedure('sp_Document_Store', args)
     if error: return jsonify({"error": error}), 500
-    return jsonify(data)
+    note_write()
+    return jsonify({**rows[0], 'deduplicated': blob.deduplicated}), 201
 
-@app.route('/api/documents/<int:id>', methods=['DELETE'])
-def delete_document(id):
+@app.route('/api/documents/<int:id>/content', methods=['GET'])
+def document_content(id):
     """
-    Eliminar un documento
+    Descargar el archivo de un documento
     ---
     tags:
       - Documents
@@ -637,35 +1504,364 @@ def delete_document(id):
       - name: id
         in: path
         type: integer
+      - name: Range
+        in: header
+        type: string
+        description: "bytes=inicio-fin (un solo rango)"
     responses:
-      200: {description: Documento eliminado}
+      200: {description: Archivo completo (ETag = sha256, inmutable)}
+      206: {description: Rango pedido}
+      302: {description: Documento registrado como enlace externo}
+      304: {description: If-None-Match coincide}
+      404: {description: Documento o archivo inexistente}
+      416: {description: Rango fuera del archivo}
     """
-    data, error = execute_query("DELETE FROM Documents WHERE id = %s", (id,), commit=True)
+    rows, error = execute_query("SELECT name, url, sha256, size, contentType FROM Documents WHERE id = %s",
+                                (id,), prepared=True)
     if error: return jsonify({"error": error}), 500
-    return jsonify({"message": "Documento eliminado"})
+    if not rows: return jsonify({"error": "Documento no encontrado"}), 404
+    doc = rows[0]
+    if doc['sha256'] is None:
+        return redirect(doc['url'])  # Documento anterior al almacén: el url es un enlace externo
+
+    path = document_storage.path(doc['sha256'])
+    if path is not None:
+        if not os.path.isfile(path): return jsonify({"error": "Archivo no encontrado"}), 404
+        # send_file resuelve Range/If-Range/If-None-Match y, con gunicorn, envía con sendfile (wsgi.file_wrapper)
+        response = send_file(path, mimetype=doc['contentType'], download_name=doc['name'],
+                             conditional=True, etag=doc['sha256'])
+    else:
+        response = stream_document_blob(doc)
+    response.headers['Cache-Control'] = DOCUMENT_CACHE_CONTROL
+    return response
+
+def stream_document_blob(doc):
+    """Respuesta con Range para almacenes sin archivo local (S3): se pide al backend solo el rango."""
+    digest, size = doc['sha256'], doc['size']
+    response = Response(mimetype=doc['contentType'])
+    response.set_etag(digest)
+    response.accept_ranges = 'bytes'
+    # Como send_file: nombre ASCII de respaldo y el original en filename* (RFC 5987)
+    fallback = doc['name'].encode('ascii', 'replace').decode('ascii')
+    response.headers.set('Content-Disposition', 'inline', filename=fallback,
+                         **{'filename*': "UTF-8''" + quote(doc['name'])})
+    if request.if_none_match.contains(digest):
+        response.status_code = 304
+        return response
+
+    start, stop = 0, size
+    if request.range is not None and request.if_range.etag in (None, digest) and request.if_range.date is None:
+        requested = request.range.range_for_length(size)
+        if requested is None and len(request.range.ranges) == 1:
+            response.status_code = 416
+            response.headers['Content-Range'] = f'bytes */{size}'
+            return response
+        if requested is not None:
+            start, stop = requested
+            response.status_code = 206
+            response.content_range = ContentRange('bytes', start, stop, size)
+    response.content_length = stop - start
+    response.response = document_storage.open_range(digest, start, stop - 1) if stop > start else []
+    return response
+
+@app.cli.command('purge-document-blobs')
+def purge_document_blobs_command():
+    """
+    Borra los archivos del almacén sin referencias (tras DOCUMENT_GC_GRACE_HOURS); programar en cron.
+    Referencian un blob los documentos, las fotos de galería y las fotos de agentes (su photoUrl
+    es /api/images/<sha256>/...).
+    """
+    sql = """SELECT sha256 FROM Documents WHERE sha256 IS NOT NULL
+             UNION SELECT sha256 FROM PropertyPhotos
+             UNION SELECT SUBSTRING(photoUrl, %s, 64) FROM Users WHERE photoUrl LIKE %s"""
+    rows, error = execute_query(sql, (len(IMAGE_URL_PREFIX) + 1, IMAGE_URL_PREFIX + '%'), rowset=True, primary=True)
+    if error:
+        print(error)
+        sys.exit(1)
+    grace = float(os.getenv('DOCUMENT_GC_GRACE_HOURS', 24)) * 3600
+    removed = document_store.purge(document_storage, {row[0] for row in rows}, grace)
+    print(f"{removed} archivos sin referencias borrados ({document_storage.backend})")
 
 # ==========================================
-# RUTAS: VENTAS Y CIERRES (Flujo de Aprobación)
+# RUTAS: IMÁGENES (Fotos de propiedades y agentes, derivados en un pool de procesos)
 # ==========================================
 
-@app.route('/api/sales', methods=['POST'])
-def register_sale():
+def load_image_source(digest):
+    """Original de una imagen del almacén: ruta local o bytes (S3). None si no existe."""
+    path = document_storage.path(digest)
+    if path is not None:
+        return path if os.path.isfile(path) else None
+    size = document_storage.size(digest)
+    return None if size is None else b''.join(document_storage.open_range(digest, 0, size - 1))
+
+IMAGE_FORMAT = os.getenv('IMAGE_FORMAT', 'webp')
+image_pipeline = ImagePipeline(
+    VariantCache(os.getenv('IMAGE_CACHE_PATH', os.path.join(app.root_path, 'var', 'images')),
+                 int(os.getenv('IMAGE_CACHE_MAX_MB', 1024)) * 1024 * 1024, IMAGE_FORMAT),
+    load_image_source,
+    fmt=IMAGE_FORMAT,
+    quality=int(os.getenv('IMAGE_QUALITY', 80)),
+    max_workers=int(os.getenv('IMAGE_WORKERS', 2)),
+    wait=float(os.getenv('IMAGE_RENDER_WAIT', 5)),
+    on_error=lambda key, e: app.logger.warning("Derivado de imagen %s/%s: %s", key[0], key[1], e),
+)
+os.register_at_fork(after_in_child=image_pipeline.reset_after_fork)
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_MB', 20)) * 1024 * 1024
+# La URL de un derivado incluye el hash del original y el formato: su contenido no cambia nunca
+IMAGE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+IMAGE_URL_PREFIX = '/api/images/'
+IMAGE_URL = re.compile(re.escape(IMAGE_URL_PREFIX) + r'([0-9a-f]{64})/')
+
+def image_variant_urls(digest):
+    """URLs de los derivados (thumbnail, card, full) de una imagen del almacén, o None."""
+    if not digest:
+        return None
+    return {name: f'{IMAGE_URL_PREFIX}{digest}/{name}.{IMAGE_FORMAT}' for name in IMAGE_VARIANTS}
+
+def photo_url_variants(url):
+    """Derivados de un photoUrl que apunta al almacén; None si es un enlace externo."""
+    match = IMAGE_URL.match(url or '')
+    return image_variant_urls(match.group(1)) if match else None
+
+def add_photo_variants(rows):
+    """Filas de sp_Property_List/sp_Property_Search: CoverPhoto (hash) pasa a URLs de sus derivados."""
+    for row in rows:
+        row['CoverPhoto'] = image_variant_urls(row.get('CoverPhoto'))
+        row['AgentPhotoVariants'] = photo_url_variants(row.get('AgentPhoto'))
+    return rows
+
+def receive_image_upload():
     """
-    Registrar un cierre de venta (Estado PENDIENTE)
+    Guarda en el almacén el archivo de un multipart de imagen (como upload_document).
+    Retorna ((blob, campos), None) o (None, respuesta de error).
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return None, (jsonify({"error": "Se espera multipart/form-data con el campo file"}), 400)
+    try:
+        fields, upload = document_store.receive_multipart(
+            request.stream, boundary, lambda: document_storage.writer(IMAGE_MAX_BYTES))
+    except document_store.BlobTooLarge as e:
+        return None, (jsonify({"error": str(e)}), 413)
+    except ValueError as e:
+        return None, (jsonify({"error": f"Multipart inválido: {e}"}), 400)
+    if upload is None:
+        return None, (jsonify({"error": "Falta el archivo (campo file)"}), 400)
+    blob, _, content_type = upload
+    if not (content_type or '').startswith('image/'):
+        return None, (jsonify({"error": "El archivo debe ser una imagen"}), 415)
+    return (blob, fields), None
+
+@app.route('/api/images/<string(length=64):digest>/<any(thumbnail, card, full):variant>.<ext>', methods=['GET'])
+def image_variant(digest, variant, ext):
+    """
+    Derivado de una imagen (se genera en segundo plano si todavía no existe)
     ---
     tags:
-      - Sales
+      - Images
     parameters:
-      - name: body
-        in: body
-        schema:
-          type: object
-          properties:
-            propertyId: {type: integer}
-            finalPrice: {type: number}
-            totalCommission: {type: number}
-            listingAgentId: {type: integer}
-    responses:
+      - name: digest
+        in: path
+        type: string
+        description: sha256 del original
+      - name: variant
+        in: path
+        type: string
+        enum: ['thumbnail', 'card', 'full']
+      - name: ext
+        in: path
+        type: string
+        description: Formato configurado (IMAGE_FORMAT)
+    responses:
+      200: {description: Imagen (Cache-Control immutable)}
+      404: {description: Imagen inexistente}
+      415: {description: El original no es una imagen}
+      503: {description: Derivado en generación; reintentar}
+    """
+    if ext != IMAGE_FORMAT or not all(c in '0123456789abcdef' for c in digest):
+        return jsonify({"error": "Imagen no encontrada"}), 404
+    path, error = image_pipeline.get(digest, variant)
+    if error == 'timeout':
+        response = jsonify({"error": "La imagen se está generando"})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    if error == 'not_found': return jsonify({"error": "Imagen no encontrada"}), 404
+    if error == 'not_image': return jsonify({"error": "El original no es una imagen válida"}), 415
+    if error: return jsonify({"error": "No se pudo generar la imagen"}), 500
+
+    response = send_file(path, mimetype=image_pipeline.mimetype, conditional=True, etag=f'{digest}-{variant}')
+    response.headers['Cache-Control'] = IMAGE_CACHE_CONTROL
+    return response
+
+@app.route('/api/properties/<int:id>/photos', methods=['POST'])
+def add_property_photo(id):
+    """
+    Agregar una foto a la galería de una propiedad
+    ---
+    tags:
+      - Images
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: id
+        in: path
+        type: integer
+      - name: file
+        in: formData
+        type: file
+        required: true
+      - name: position
+        in: formData
+        type: integer
+        description: Orden en la galería (por defecto, al final)
+    responses:
+      201: {description: "Foto agregada: id, sha256 y URLs de sus derivados"}
+      404: {description: Propiedad inexistente}
+      413: {description: Imagen mayor que IMAGE_MAX_MB}
+      415: {description: El archivo no es una imagen}
+    """
+    received, error_response = receive_image_upload()
+    if error_response: return error_response
+    blob, fields = received
+
+    # Sin la propiedad el SELECT no da filas: 0 insertadas en vez del error de la FK
+    sql = """INSERT INTO PropertyPhotos (propertyId, sha256, position)
+             SELECT p.id, %s, COALESCE(%s, MAX(ph.position) + 1, 0)
+             FROM Properties p LEFT JOIN PropertyPhotos ph ON ph.propertyId = p.id
+             WHERE p.id = %s GROUP BY p.id"""
+    data, error = execute_query(sql, (blob.digest, fields.get('position'), id), commit=True)
+    if error: return jsonify({"error": error}), 500
+    if not data['affected_rows']: return jsonify({"error": "Propiedad no encontrada"}), 404
+    invalidate_cache(f'property:{id}')
+    # Los derivados se generan ya, fuera de la petición: la primera vista de la galería no espera
+    image_pipeline.submit(blob.digest)
+    return jsonify({"id": data['last_id'], "sha256": blob.digest, "variants": image_variant_urls(blob.digest)}), 201
+
+@app.route('/api/properties/<int:id>/photos/<int:photo_id>', methods=['DELETE'])
+def delete_property_photo(id, photo_id):
+    """
+    Quitar una foto de la galería
+    ---
+    tags:
+      - Images
+    parameters:
+      - name: id
+        in: path
+        type: integer
+      - name: photo_id
+        in: path
+        type: integer
+    responses:
+      200: {description: Foto eliminada}
+      404: {description: Foto inexistente}
+    """
+    data, error = execute_query("DELETE FROM PropertyPhotos WHERE id = %s AND propertyId = %s",
+                                (photo_id, id), commit=True)
+    if error: return jsonify({"error": error}), 500
+    if not data['affected_rows']: return jsonify({"error": "Foto no encontrada"}), 404
+    invalidate_cache(f'property:{id}')
+    return jsonify({"message": "Foto eliminada"})
+
+@app.route('/api/users/<int:id>/photo', methods=['POST'])
+def upload_user_photo(id):
+    """
+    Subir la foto de un agente (photoUrl pasa a su derivado 'full')
+    ---
+    tags:
+      - Images
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: id
+        in: path
+        type: integer
+      - name: file
+        in: formData
+        type: file
+        required: true
+    responses:
+      200: {description: "photoUrl y URLs de los derivados"}
+      404: {description: Usuario inexistente}
+      413: {description: Imagen mayor que IMAGE_MAX_MB}
+      415: {description: El archivo no es una imagen}
+    """
+    received, error_response = receive_image_upload()
+    if error_response: return error_response
+    blob, _ = received
+
+    variants = image_variant_urls(blob.digest)
+    data, error = execute_query("UPDATE Users SET photoUrl = %s WHERE id = %s", (variants['full'], id), commit=True)
+    if error: return jsonify({"error": error}), 500
+    if not data['affected_rows']:
+        # 0 filas también si photoUrl no cambió (misma foto otra vez): solo falta el usuario si no existe
+        rows, error = execute_query("SELECT 1 FROM Users WHERE id = %s", (id,), primary=True)
+        if error: return jsonify({"error": error}), 500
+        if not rows: return jsonify({"error": "Usuario no encontrado"}), 404
+    invalidate_cache('users', f'user:{id}')
+    image_pipeline.submit(blob.digest)
+    return jsonify({"photoUrl": variants['full'], "variants": variants})
+
+@app.route('/api/documents', methods=['GET'])
+def list_documents():
+    """
+    Listar documentos de una propiedad
+    ---
+    tags:
+      - Documents
+    parameters:
+      - name: propertyId
+        in: query
+        type: integer
+    responses:
+      200: {description: Lista de documentos}
+    """
+    prop_id = request.args.get('propertyId')
+    if not prop_id: return jsonify({"error": "Falta propertyId"}), 400
+    sql = "SELECT * FROM Documents WHERE propertyId = %s"
+    data, error = execute_query(sql, (prop_id,))
+    if error: return jsonify({"error": error}), 500
+    return jsonify(data)
+
+@app.route('/api/documents/<int:id>', methods=['DELETE'])
+def delete_document(id):
+    """
+    Eliminar un documento
+    ---
+    tags:
+      - Documents
+    parameters:
+      - name: id
+        in: path
+        type: integer
+    responses:
+      200: {description: Documento eliminado}
+    """
+    data, error = execute_query("DELETE FROM Documents WHERE id = %s", (id,), commit=True)
+    if error: return jsonify({"error": error}), 500
+    return jsonify({"message": "Documento eliminado"})
+
+# ==========================================
+# RUTAS: VENTAS Y CIERRES (Flujo de Aprobación)
+# ==========================================
+
+@app.route('/api/sales', methods=['POST'])
+def register_sale():
+    """
+    Registrar un cierre de venta (Estado PENDIENTE)
+    ---
+    tags:
+      - Sales
+    parameters:
+      - name: body
+        in: body
+        schema:
+          type: object
+          properties:
+            propertyId: {type: integer}
+            finalPrice: {type: number}
+            totalCommission: {type: number}
+            listingAgentId: {type: integer}
+    responses:
       201: {description: Venta registrada}
     """
     # El agente registra el cierre. Entra como PENDIENTE.
@@ -700,6 +1896,56 @@ def approve_sale(id):
     if error: return jsonify({"error": error}), 500
     return jsonify({"message": "Cierre aprobado y propiedad actualizada"})
 
+SALE_BULK_MAX_IDS = 500
+SALE_BULK_ACTIONS = {'approve': 'APROBADO', 'reject': 'RECHAZADO'}
+
+@app.route('/api/sales/approvals', methods=['POST'])
+def bulk_approve_sales():
+    """
+    Aprobar o rechazar varios cierres en una sola transacción (Admin, cierre de mes)
+    ---
+    tags:
+      - Sales
+    parameters:
+      - name: body
+        in: body
+        schema:
+          type: object
+          properties:
+            ids: {type: array, items: {type: integer}}
+            action: {type: string, enum: ['approve', 'reject']}
+    responses:
+      200:
+        description: >
+          Resultado por id (en el orden recibido): approved, rejected, already_approved,
+          already_rejected, not_pending o not_found. Solo cambian las ventas PENDIENTE.
+      400: {description: ids o action inválidos}
+    """
+    req = request.get_json(silent=True) or {}
+    ids, status = req.get('ids'), SALE_BULK_ACTIONS.get(req.get('action'))
+    if status is None:
+        return jsonify({"error": "action debe ser approve o reject"}), 400
+    if (not isinstance(ids, list) or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) and i > 0 for i in ids)):
+        return jsonify({"error": "ids debe ser una lista de enteros positivos"}), 400
+    if len(ids) > SALE_BULK_MAX_IDS:
+        return jsonify({"error": f"Máximo {SALE_BULK_MAX_IDS} ids por petición"}), 400
+
+    # El SP bloquea las ventas, actualiza las propiedades con un solo JOIN y hace commit
+    rows, error = execute_procedure('sp_Sale_BulkTransition', (json.dumps(ids), status))
+    if error: return jsonify({"error": error}), 500
+
+    outcomes = {row['id']: row for row in rows}
+    results, summary = [], {}
+    for sale_id in dict.fromkeys(ids):
+        row = outcomes[sale_id]
+        results.append({'id': sale_id, 'outcome': row['outcome'], 'status': row['status'],
+                         'propertyId': row['propertyId']})
+        summary[row['outcome']] = summary.get(row['outcome'], 0) + 1
+        if row['outcome'] == 'approved':
+            invalidate_cache(f'property:{row["propertyId"]}')
+    return jsonify({'action': req['action'], 'summary': summary, 'results': results})
+
 @app.route('/api/reports/sales', methods=['GET'])
 def report_sales():
     """
@@ -714,15 +1960,23 @@ def report_sales():
       - name: endDate
         in: query
         type: string
+      - name: granularity
+        in: query
+        type: string
+        enum: ['day', 'month', 'agent']
+        description: Si se indica, retorna totales agregados desde el rollup diario
     responses:
       200: {description: Reporte de ventas}
     """
     start = request.args.get('startDate')
     end = request.args.get('endDate')
+    granularity = request.args.get('granularity')
     if not start or not end:
         return jsonify({"error": "Faltan parámetros startDate y endDate"}), 400
+    if granularity is not None and granularity not in REPORT_GRANULARITIES:
+        return jsonify({"error": "granularity debe ser day, month o agent"}), 400
         
-    data, error = execute_procedure('sp_Report_Sales', (start, end))
+    data, error = fetch_sales_report(start, end, granularity)
     if error: return jsonify({"error": error}), 500
     return jsonify(data)
 
@@ -807,9 +2061,11 @@ def manage_client(id):
         200: {description: Cliente eliminado}
     """
     if request.method == 'GET':
-        data, error = execute_query("SELECT * FROM Clients WHERE id = %s", (id,))
+        data, error = execute_query("SELECT * FROM Clients WHERE id = %s", (id,),
+                                    cache_ttl=CACHE_TTL_REFERENCE, cache_tags=(f'client:{id}',),
+                                    prepared=True, rowset=True)
         if error: return jsonify({"error": error}), 500
-        return jsonify(data[0] if data else {})
+        return jsonify(data.first() or {})
 
     if request.method == 'PUT':
         req = request.json
@@ -817,25 +2073,629 @@ def manage_client(id):
         vals = (req.get('fullName'), req.get('phone'), req.get('email'), req.get('notes'), id)
         data, error = execute_query(sql, vals, commit=True)
         if error: return jsonify({"error": error}), 500
+        invalidate_cache(f'client:{id}')
         return jsonify({"message": "Cliente actualizado"})
 
     if request.method == 'DELETE':
-        # Verificar si tiene propiedades antes de borrar
-        check, _ = execute_query("SELECT id FROM Properties WHERE ownerId = %s", (id,))
-        if check: return jsonify({"error": "No se puede borrar: El cliente tiene propiedades asociadas"}), 400
-        
-        data, error = execute_query("DELETE FROM Clients WHERE id = %s", (id,), commit=True)
+        # Borrado condicionado: la verificación de propiedades va en la misma sentencia (un round trip)
+        sql = """DELETE FROM Clients WHERE id = %s
+                 AND NOT EXISTS (SELECT 1 FROM Properties WHERE ownerId = %s)"""
+        data, error = execute_query(sql, (id, id), commit=True)
         if error: return jsonify({"error": error}), 500
+        if not data['affected_rows']:
+            # Solo si no se borró nada se distingue "tiene propiedades" de "no existe"
+            check, _ = execute_query("SELECT 1 FROM Properties WHERE ownerId = %s LIMIT 1", (id,))
+            if check: return jsonify({"error": "No se puede borrar: El cliente tiene propiedades asociadas"}), 400
+        invalidate_cache(f'client:{id}')
         return jsonify({"message": "Cliente eliminado"})
 
+# ==========================================
+# RUTAS: EXPORTACIÓN (Streaming NDJSON/CSV)
+# ==========================================
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+def stream_query(sql, params=()):
+    """
+    Ejecuta la consulta con un cursor no bufferizado sobre una conexión propia del pool
+    (de una réplica al día si hay, las exportaciones son las lecturas más pesadas).
+    Retorna (columnas, generador de lotes). La memoria queda acotada a EXPORT_BATCH_SIZE filas.
+    """
+    conn = acquire_replica_connection(read_after.get()) if replica_router.enabled else None
+    if conn is None:
+        if not db_breaker.allow():
+            raise Error(msg="Base de datos no disponible (circuito abierto)")
+        try:
+            conn = db_pool.acquire()
+        except Error as e:
+            note_db_error(e)
+            raise
+    cursor = conn.cursor(buffered=False)
+    try:
+        cursor.execute(sql, params)
+    except Error as e:
+        note_db_error(e, conn)
+        cursor.close()
+        release_db_connection(conn)
+        raise
+    note_db_success(conn)
+
+    def batches():
+        try:
+            while True:
+                rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                if not rows: break
+                yield rows
+        finally:
+            # Si el cliente corta la descarga quedan filas sin leer: el pool descarta esa conexión
+            try:
+                cursor.close()
+            except Error:
+                pass
+            release_db_connection(conn)
+
+    return list(cursor.column_names), batches()
+
+def export_response(columns, batches, fmt, filename):
+    """Respuesta HTTP en streaming: un chunk por lote de filas."""
+    if fmt == 'csv':
+        def generate():
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(columns)
+            for rows in batches:
+                writer.writerows(rows)
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate(0)
+            yield buf.getvalue()
+        mimetype = 'text/csv'
+    else:
+        def generate():
+            for rows in batches:
+                yield app.json.ndjson(columns, rows)
+        mimetype = 'application/x-ndjson'
+
+    headers = {'Content-Disposition': f'attachment; filename={filename}.{fmt}'}
+    return Response(generate(), mimetype=mimetype, headers=headers)
+
+def export_properties_sql(filters, viewer_role, viewer_id, since):
+    """Mismas reglas de confidencialidad y filtros que sp_Property_List, ordenado por updatedAt."""
+    sql = """SELECT p.id, p.title, p.description, p.address, p.city, p.price, p.currency, p.commissionPct,
+                    p.status, p.operation, p.exclusive, p.agentId, u.fullName as AgentName,
+                    CASE WHEN %s = 'ADMIN' OR p.agentId = %s THEN c.fullName ELSE 'CONFIDENCIAL' END as OwnerName,
+                    CASE WHEN %s = 'ADMIN' OR p.agentId = %s THEN c.phone ELSE NULL END as OwnerPhone,
+                    p.createdAt, p.updatedAt
+             FROM Properties p
+             JOIN Users u ON p.agentId = u.id
+             JOIN Clients c ON p.ownerId = c.id
+             WHERE 1 = 1"""
+    params = [viewer_role, viewer_id, viewer_role, viewer_id]
+    conditions = {
+        'status': "p.status = %s", 'agentId': "p.agentId = %s", 'city': "p.city = %s",
+        'operation': "p.operation = %s", 'minPrice': "p.price >= %s", 'maxPrice': "p.price <= %s",
+        'exclusive': "p.exclusive = %s",
+    }
+    for key, condition in conditions.items():
+        if filters[key] is not None:
+            sql += f" AND {condition}"
+            params.append(filters[key])
+    if since:
+        sql += " AND p.updatedAt >= %s"
+        params.append(since)
+    return sql + " ORDER BY p.updatedAt, p.id", params
+
+@app.route('/api/export/<any(clients, properties, sales):entity>', methods=['GET'])
+def export_data(entity):
+    """
+    Exportación masiva en streaming (NDJSON o CSV)
+    ---
+    tags:
+      - Export
+    parameters:
+      - name: entity
+        in: path
+        type: string
+        enum: ['clients', 'properties', 'sales']
+        required: true
+      - name: format
+        in: query
+        type: string
+        enum: ['ndjson', 'csv']
+        default: ndjson
+      - name: since
+        in: query
+        type: string
+        description: "Timestamp ISO (ej: 2024-01-31T00:00:00) para exportaciones incrementales"
+      - name: startDate
+        in: query
+        type: string
+        description: Solo ventas
+      - name: endDate
+        in: query
+        type: string
+        description: Solo ventas
+    responses:
+      200: {description: Archivo NDJSON o CSV}
+      400: {description: Parámetros inválidos}
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"error": "format debe ser ndjson o csv"}), 400
+    try:
+        since = request.args.get('since')
+        since = datetime.datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({"error": "since debe ser un timestamp ISO"}), 400
+
+    if entity == 'clients':
+        sql = "SELECT * FROM Clients"
+        params = []
+        if since:
+            sql += " WHERE createdAt >= %s"
+            params.append(since)
+        sql += " ORDER BY createdAt, id"
+    elif entity == 'properties':
+        sql, params = export_properties_sql(
+            parse_property_filters(request.args),
+            request.headers.get('X-Role', 'AGENTE'), request.headers.get('X-User-Id', 0), since)
+    else:
+        # Solo ventas APROBADAS; rango semiabierto como sp_Report_Sales
+        sql = """SELECT s.id, s.propertyId, p.title as Property, p.operation, p.currency,
+                        s.finalPrice, s.totalCommission, s.listingAgentId, s.sellingAgentId,
+                        s.isShared, s.externalAgency, s.sharedPct, s.closedAt
+                 FROM Sales s
+                 JOIN Properties p ON s.propertyId = p.id
+                 WHERE s.status = 'APROBADO'"""
+        params = []
+        start = request.args.get('startDate')
+        end = request.args.get('endDate')
+        if start:
+            sql += " AND s.closedAt >= %s"
+            params.append(start)
+        if end:
+            sql += " AND s.closedAt < %s + INTERVAL 1 DAY"
+            params.append(end)
+        if since:
+            sql += " AND s.closedAt >= %s"
+            params.append(since)
+        sql += " ORDER BY s.closedAt, s.id"
+
+    try:
+        columns, batches = stream_query(sql, tuple(params))
+    except Error as e:
+        return jsonify({"error": str(e)}), 500
+    return export_response(columns, batches, fmt, entity)
+
+# ==========================================
+# RUTAS: IMPORTACIÓN MASIVA (CSV/NDJSON)
+# ==========================================
+
+@app.route('/api/import/<any(clients, properties):entity>', methods=['POST'])
+def bulk_import(entity):
+    """
+    Importación masiva de clientes o propiedades
+    ---
+    tags:
+      - Import
+    consumes:
+      - multipart/form-data
+      - text/csv
+      - application/x-ndjson
+    parameters:
+      - name: entity
+        in: path
+        type: string
+        enum: ['clients', 'properties']
+        required: true
+      - name: file
+        in: formData
+        type: file
+        description: Archivo .csv o .ndjson (alternativamente, enviar el contenido como cuerpo)
+      - name: format
+        in: query
+        type: string
+        enum: ['csv', 'ndjson']
+        description: Si no se indica se deduce de la extensión o del Content-Type
+    responses:
+      200: {description: "Reporte: total_rows, inserted, failed y errores por fila"}
+      400: {description: Formato no soportado}
+    """
+    upload = request.files.get('file')
+    fmt = request.args.get('format')
+    if not fmt:
+        name = upload.filename if upload else ''
+        content_type = upload.mimetype if upload else request.mimetype
+        fmt = 'csv' if name.endswith('.csv') or content_type == 'text/csv' else 'ndjson'
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format debe ser csv o ndjson"}), 400
+
+    # Propiedades: ownerId u ownerDniRuc, agentId obligatorio. Clientes: fullName y phone obligatorios.
+    stream = upload.stream if upload else request.stream
+    conn = get_db_connection()
+    if conn is None: return jsonify({"error": "No se pudo conectar a la base de datos"}), 500
+
+    report = importer.run_import(conn, entity, importer.iter_records(stream, fmt))
+    if report.inserted:
+        note_write()
+    return jsonify(report.as_dict())
+
+# ==========================================
+# RUTAS: BATCH (Varias operaciones en una petición)
+# ==========================================
+
+BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', 50))
+BATCH_ENVIRON_KEY = 'atiqa.batch_operation'
+# Respuestas en streaming o que no terminan: no caben en un batch
+BATCH_EXCLUDED_ENDPOINTS = {'batch_operations', 'event_stream', 'export_data', 'bulk_import'}
+# Sus SP abren su propia transacción (START TRANSACTION confirma la del batch) o tienen efectos
+# fuera de la base (la cola de publicación): no pueden deshacerse con el batch
+BATCH_NON_ATOMIC_ENDPOINTS = {'delete_property', 'bulk_approve_sales', 'dashboard_reconcile', 'publish_social'}
+
+def is_batch_operation():
+    """True si la petición actual es una operación dentro de /api/batch."""
+    return bool(request) and request.environ.get(BATCH_ENVIRON_KEY, False)
+
+def run_batch_operation(method, path, query, body, headers, remote_addr):
+    """
+    Ejecuta una operación llamando a la vista de su ruta en un contexto de petición anidado.
+    Comparte g (y por lo tanto g.db_conn) con el batch; no pasa por los hooks before/after_request
+    (admisión, token de consistencia), que ya corrieron para el batch. Retorna (status, cuerpo).
+    """
+    environ = {BATCH_ENVIRON_KEY: True, 'REMOTE_ADDR': remote_addr}
+    with app.test_request_context(path, method=method, query_string=query, json=body,
+                                  headers=headers, environ_base=environ):
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+            endpoint = request.url_rule.endpoint
+            if endpoint in BATCH_EXCLUDED_ENDPOINTS:
+                return 400, {"error": f"{path} no se puede usar dentro de un batch"}
+            if in_atomic_batch() and endpoint in BATCH_NON_ATOMIC_ENDPOINTS:
+                return 400, {"error": f"{method} {path} no se puede usar en un batch atómico"}
+            response = app.make_response(app.view_functions[endpoint](**request.view_args))
+        except HTTPException as e:
+            return e.code, {"error": e.description}
+        except Exception:
+            app.logger.exception("Batch: error en %s %s", method, path)
+            return 500, {"error": "Error interno"}
+        if response.is_streamed:
+            response.close()
+            return 400, {"error": f"{path} responde en streaming; no se puede usar dentro de un batch"}
+        data = response.get_json(silent=True)
+        return response.status_code, data if data is not None else response.get_data(as_text=True)
+
+def finish_atomic_batch(ok):
+    """
+    Confirma o deshace la transacción del batch e invalida el caché de lo confirmado.
+    Retorna (confirmado, error).
+    """
+    tags = g.pop('cache_tags_pending', set())    # Si se deshace, no cambió nada que invalidar
+    conn = g.get('db_conn')
+    if conn is None:
+        return ok, None
+    if not ok:
+        rollback_quietly(conn)
+        return False, None
+    try:
+        conn.commit()
+    except Error as e:
+        note_db_error(e, conn)
+        rollback_quietly(conn)
+        return False, str(e)
+    if tags:
+        query_cache.invalidate(*tags)
+    return True, None
+
+@app.route('/api/batch', methods=['POST'])
+def batch_operations():
+    """
+    Ejecutar varias operaciones de la API en una petición y una sola conexión
+    ---
+    tags:
+      - Batch
+    parameters:
+      - name: body
+        in: body
+        schema:
+          type: object
+          properties:
+            atomic:
+              type: boolean
+              description: >
+                Todas en una transacción: si una falla (status >= 400) se deshacen todas y las
+                siguientes no se ejecutan (424). Sin atomic cada operación confirma por separado.
+            operations:
+              type: array
+              description: >
+                En orden. "${ref.campo}" en path, query o body toma un dato de la respuesta de una
+                operación anterior por su ref o su posición, ej: {"ownerId": "${owner.last_id}"}.
+              items:
+                type: object
+                properties:
+                  method: {type: string, enum: ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']}
+                  path: {type: string, example: /api/clients}
+                  query: {type: object}
+                  body: {type: object}
+                  ref: {type: string, example: owner}
+    responses:
+      200: {description: "results: status y body por operación; committed (solo con atomic)"}
+      400: {description: Batch inválido}
+    """
+    req = request.get_json(silent=True) or {}
+    operations, error = batch_ops.validate(req.get('operations'), BATCH_MAX_OPERATIONS)
+    if error: return jsonify({"error": error}), 400
+    atomic = bool(req.get('atomic', False))
+
+    # Las operaciones heredan la identidad del batch (X-Role, X-User-Id, sesión)
+    headers = [(key, value) for key, value in request.headers if key not in ('Content-Type', 'Content-Length')]
+    remote_addr = request.remote_addr
+    results, bodies, failed = [], {}, False
+    g.db_atomic = atomic
+    g.cache_tags_pending = set()
+    try:
+        for index, op in enumerate(operations):
+            entry = {'index': index, 'ref': op['ref']} if op['ref'] else {'index': index}
+            if failed:
+                results.append({**entry, 'status': 424, 'body': {"error": "No ejecutada: falló una operación anterior"}})
+                continue
+            try:
+                path = batch_ops.resolve(op['path'], bodies)
+                query = batch_ops.resolve(op['query'], bodies)
+                body = batch_ops.resolve(op['body'], bodies)
+            except batch_ops.UnresolvedReference as e:
+                status, data = 424, {"error": str(e)}
+            else:
+                status, data = run_batch_operation(op['method'], path, query, body, headers, remote_addr)
+            results.append({**entry, 'status': status, 'body': data})
+            if status < 400:
+                bodies[str(index)] = data
+                if op['ref']:
+                    bodies[op['ref']] = data
+            elif atomic:
+                failed = True
+        if atomic:
+            committed, error = finish_atomic_batch(not failed)
+    finally:
+        g.db_atomic = False
+        g.pop('cache_tags_pending', None)
+
+    if not atomic:
+        return jsonify({'results': results})
+    payload = {'atomic': True, 'committed': committed, 'results': results}
+    if error:
+        payload['error'] = error
+    return jsonify(payload)
+
+# ==========================================
+# RUTAS: SINCRONIZACIÓN (Delta por marca de agua y eventos SSE)
+# ==========================================
+
+# Un hueco en ChangeLog.seq con una transacción en curso espera hasta esto (ver change_feed):
+# debe superar la transacción de escritura más larga (lote de importación, aprobación masiva)
+SYNC_GRACE_SECONDS = float(os.getenv('SYNC_GRACE_SECONDS', 120))
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 5000
+CHANGELOG_RETENTION_DAYS = int(os.getenv('CHANGELOG_RETENTION_DAYS', 30))
+SYNC_ENTITIES = {'property': 'properties', 'sale': 'sales', 'document': 'documents'}
+CHANGES_SQL = """SELECT seq, entity, entityId, op, event, payload, changedAt,
+                        TIMESTAMPDIFF(MICROSECOND, changedAt, NOW(3)) / 1000000 as age
+                 FROM ChangeLog WHERE seq > %s ORDER BY seq LIMIT %s"""
+
+def fetch_changes(since, limit):
+    # Siempre en el primario: la edad de los huecos se mide con su reloj y una réplica
+    # atrasada haría que sp_Sync_Snapshot no encuentre filas ya registradas
+    return execute_query(CHANGES_SQL, (since, limit), prepared=True, primary=True)
+
+def changelog_head():
+    """Último seq del registro (0 si está vacío). Retorna (seq, error)."""
+    rows, error = execute_query("SELECT COALESCE(MAX(seq), 0) as seq FROM ChangeLog", primary=True)
+    if error: return None, error
+    return int(rows[0]['seq']), None
+
+def changelog_gap_open(after, before):
+    """
+    True si el hueco (after, before) de ChangeLog puede llenarse todavía. La lectura con bloqueo
+    ve lo último confirmado (no la instantánea de la transacción): una fila confirmada o una
+    inserción sin confirmar (bloqueada: NOWAIT falla) en el hueco lo dejan abierto.
+    """
+    rows, error = execute_query("SELECT seq FROM ChangeLog WHERE seq > %s AND seq < %s FOR SHARE NOWAIT",
+                                (after, before), primary=True)
+    return bool(error or rows)
+
+def find_late_changes(gaps):
+    """Seqs que aparecieron en huecos ya saltados [(después, antes), ...]. Retorna (seqs, error)."""
+    where = ' OR '.join(['(seq > %s AND seq < %s)'] * len(gaps))
+    rows, error = execute_query(f"SELECT seq FROM ChangeLog WHERE {where}",
+                                tuple(bound for gap in gaps for bound in gap), rowset=True, primary=True)
+    if error: return None, error
+    return [row[0] for row in rows], None
+
+def log_purged_before(since):
+    """True si el registro ya no tiene los cambios posteriores a `since` (retención vencida)."""
+    rows, error = execute_query("SELECT MIN(seq) as first FROM ChangeLog", primary=True)
+    return not error and rows[0]['first'] is not None and rows[0]['first'] > since + 1
+
+@app.route('/api/sync', methods=['GET'])
+def sync_changes():
+    """
+    Sincronización incremental: propiedades, ventas y documentos cambiados o borrados
+    ---
+    tags:
+      - Sync
+    parameters:
+      - name: since
+        in: query
+        type: string
+        description: "Token 'next' de la respuesta anterior. Sin él solo se retorna el token actual:
+          pedirlo antes de la descarga completa y luego sincronizar desde ahí."
+      - name: limit
+        in: query
+        type: integer
+        default: 500
+    responses:
+      200:
+        description: "{properties, sales, documents, deleted: {properties, sales, documents}, next, has_more}"
+      400: {description: Token inválido}
+      410: {description: El token es anterior a la retención del registro; hacer una descarga completa}
+    """
+    current_user_role = request.headers.get('X-Role', 'AGENTE')
+    current_user_id = request.headers.get('X-User-Id', 0)
+    changes = {'properties': [], 'sales': [], 'documents': [],
+               'deleted': {'properties': [], 'sales': [], 'documents': []}}
+
+    token = request.args.get('since')
+    if token is None:
+        head, error = changelog_head()
+        if error: return jsonify({"error": error}), 500
+        return jsonify({**changes, 'next': str(head), 'has_more': False})
+    try:
+        since = int(token)
+        if since < 0: raise ValueError(token)
+    except ValueError:
+        return jsonify({"error": "Token de sincronización inválido"}), 400
+    limit = max(1, min(request.args.get('limit', SYNC_DEFAULT_LIMIT, type=int) or SYNC_DEFAULT_LIMIT, SYNC_MAX_LIMIT))
+
+    rows, error = fetch_changes(since, limit)
+    if error: return jsonify({"error": error}), 500
+    if rows and rows[0]['seq'] > since + 1 and log_purged_before(since):
+        return jsonify({"error": "Token vencido, se requiere sincronización completa"}), 410
+    ready = settled(rows, since, SYNC_GRACE_SECONDS, changelog_gap_open)
+
+    upto = ready[-1]['seq'] if ready else since
+    if ready:
+        # Estado actual de lo que cambió en (since, upto]; los borrados salen del propio registro
+        sets, error = execute_procedure('sp_Sync_Snapshot', (since, upto, current_user_role, current_user_id),
+                                        all_results=True, primary=True)
+        if error: return jsonify({"error": error}), 500
+        changes['properties'], changes['sales'], changes['documents'] = sets
+        for row in ready:
+            if row['op'] == 'delete':
+                changes['deleted'][SYNC_ENTITIES[row['entity']]].append(row['entityId'])
+
+    # Si se cortó en un hueco reciente el resto llega en la próxima consulta
+    has_more = len(rows) == limit and len(ready) == len(rows)
+    return jsonify({**changes, 'next': str(upto), 'has_more': has_more})
+
+SSE_HEARTBEAT = float(os.getenv('SSE_HEARTBEAT', 15))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))
+
+def pending_approvals_event(rows):
+    """Tras eventos de ventas se publica el total de aprobaciones pendientes (evita el polling del dashboard)."""
+    if not any(row['entity'] == 'sale' for row in rows):
+        return []
+    data, error = execute_query("SELECT value FROM DashboardCounters WHERE name = 'sales:pending'", primary=True)
+    if error:
+        return []
+    return [('dashboard.pending_approvals', {'pending_approvals': int(data[0]['value']) if data else 0})]
+
+# Un solo hilo por worker lee ChangeLog y reparte a todos los suscriptores SSE en memoria
+change_feed = ChangeFeed(
+    fetch_changes, changelog_head,
+    poll_interval=float(os.getenv('SSE_POLL_INTERVAL', 1)),
+    grace=SYNC_GRACE_SECONDS,
+    backlog=int(os.getenv('SSE_BACKLOG', 1000)),
+    max_queue=int(os.getenv('SSE_MAX_QUEUE', 256)),
+    dumps=app.json.dumps,
+    on_events=pending_approvals_event,
+    on_error=lambda e: app.logger.warning("Feed de cambios: %s", e),
+    gap_open=changelog_gap_open,
+    find_late=find_late_changes,
+)
+os.register_at_fork(after_in_child=change_feed.reset_after_fork)
+
+@app.route('/api/events', methods=['GET'])
+def event_stream():
+    """
+    Eventos en tiempo real (Server-Sent Events)
+    ---
+    tags:
+      - Sync
+    produces:
+      - text/event-stream
+    parameters:
+      - name: Last-Event-ID
+        in: header
+        type: string
+        description: Último id recibido (el navegador lo envía solo al reconectar)
+    responses:
+      200:
+        description: "Eventos sale.registered, sale.approved, sale.status, property.status,
+          dashboard.pending_approvals y reset (resincronizar con /api/sync; si trae since, desde
+          ese token cuando es anterior al propio)"
+      503: {description: Límite de suscriptores del worker alcanzado}
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = -1  # Id desconocido: el suscriptor recibe 'reset'
+    subscription = change_feed.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            yield from subscription.messages(SSE_HEARTBEAT)
+        finally:
+            change_feed.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx: no bufferizar el stream
+    return response
+
+@app.cli.command('purge-changes')
+def purge_changes_command():
+    """Borra del ChangeLog lo anterior a CHANGELOG_RETENTION_DAYS días (programar en cron)."""
+    _, error = execute_procedure('sp_ChangeLog_Purge', (CHANGELOG_RETENTION_DAYS,))
+    if error:
+        print(error)
+        sys.exit(1)
+    print(f"ChangeLog depurado (retención {CHANGELOG_RETENTION_DAYS} días)")
+
 # ==========================================
 # RUTAS: REDES SOCIALES (Auto-Publicación Mock)
 # ==========================================
 
+def save_social_logs(rows):
+    """Registra las publicaciones exitosas de un trabajo en un solo lote. Retorna el error o None."""
+    sql = "INSERT INTO SocialMediaLogs (propertyId, network, postUrl) VALUES (%s, %s, %s)"
+    _, error = execute_many(sql, rows)
+    return error
+
+def save_social_job(job):
+    """Guarda el estado de un trabajo de publicación (versión 1 = nuevo, 2 = terminado). Retorna el error o None."""
+    results = json.dumps(job['results'])
+    if job['version'] == 1:
+        sql = "INSERT INTO SocialJobs (id, propertyId, status, results) VALUES (%s, %s, %s, %s)"
+        _, error = execute_query(sql, (job['id'], job['propertyId'], job['status'], results), commit=True)
+        return error
+    # Un trabajo ya guardado con una versión igual o posterior no se pisa
+    sql = """UPDATE SocialJobs SET status = %s, results = %s, error = %s, version = %s,
+                 finishedAt = FROM_UNIXTIME(%s)
+             WHERE id = %s AND version < %s"""
+    _, error = execute_query(sql, (job['status'], results, (job['error'] or '')[:500] or None, job['version'],
+                                   job['finishedAt'], job['id'], job['version']), commit=True)
+    return error
+
+SOCIAL_JOB_RETENTION_DAYS = int(os.getenv('SOCIAL_JOB_RETENTION_DAYS', 7))
+
+# Cliente de red: mock local por defecto, o API HTTP (real o servidor mock) si SOCIAL_API_URL está definida
+SOCIAL_API_URL = os.getenv('SOCIAL_API_URL')
+social_client = HttpSocialClient(SOCIAL_API_URL) if SOCIAL_API_URL else MockSocialClient()
+publish_queue = PublishQueue(
+    social_client, save_social_logs, save_social_job,
+    workers=int(os.getenv('SOCIAL_WORKERS', 4)),
+    max_retries=int(os.getenv('SOCIAL_MAX_RETRIES', 3)),
+    backoff=float(os.getenv('SOCIAL_BACKOFF', 0.5)),
+    on_error=lambda job_id, e: app.logger.warning("Estado del trabajo de publicación %s: %s", job_id, e),
+)
+os.register_at_fork(after_in_child=publish_queue.reset_after_fork)
+
 @app.route('/api/social/publish', methods=['POST'])
 def publish_social():
     """
-    Publicar propiedad en redes sociales (Mock)
+    Encolar publicación de propiedad en redes sociales
     ---
     tags:
       - Social
@@ -846,20 +2706,67 @@ def publish_social():
           type: object
           properties:
             propertyId: {type: integer}
-            networks: {type: array, items: {type: string}}
+            networks: {type: array, items: {type: string, enum: ['FACEBOOK', 'INSTAGRAM', 'TIKTOK', 'PORTAL_WEB']}}
+    responses:
+      202: {description: Trabajo encolado, retorna jobId}
+      400: {description: Redes inválidas}
+      404: {description: Propiedad no encontrada}
     """
     req = request.json
     prop_id = req.get('propertyId')
-    networks = req.get('networks') # ['FACEBOOK', 'INSTAGRAM']
+    networks = req.get('networks') or [] # ['FACEBOOK', 'INSTAGRAM']
     
-    # Aquí iría la lógica de conexión con APIs de Meta/TikTok
-    # Por ahora, registramos el log en la BD
-    for net in networks:
-        sql = "INSERT INTO SocialMediaLogs (propertyId, network, postUrl) VALUES (%s, %s, %s)"
-        # URL simulada
-        execute_query(sql, (prop_id, net, f"https://{net.lower()}.com/post/mock123"), commit=True)
-        
-    return jsonify({"message": "Publicado exitosamente en redes seleccionadas"})
+    invalid = [net for net in networks if net not in NETWORKS]
+    if not networks or invalid:
+        return jsonify({"error": f"Redes inválidas: {invalid or networks}"}), 400
+
+    sql = "SELECT id as propertyId, title, price, currency, operation, city FROM Properties WHERE id = %s"
+    prop, error = execute_query(sql, (prop_id,))
+    if error: return jsonify({"error": error}), 500
+    if not prop: return jsonify({"error": "Propiedad no encontrada"}), 404
+    
+    # La publicación real ocurre en segundo plano (workers de publish_queue)
+    job_id, error = publish_queue.enqueue(prop[0], list(dict.fromkeys(networks)))
+    if error: return jsonify({"error": error}), 500
+    response = jsonify({"message": "Publicación encolada", "jobId": job_id})
+    response.headers['Location'] = url_for('social_job_status', job_id=job_id)
+    return response, 202
+
+@app.route('/api/social/jobs/<job_id>', methods=['GET'])
+def social_job_status(job_id):
+    """
+    Estado de un trabajo de publicación (resultado por red)
+    ---
+    tags:
+      - Social
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200: {description: "Estado del trabajo: EN_PROCESO, COMPLETADO, PARCIAL, FALLIDO o ERROR_REGISTRO"}
+      404: {description: Trabajo no encontrado}
+    """
+    # Primario: el trabajo puede haberse encolado recién en otro worker
+    sql = """SELECT id, propertyId, status, results, error, createdAt, finishedAt
+             FROM SocialJobs WHERE id = %s"""
+    rows, error = execute_query(sql, (job_id,), prepared=True, primary=True)
+    if error: return jsonify({"error": error}), 500
+    if not rows: return jsonify({"error": "Trabajo no encontrado"}), 404
+    job = rows[0]
+    job['results'] = json.loads(job['results'])
+    return jsonify(job)
+
+@app.cli.command('purge-social-jobs')
+def purge_social_jobs_command():
+    """Borra los trabajos de publicación terminados hace más de SOCIAL_JOB_RETENTION_DAYS días (cron)."""
+    _, error = execute_query("DELETE FROM SocialJobs WHERE finishedAt < NOW() - INTERVAL %s DAY",
+                             (SOCIAL_JOB_RETENTION_DAYS,), commit=True)
+    if error:
+        print(error)
+        sys.exit(1)
+    print(f"Trabajos de publicación depurados (retención {SOCIAL_JOB_RETENTION_DAYS} días)")
 
 # ==========================================
 # RUTAS: PUBLICACIONES INTERNAS (Noticias)
@@ -935,28 +2842,273 @@ def dashboard_summary():
     responses:
       200: {description: Estadísticas generales}
     """
-    # Contadores rápidos para la home
-    stats = {}
-    
-    res_prop, _ = execute_query("SELECT status, COUNT(*) as count FROM Properties GROUP BY status")
-    stats['inventory_status'] = res_prop
-    
-    res_users, _ = execute_query("SELECT COUNT(*) as count FROM Users WHERE isActive=1")
-    stats['active_agents'] = res_users[0]['count'] if res_users else 0
-    
-    # Ventas del mes actual (Solo APROBADAS)
-    sql_sales = """SELECT SUM(totalCommission) as total_income, COUNT(*) as sales_count 
-                   FROM Sales WHERE MONTH(closedAt) = MONTH(CURRENT_DATE()) 
-                   AND YEAR(closedAt) = YEAR(CURRENT_DATE())
-                   AND status = 'APROBADO'"""
-    res_sales, _ = execute_query(sql_sales)
-    stats['monthly_sales'] = res_sales[0] if res_sales else {}
-    
-    # Cierres pendientes de aprobación
-    res_pending, _ = execute_query("SELECT COUNT(*) as count FROM Sales WHERE status = 'PENDIENTE'")
-    stats['pending_approvals'] = res_pending[0]['count'] if res_pending else 0
-    
+    # Contadores rápidos para la home (tabla materializada DashboardCounters)
+    stats, error = get_dashboard_stats()
+    if error: return jsonify({"error": error}), 500
     return jsonify(stats)
 
+@app.route('/api/dashboard/reconcile', methods=['POST'])
+def dashboard_reconcile():
+    """
+    Reconstruir los contadores del Dashboard y reportar diferencias (Admin)
+    ---
+    tags:
+      - Dashboard
+    responses:
+      200: {description: Lista de contadores corregidos (valor guardado vs. real)}
+    """
+    drift, error = execute_procedure('sp_Dashboard_Reconcile')
+    if error: return jsonify({"error": error}), 500
+    return jsonify({"message": "Contadores reconstruidos", "drift": drift})
+
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Reconstruye DashboardCounters e imprime el drift (para cron)."""
+    drift, error = execute_procedure('sp_Dashboard_Reconcile')
+    if error:
+        print(f"Error reconciliando contadores: {error}")
+        return
+    for row in drift:
+        print(f"{row['name']}: guardado={row['stored']} real={row['actual']} drift={row['drift']}")
+    print(f"{len(drift)} contadores corregidos")
+
+@app.cli.command('rebuild-sales-rollup')
+def rebuild_sales_rollup_command():
+    """Reconstruye SalesDailyRollup desde Sales (carga inicial o corrección)."""
+    _, error = execute_procedure('sp_Rollup_Rebuild')
+    print(f"Error reconstruyendo rollup: {error}" if error else "Rollup de ventas reconstruido")
+
+# ==========================================
+# RUTAS: SISTEMA (Monitoreo)
+# ==========================================
+
+@app.route('/api/system/health', methods=['GET'])
+def health():
+    """
+    Estado del servicio y del circuit breaker de la base de datos
+    ---
+    tags:
+      - System
+    responses:
+      200: {description: Base de datos disponible (circuito cerrado)}
+      503: {description: Circuito abierto o en prueba; las lecturas cacheadas pueden servirse obsoletas}
+    """
+    breaker = db_breaker.stats()
+    pool = db_pool.stats()
+    data = {
+        'status': 'ok' if breaker['state'] == 'closed' else 'degraded',
+        'database': breaker,
+        'pool': {key: pool[key] for key in ('size', 'checked_out', 'idle', 'timeouts')},
+        'cache': {key: value for key, value in query_cache.stats().items() if key in ('enabled', 'stale_hits')},
+        'replicas': {name: {key: r[key] for key in ('lag', 'checked_ago', 'last_error')}
+                     for name, r in replica_router.stats()['replicas'].items()},
+    }
+    response = jsonify(data)
+    if breaker['state'] != 'closed':
+        response.status_code = 503
+        response.headers['Retry-After'] = str(int(breaker['retry_in'] or db_breaker.reset_timeout))
+    return response
+
+@app.route('/api/system/pool', methods=['GET'])
+def pool_stats():
+    """
+    Estadísticas del pool de conexiones MySQL
+    ---
+    tags:
+      - System
+    responses:
+      200: {description: Conexiones en uso, ociosas, desborde y contadores de espera}
+    """
+    return jsonify(db_pool.stats())
+
+@app.route('/api/system/replicas', methods=['GET'])
+def replica_stats():
+    """
+    Estado de las réplicas de lectura y del enrutamiento
+    ---
+    tags:
+      - System
+    responses:
+      200: {description: Lag por réplica y lecturas enviadas a réplicas o al primario (lag, read_your_writes)}
+    """
+    return jsonify(replica_router.stats())
+
+@app.route('/api/system/cache', methods=['GET'])
+def cache_stats():
+    """
+    Estadísticas de la caché de lectura (hits, misses, tamaño)
+    ---
+    tags:
+      - System
+    responses:
+      200: {description: Aciertos, fallos, entradas y bytes usados}
+    """
+    return jsonify(query_cache.stats())
+
+@app.route('/api/system/admission', methods=['GET', 'PUT'])
+def admission_settings():
+    """
+    Límites de admisión por clase (consultar o cambiar en caliente)
+    ---
+    tags:
+      - System
+    put:
+      summary: Cambiar límites de una o más clases
+      parameters:
+        - name: body
+          in: body
+          schema:
+            type: object
+            example: {"heavy": {"limit": 2, "max_queue": 2, "timeout": 5, "retry_after": 30}}
+      responses:
+        200: {description: Estado actualizado}
+        400: {description: Clase o valor inválido}
+    responses:
+      200: {description: Límites, en uso, en cola y rechazos por clase}
+    """
+    if request.method == 'PUT':
+        try:
+            admission.configure(request.json or {})
+        except KeyError as e:
+            return jsonify({"error": f"Clase de admisión desconocida: {e.args[0]}"}), 400
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Valor inválido: {e}"}), 400
+    return jsonify(admission.stats())
+
+pool_gauge = metrics.registry.register(metrics.Gauge('db_pool', 'Estado del pool de conexiones', ('stat',)))
+cache_gauge = metrics.registry.register(metrics.Gauge('query_cache', 'Estado de la caché de lectura', ('stat',)))
+circuit_gauge = metrics.registry.register(metrics.Gauge(
+    'db_circuit_state', 'Circuit breaker de MySQL: 0 cerrado, 1 en prueba, 2 abierto'))
+CIRCUIT_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+admission_gauge = metrics.registry.register(metrics.Gauge(
+    'admission', 'Estado del control de admisión por clase', ('class', 'stat')))
+replica_lag_gauge = metrics.registry.register(metrics.Gauge(
+    'db_replica_lag_seconds', 'Retraso de cada réplica (-1 si está fuera de rotación)', ('replica',)))
+read_routing_gauge = metrics.registry.register(metrics.Gauge(
+    'db_read_routing', 'Lecturas enviadas a réplicas o al primario y el motivo', ('target',)))
+change_feed_gauge = metrics.registry.register(metrics.Gauge(
+    'change_feed', 'Suscriptores SSE y eventos publicados por el feed de cambios', ('stat',)))
+image_pipeline_gauge = metrics.registry.register(metrics.Gauge(
+    'image_pipeline', 'Derivados de imágenes: pendientes, generados y caché en disco', ('stat',)))
+
+def collect_system_gauges():
+    for key, value in db_pool.stats().items():
+        pool_gauge.set(key, value=value)
+    for key, value in query_cache.stats().items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cache_gauge.set(key, value=value)
+    circuit_gauge.set(value=CIRCUIT_STATE_VALUES[db_breaker.state])
+    for name, cls in admission.classes.items():
+        for key, value in cls.stats().items():
+            admission_gauge.set(name, key, value=value)
+    replicas = replica_router.stats()
+    for name, replica in replicas['replicas'].items():
+        replica_lag_gauge.set(name, value=-1 if replica['lag'] is None else replica['lag'])
+    for target, value in replicas['routed'].items():
+        read_routing_gauge.set(target, value=value)
+    for key, value in change_feed.stats().items():
+        if value is not None:
+            change_feed_gauge.set(key, value=value)
+    for key, value in image_pipeline.stats().items():
+        image_pipeline_gauge.set(key, value=value)
+
+metrics.registry.add_collector(collect_system_gauges)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    Métricas en formato Prometheus
+    ---
+    tags:
+      - System
+    produces:
+      - text/plain
+    responses:
+      200: {description: Histogramas de latencia por endpoint y por consulta, pool y caché}
+    """
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+# ==========================================
+# ARRANQUE (Spec OpenAPI y plantillas precompiladas)
+# ==========================================
+
+@app.cli.command('export-openapi')
+def export_openapi_command():
+    """Genera el spec OpenAPI desde los docstrings en OPENAPI_SPEC_FILE (paso de build/deploy)."""
+    if OPENAPI_PRECOMPILED:
+        print("Ejecutar sin OPENAPI_PRECOMPILED=1: el spec debe generarse desde los docstrings")
+        sys.exit(1)
+    spec = export_spec(app, OPENAPI_SPEC_FILE)
+    print(f"Spec OpenAPI ({len(spec.get('paths', {}))} rutas) guardado en {OPENAPI_SPEC_FILE}")
+
+@app.cli.command('check-openapi')
+def check_openapi_command():
+    """Falla (código 1) si OPENAPI_SPEC_FILE no corresponde a las rutas actuales (para CI)."""
+    try:
+        check_spec(app, load_spec(OPENAPI_SPEC_FILE))
+    except (OSError, ValueError, StaleSpecError) as e:
+        print(e)
+        sys.exit(1)
+    print(f"Spec OpenAPI al día: {OPENAPI_SPEC_FILE}")
+
+if openapi_spec is not None:
+    # Un spec desactualizado no debe llegar a producción: el worker no arranca
+    check_spec(app, openapi_spec)
+if JINJA_PRECOMPILE:
+    precompile_templates(app, JINJA_CACHE_DIR)
+
+# ==========================================
+# CICLO DE VIDA DEL WORKER (Producción: gunicorn.conf.py)
+# ==========================================
+
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', db_pool.size))
+
+def warm_up():
+    """
+    Prepara el worker antes de aceptar tráfico: abre conexiones del pool, llena las cachés
+    de datos de referencia y compila las plantillas. Un fallo (ej: BD caída) se registra
+    pero no impide arrancar; el pool reintentará en las peticiones.
+    """
+    start = time.perf_counter()
+    opened = []
+    try:
+        for _ in range(min(WARMUP_CONNECTIONS, db_pool.size)):
+            opened.append(db_pool.acquire())
+    except Error as e:
+        app.logger.warning("Warm-up: no se pudieron abrir conexiones: %s", e)
+    finally:
+        for conn in opened:
+            db_pool.release(conn)
+
+    # Medir el lag antes de la primera petición; hasta entonces las lecturas irían al primario
+    replica_router.check_all()
+
+    with app.app_context():
+        _, error = execute_procedure('sp_User_List', cache_ttl=CACHE_TTL_REFERENCE, cache_tags=('users',))
+        if not error:
+            _, error = get_dashboard_stats()
+        if error:
+            app.logger.warning("Warm-up: no se pudieron cargar las cachés: %s", error)
+
+    templates = precompile_templates(app, JINJA_CACHE_DIR)
+    app.logger.info("Worker %s listo en %.0f ms (%d conexiones, %d plantillas)",
+                    os.getpid(), (time.perf_counter() - start) * 1000, len(opened), templates)
+
+def close_streams():
+    """Termina los streams SSE abiertos (al recibir SIGTERM): si no, retendrían el worker hasta graceful_timeout."""
+    change_feed.stop()
+
+def drain():
+    """
+    Apagado ordenado del worker (las peticiones en curso ya terminaron): espera las
+    publicaciones encoladas y los derivados de imágenes y cierra las conexiones.
+    """
+    change_feed.stop()
+    publish_queue.shutdown(wait=True)
+    image_pipeline.shutdown(wait=True)
+    replica_router.stop()
+    db_pool.dispose()
+
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Servidor de desarrollo. En producción: gunicorn app:app (ver gunicorn.conf.py)
+    app.run(debug=os.getenv('FLASK_DEBUG', '1') == '1', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -29,7 +29,9 @@ CREATE TABLE IF NOT EXISTS `Clients` (
   `isOwner` TINYINT(1) DEFAULT 1, 
   `notes` TEXT,
   `createdAt` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-  PRIMARY KEY (`id`)
+  PRIMARY KEY (`id`),
+  KEY `idx_client_created` (`createdAt`, `id`),
+  KEY `idx_client_dni` (`dniRuc`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Tabla de Propiedades (Inventario)
@@ -52,6 +54,14 @@ CREATE TABLE IF NOT EXISTS `Properties` (
   PRIMARY KEY (`id`),
   KEY `fk_property_agent` (`agentId`),
   KEY `fk_property_owner` (`ownerId`),
+  -- Índices compuestos para paginación keyset (createdAt, id) y filtros del listado
+  KEY `idx_property_created` (`createdAt`, `id`),
+  KEY `idx_property_status_created` (`status`, `createdAt`, `id`),
+  KEY `idx_property_agent_created` (`agentId`, `createdAt`, `id`),
+  KEY `idx_property_city_operation_created` (`city`, `operation`, `createdAt`, `id`),
+  KEY `idx_property_operation_price` (`operation`, `price`),
+  KEY `idx_property_updated` (`updatedAt`, `id`),
+  FULLTEXT KEY `ft_property_text` (`title`, `description`, `address`),
   CONSTRAINT `fk_property_agent` FOREIGN KEY (`agentId`) REFERENCES `Users` (`id`),
   CONSTRAINT `fk_property_owner` FOREIGN KEY (`ownerId`) REFERENCES `Clients` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -64,11 +74,30 @@ CREATE TABLE IF NOT EXISTS `Documents` (
   `type` ENUM('PARTIDA_REGISTRAL', 'ESCRITURA_PUBLICA', 'HR_PU', 'DNI_PROPIETARIO', 'CONTRATO_FIRMADO', 'POSESION', 'OTRO') NOT NULL,
   `propertyId` INT NOT NULL,
   `uploadedAt` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- Archivo en el almacén de documentos (NULL si url es un enlace externo)
+  `sha256` CHAR(64) CHARACTER SET ascii DEFAULT NULL,
+  `size` BIGINT DEFAULT NULL,
+  `contentType` VARCHAR(100) DEFAULT NULL,
   PRIMARY KEY (`id`),
   KEY `fk_document_property` (`propertyId`),
+  KEY `idx_document_sha256` (`sha256`),
   CONSTRAINT `fk_document_property` FOREIGN KEY (`propertyId`) REFERENCES `Properties` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Galería de fotos de una propiedad (el original está en el almacén de documentos bajo sha256;
+-- los derivados thumbnail/card/full se sirven en /api/images/<sha256>/<variante>)
+CREATE TABLE IF NOT EXISTS `PropertyPhotos` (
+  `id` INT NOT NULL AUTO_INCREMENT,
+  `propertyId` INT NOT NULL,
+  `sha256` CHAR(64) CHARACTER SET ascii NOT NULL,
+  `position` INT NOT NULL DEFAULT 0,
+  `createdAt` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`id`),
+  KEY `idx_photo_property_position` (`propertyId`, `position`, `id`),
+  KEY `idx_photo_sha256` (`sha256`),
+  CONSTRAINT `fk_photo_property` FOREIGN KEY (`propertyId`) REFERENCES `Properties` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Tabla de Logs de Publicación en Redes Sociales
 CREATE TABLE IF NOT EXISTS `SocialMediaLogs` (
   `id` INT NOT NULL AUTO_INCREMENT,
@@ -80,6 +109,21 @@ CREATE TABLE IF NOT EXISTS `SocialMediaLogs` (
   CONSTRAINT `fk_social_property` FOREIGN KEY (`propertyId`) REFERENCES `Properties` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Trabajos de publicación en redes (estado compartido por todos los workers de la app)
+CREATE TABLE IF NOT EXISTS `SocialJobs` (
+  `id` CHAR(32) CHARACTER SET ascii NOT NULL,
+  `propertyId` INT NOT NULL,
+  `status` ENUM('EN_PROCESO', 'COMPLETADO', 'PARCIAL', 'FALLIDO', 'ERROR_REGISTRO') NOT NULL DEFAULT 'EN_PROCESO',
+  `results` JSON NOT NULL,     -- {red: {status, attempts, postUrl?, error?}}
+  `error` VARCHAR(500) DEFAULT NULL,
+  `version` INT NOT NULL DEFAULT 1,
+  `createdAt` TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  `finishedAt` TIMESTAMP NULL DEFAULT NULL,
+  PRIMARY KEY (`id`),
+  KEY `idx_socialjob_created` (`createdAt`),
+  CONSTRAINT `fk_socialjob_property` FOREIGN KEY (`propertyId`) REFERENCES `Properties` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Tabla de Ventas / Cierres (Finanzas)
 CREATE TABLE IF NOT EXISTS `Sales` (
   `id` INT NOT NULL AUTO_INCREMENT,
@@ -99,6 +143,7 @@ CREATE TABLE IF NOT EXISTS `Sales` (
   `notes` TEXT,
   PRIMARY KEY (`id`),
   UNIQUE KEY `property_unique` (`propertyId`),
+  KEY `idx_sale_status_closed` (`status`, `closedAt`),
   CONSTRAINT `fk_sale_property` FOREIGN KEY (`propertyId`) REFERENCES `Properties` (`id`),
   CONSTRAINT `fk_sale_listing_agent` FOREIGN KEY (`listingAgentId`) REFERENCES `Users` (`id`),
   CONSTRAINT `fk_sale_selling_agent` FOREIGN KEY (`sellingAgentId`) REFERENCES `Users` (`id`)
@@ -116,6 +161,44 @@ CREATE TABLE IF NOT EXISTS `InternalPosts` (
   CONSTRAINT `fk_post_author` FOREIGN KEY (`authorId`) REFERENCES `Users` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Rollup diario de ventas APROBADAS por agente captador, operación y moneda (mantenido por triggers)
+CREATE TABLE IF NOT EXISTS `SalesDailyRollup` (
+  `day` DATE NOT NULL,
+  `agentId` INT NOT NULL,
+  `operation` ENUM('VENTA', 'ALQUILER') NOT NULL,
+  `currency` CHAR(3) NOT NULL,
+  `salesCount` INT NOT NULL DEFAULT 0,
+  `totalFinalPrice` DECIMAL(16, 2) NOT NULL DEFAULT 0,
+  `totalCommission` DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`day`, `agentId`, `operation`, `currency`),
+  KEY `idx_rollup_agent_day` (`agentId`, `day`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Contadores materializados del Dashboard (mantenidos por triggers)
+-- Claves: 'properties:<STATUS>', 'users:active', 'sales:pending',
+--         'sales:count:<YYYY-MM>', 'sales:income:<YYYY-MM>'
+CREATE TABLE IF NOT EXISTS `DashboardCounters` (
+  `name` VARCHAR(60) NOT NULL,
+  `value` DECIMAL(14, 2) NOT NULL DEFAULT 0,
+  `updatedAt` TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`name`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Registro de cambios para sincronización incremental y eventos (mantenido por triggers)
+-- seq es la marca de agua de los clientes (?since=); op 'delete' son las lápidas de los borrados.
+-- event (si no es NULL) se publica por SSE: 'sale.registered', 'sale.approved', 'sale.status', 'property.status'
+CREATE TABLE IF NOT EXISTS `ChangeLog` (
+  `seq` BIGINT NOT NULL AUTO_INCREMENT,
+  `entity` ENUM('property', 'sale', 'document') NOT NULL,
+  `entityId` INT NOT NULL,
+  `op` ENUM('upsert', 'delete') NOT NULL,
+  `event` VARCHAR(40) DEFAULT NULL,
+  `payload` JSON DEFAULT NULL,
+  `changedAt` TIMESTAMP(3) DEFAULT CURRENT_TIMESTAMP(3),
+  PRIMARY KEY (`seq`),
+  KEY `idx_changelog_changed` (`changedAt`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 
 -- 2. TRIGGERS (AUTOMATIZACIÓN)
 -- ==========================================================================
@@ -138,13 +221,25 @@ BEGIN
             UPDATE Properties SET status = 'ALQUILADO' WHERE id = NEW.propertyId;
         END IF;
     END IF;
+
+    -- Contadores del Dashboard y rollup de reportes
+    CALL sp_Counter_ApplySale(NEW.status, NEW.closedAt, NEW.totalCommission, 1);
+    CALL sp_Rollup_ApplySale(NEW.propertyId, NEW.status, NEW.closedAt, NEW.listingAgentId, NEW.finalPrice, NEW.totalCommission, 1);
+
+    CALL sp_Change_Log('sale', NEW.id, 'upsert', 'sale.registered',
+                       JSON_OBJECT('propertyId', NEW.propertyId, 'status', NEW.status));
 END //
 
 DROP TRIGGER IF EXISTS `trg_UpdateStatusOnSaleUpdate` //
 CREATE TRIGGER `trg_UpdateStatusOnSaleUpdate` AFTER UPDATE ON `Sales`
 FOR EACH ROW
-BEGIN
+sale_update: BEGIN
     DECLARE opType VARCHAR(20);
+
+    -- sp_Sale_BulkTransition hace este mismo trabajo en bloque para todas sus filas
+    IF @sale_bulk_transition = 1 THEN
+        LEAVE sale_update;
+    END IF;
     
     IF NEW.status = 'APROBADO' AND OLD.status != 'APROBADO' THEN
         SELECT operation INTO opType FROM Properties WHERE id = NEW.propertyId;
@@ -154,6 +249,127 @@ BEGIN
             UPDATE Properties SET status = 'ALQUILADO' WHERE id = NEW.propertyId;
         END IF;
     END IF;
+
+    -- Contadores del Dashboard y rollup: se resta la fila anterior y se suma la nueva
+    IF NOT (OLD.status <=> NEW.status AND OLD.closedAt <=> NEW.closedAt
+            AND OLD.totalCommission <=> NEW.totalCommission AND OLD.finalPrice <=> NEW.finalPrice
+            AND OLD.listingAgentId <=> NEW.listingAgentId) THEN
+        CALL sp_Counter_ApplySale(OLD.status, OLD.closedAt, OLD.totalCommission, -1);
+        CALL sp_Counter_ApplySale(NEW.status, NEW.closedAt, NEW.totalCommission, 1);
+        CALL sp_Rollup_ApplySale(OLD.propertyId, OLD.status, OLD.closedAt, OLD.listingAgentId, OLD.finalPrice, OLD.totalCommission, -1);
+        CALL sp_Rollup_ApplySale(NEW.propertyId, NEW.status, NEW.closedAt, NEW.listingAgentId, NEW.finalPrice, NEW.totalCommission, 1);
+    END IF;
+
+    CALL sp_Change_Log('sale', NEW.id, 'upsert',
+        CASE WHEN NEW.status = 'APROBADO' AND OLD.status != 'APROBADO' THEN 'sale.approved'
+             WHEN NOT (OLD.status <=> NEW.status) THEN 'sale.status' END,
+        JSON_OBJECT('propertyId', NEW.propertyId, 'status', NEW.status, 'previous', OLD.status));
+END //
+
+-- TRIGGERS: Contadores materializados del Dashboard
+DROP TRIGGER IF EXISTS `trg_CountSaleDelete` //
+CREATE TRIGGER `trg_CountSaleDelete` AFTER DELETE ON `Sales`
+FOR EACH ROW
+BEGIN
+    CALL sp_Counter_ApplySale(OLD.status, OLD.closedAt, OLD.totalCommission, -1);
+    CALL sp_Rollup_ApplySale(OLD.propertyId, OLD.status, OLD.closedAt, OLD.listingAgentId, OLD.finalPrice, OLD.totalCommission, -1);
+    CALL sp_Change_Log('sale', OLD.id, 'delete', NULL, NULL);
+END //
+
+DROP TRIGGER IF EXISTS `trg_CountPropertyInsert` //
+CREATE TRIGGER `trg_CountPropertyInsert` AFTER INSERT ON `Properties`
+FOR EACH ROW
+BEGIN
+    CALL sp_Counter_Add(CONCAT('properties:', NEW.status), 1);
+    CALL sp_Change_Log('property', NEW.id, 'upsert', NULL, NULL);
+END //
+
+DROP TRIGGER IF EXISTS `trg_CountPropertyUpdate` //
+CREATE TRIGGER `trg_CountPropertyUpdate` AFTER UPDATE ON `Properties`
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.status <=> NEW.status) THEN
+        CALL sp_Counter_Add(CONCAT('properties:', OLD.status), -1);
+        CALL sp_Counter_Add(CONCAT('properties:', NEW.status), 1);
+    END IF;
+
+    -- Los cambios de estado (incluidos los que hace el trigger de Sales) se publican como evento
+    CALL sp_Change_Log('property', NEW.id, 'upsert',
+        IF(OLD.status <=> NEW.status, NULL, 'property.status'),
+        IF(OLD.status <=> NEW.status, NULL,
+           JSON_OBJECT('status', NEW.status, 'previous', OLD.status, 'agentId', NEW.agentId)));
+END //
+
+DROP TRIGGER IF EXISTS `trg_CountPropertyDelete` //
+CREATE TRIGGER `trg_CountPropertyDelete` AFTER DELETE ON `Properties`
+FOR EACH ROW
+BEGIN
+    CALL sp_Counter_Add(CONCAT('properties:', OLD.status), -1);
+    CALL sp_Change_Log('property', OLD.id, 'delete', NULL, NULL);
+END //
+
+DROP TRIGGER IF EXISTS `trg_CountUserInsert` //
+CREATE TRIGGER `trg_CountUserInsert` AFTER INSERT ON `Users`
+FOR EACH ROW
+BEGIN
+    IF NEW.isActive = 1 THEN
+        CALL sp_Counter_Add('users:active', 1);
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS `trg_CountUserUpdate` //
+CREATE TRIGGER `trg_CountUserUpdate` AFTER UPDATE ON `Users`
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.isActive <=> NEW.isActive) THEN
+        CALL sp_Counter_Add('users:active', IF(NEW.isActive = 1, 1, 0) - IF(OLD.isActive = 1, 1, 0));
+    END IF;
+END //
+
+DROP TRIGGER IF EXISTS `trg_CountUserDelete` //
+CREATE TRIGGER `trg_CountUserDelete` AFTER DELETE ON `Users`
+FOR EACH ROW
+BEGIN
+    IF OLD.isActive = 1 THEN
+        CALL sp_Counter_Add('users:active', -1);
+    END IF;
+END //
+
+-- TRIGGERS: Registro de cambios de documentos (sincronización incremental)
+DROP TRIGGER IF EXISTS `trg_LogDocumentInsert` //
+CREATE TRIGGER `trg_LogDocumentInsert` AFTER INSERT ON `Documents`
+FOR EACH ROW
+BEGIN
+    CALL sp_Change_Log('document', NEW.id, 'upsert', NULL, NULL);
+END //
+
+DROP TRIGGER IF EXISTS `trg_LogDocumentUpdate` //
+CREATE TRIGGER `trg_LogDocumentUpdate` AFTER UPDATE ON `Documents`
+FOR EACH ROW
+BEGIN
+    CALL sp_Change_Log('document', NEW.id, 'upsert', NULL, NULL);
+END //
+
+DROP TRIGGER IF EXISTS `trg_LogDocumentDelete` //
+CREATE TRIGGER `trg_LogDocumentDelete` AFTER DELETE ON `Documents`
+FOR EACH ROW
+BEGIN
+    CALL sp_Change_Log('document', OLD.id, 'delete', NULL, NULL);
+END //
+
+-- La galería es parte de la propiedad: un cambio de fotos la vuelve a sincronizar
+DROP TRIGGER IF EXISTS `trg_LogPhotoInsert` //
+CREATE TRIGGER `trg_LogPhotoInsert` AFTER INSERT ON `PropertyPhotos`
+FOR EACH ROW
+BEGIN
+    CALL sp_Change_Log('property', NEW.propertyId, 'upsert', NULL, NULL);
+END //
+
+DROP TRIGGER IF EXISTS `trg_LogPhotoDelete` //
+CREATE TRIGGER `trg_LogPhotoDelete` AFTER DELETE ON `PropertyPhotos`
+FOR EACH ROW
+BEGIN
+    CALL sp_Change_Log('property', OLD.propertyId, 'upsert', NULL, NULL);
 END //
 
 DELIMITER ;
@@ -212,17 +428,29 @@ BEGIN
 END //
 
 DROP PROCEDURE IF EXISTS `sp_Property_List` //
+-- Listado paginado por cursor (keyset): devuelve las filas anteriores a (p_afterCreatedAt, p_afterId)
+-- en orden (createdAt DESC, id DESC). Todos los filtros son opcionales (NULL = sin filtro).
 CREATE PROCEDURE `sp_Property_List`(
     IN p_status VARCHAR(20) COLLATE utf8mb4_unicode_ci,
     IN p_agentId INT,
     IN p_viewerRole VARCHAR(10) COLLATE utf8mb4_unicode_ci,
-    IN p_viewerId INT
+    IN p_viewerId INT,
+    IN p_city VARCHAR(100) COLLATE utf8mb4_unicode_ci,
+    IN p_operation VARCHAR(20) COLLATE utf8mb4_unicode_ci,
+    IN p_minPrice DECIMAL(12, 2),
+    IN p_maxPrice DECIMAL(12, 2),
+    IN p_exclusive TINYINT(1),
+    IN p_afterCreatedAt TIMESTAMP,
+    IN p_afterId INT,
+    IN p_limit INT
 )
 BEGIN
     SELECT 
-        p.id, p.title, p.price, p.currency, p.operation, p.status, p.address,
-        p.commissionPct, p.exclusive,
+        p.id, p.title, p.price, p.currency, p.operation, p.status, p.address, p.city,
+        p.commissionPct, p.exclusive, p.createdAt,
         u.fullName as AgentName, u.phone as AgentPhone, u.photoUrl as AgentPhoto,
+        (SELECT ph.sha256 FROM PropertyPhotos ph WHERE ph.propertyId = p.id
+         ORDER BY ph.position, ph.id LIMIT 1) as CoverPhoto,
         CASE 
             WHEN p_viewerRole = 'ADMIN' OR p.agentId = p_viewerId THEN c.fullName 
             ELSE 'CONFIDENCIAL' 
@@ -236,7 +464,148 @@ BEGIN
     JOIN Clients c ON p.ownerId = c.id
     WHERE (p_status IS NULL OR p.status = p_status)
       AND (p_agentId IS NULL OR p.agentId = p_agentId)
-    ORDER BY p.createdAt DESC;
+      AND (p_city IS NULL OR p.city = p_city)
+      AND (p_operation IS NULL OR p.operation = p_operation)
+      AND (p_minPrice IS NULL OR p.price >= p_minPrice)
+      AND (p_maxPrice IS NULL OR p.price <= p_maxPrice)
+      AND (p_exclusive IS NULL OR p.exclusive = p_exclusive)
+      AND (p_afterCreatedAt IS NULL
+           OR p.createdAt < p_afterCreatedAt
+           OR (p.createdAt = p_afterCreatedAt AND p.id < p_afterId))
+    ORDER BY p.createdAt DESC, p.id DESC
+    LIMIT p_limit;
+END //
+
+-- Versión de una propiedad y sus hijos (base del ETag): cambia si cambia la propiedad,
+-- si se agregan/eliminan fotos, documentos o publicaciones, o si se registra/aprueba su venta.
+DROP FUNCTION IF EXISTS `fn_PropertyVersion` //
+CREATE FUNCTION `fn_PropertyVersion`(p_id INT) RETURNS VARCHAR(255)
+READS SQL DATA
+BEGIN
+    RETURN (
+        SELECT CONCAT_WS('|', p.updatedAt,
+            (SELECT CONCAT(COUNT(*), ':', IFNULL(MAX(d.id), 0)) FROM Documents d WHERE d.propertyId = p.id),
+            (SELECT CONCAT(COUNT(*), ':', IFNULL(MAX(l.id), 0)) FROM SocialMediaLogs l WHERE l.propertyId = p.id),
+            (SELECT CONCAT(COUNT(*), ':', IFNULL(MAX(ph.id), 0)) FROM PropertyPhotos ph WHERE ph.propertyId = p.id),
+            (SELECT CONCAT(s.id, ':', s.status, ':', s.closedAt) FROM Sales s WHERE s.propertyId = p.id))
+        FROM Properties p WHERE p.id = p_id
+    );
+END //
+
+DROP PROCEDURE IF EXISTS `sp_Property_Version` //
+CREATE PROCEDURE `sp_Property_Version`(IN p_id INT)
+BEGIN
+    SELECT fn_PropertyVersion(id) as version FROM Properties WHERE id = p_id;
+END //
+
+-- Detalle completo en una sola consulta: propiedad + fotos + documentos + publicaciones + venta (JSON)
+-- Fechas y montos van sin formatear: el backend les da el mismo formato que a las columnas de la fila
+DROP PROCEDURE IF EXISTS `sp_Property_Detail` //
+CREATE PROCEDURE `sp_Property_Detail`(IN p_id INT)
+BEGIN
+    SELECT p.*, u.fullName as AgentName, u.photoUrl as AgentPhoto, c.fullName as OwnerName,
+        fn_PropertyVersion(p.id) as version,
+        (SELECT COALESCE(JSON_ARRAYAGG(JSON_OBJECT(
+                    'id', ph.id, 'sha256', ph.sha256, 'position', ph.position)), JSON_ARRAY())
+         FROM PropertyPhotos ph WHERE ph.propertyId = p.id) as photos,
+        (SELECT COALESCE(JSON_ARRAYAGG(JSON_OBJECT(
+                    'id', d.id, 'name', d.name, 'url', d.url, 'type', d.type, 'propertyId', d.propertyId,
+                    'uploadedAt', d.uploadedAt, 'sha256', d.sha256, 'size', d.size,
+                    'contentType', d.contentType)), JSON_ARRAY())
+         FROM Documents d WHERE d.propertyId = p.id) as documents,
+        (SELECT COALESCE(JSON_ARRAYAGG(JSON_OBJECT(
+                    'id', l.id, 'network', l.network, 'postUrl', l.postUrl,
+                    'postedAt', l.postedAt)), JSON_ARRAY())
+         FROM SocialMediaLogs l WHERE l.propertyId = p.id) as socialLogs,
+        (SELECT JSON_OBJECT(
+                    'id', s.id, 'finalPrice', s.finalPrice, 'totalCommission', s.totalCommission,
+                    'listingAgentId', s.listingAgentId, 'sellingAgentId', s.sellingAgentId,
+                    'isShared', s.isShared, 'externalAgency', s.externalAgency, 'status', s.status,
+                    'closedAt', s.closedAt)
+         FROM Sales s WHERE s.propertyId = p.id) as sale
+    FROM Properties p
+    JOIN Users u ON p.agentId = u.id
+    JOIN Clients c ON p.ownerId = c.id
+    WHERE p.id = p_id;
+END //
+
+-- Búsqueda full-text con ranking por relevancia y facetas.
+-- p_query usa sintaxis BOOLEAN MODE (la arma el backend). Retorna 2 result sets:
+--   1) página de resultados ordenada por score
+--   2) conteos por (city, operation, status, currency, priceBucket) para sumar las facetas
+-- El MATCH se evalúa una sola vez y los aciertos se guardan en una tabla temporal.
+DROP PROCEDURE IF EXISTS `sp_Property_Search` //
+CREATE PROCEDURE `sp_Property_Search`(
+    IN p_query VARCHAR(255) COLLATE utf8mb4_unicode_ci,
+    IN p_status VARCHAR(20) COLLATE utf8mb4_unicode_ci,
+    IN p_city VARCHAR(100) COLLATE utf8mb4_unicode_ci,
+    IN p_operation VARCHAR(20) COLLATE utf8mb4_unicode_ci,
+    IN p_currency CHAR(3) COLLATE utf8mb4_unicode_ci,
+    IN p_minPrice DECIMAL(12, 2),
+    IN p_maxPrice DECIMAL(12, 2),
+    IN p_viewerRole VARCHAR(10) COLLATE utf8mb4_unicode_ci,
+    IN p_viewerId INT,
+    IN p_limit INT,
+    IN p_offset INT
+)
+BEGIN
+    DROP TEMPORARY TABLE IF EXISTS tmp_SearchHits;
+    CREATE TEMPORARY TABLE tmp_SearchHits (
+        id INT NOT NULL PRIMARY KEY,
+        score DOUBLE NOT NULL,
+        city VARCHAR(100) COLLATE utf8mb4_unicode_ci,
+        operation VARCHAR(20) COLLATE utf8mb4_unicode_ci,
+        status VARCHAR(20) COLLATE utf8mb4_unicode_ci,
+        currency CHAR(3) COLLATE utf8mb4_unicode_ci,
+        priceBucket VARCHAR(20) COLLATE utf8mb4_unicode_ci
+    ) ENGINE=MEMORY;
+
+    INSERT INTO tmp_SearchHits
+    SELECT p.id,
+           MATCH(p.title, p.description, p.address) AGAINST (p_query IN BOOLEAN MODE),
+           p.city, p.operation, p.status, p.currency,
+           CASE
+               WHEN p.price < 50000 THEN '0-50000'
+               WHEN p.price < 100000 THEN '50000-100000'
+               WHEN p.price < 200000 THEN '100000-200000'
+               WHEN p.price < 500000 THEN '200000-500000'
+               ELSE '500000+'
+           END
+    FROM Properties p
+    WHERE MATCH(p.title, p.description, p.address) AGAINST (p_query IN BOOLEAN MODE)
+      AND (p_status IS NULL OR p.status = p_status)
+      AND (p_city IS NULL OR p.city = p_city)
+      AND (p_operation IS NULL OR p.operation = p_operation)
+      AND (p_currency IS NULL OR p.currency = p_currency)
+      AND (p_minPrice IS NULL OR p.price >= p_minPrice)
+      AND (p_maxPrice IS NULL OR p.price <= p_maxPrice);
+
+    SELECT 
+        p.id, p.title, p.price, p.currency, p.operation, p.status, p.address, p.city,
+        p.commissionPct, p.exclusive, p.createdAt, h.score,
+        u.fullName as AgentName, u.phone as AgentPhone, u.photoUrl as AgentPhoto,
+        (SELECT ph.sha256 FROM PropertyPhotos ph WHERE ph.propertyId = p.id
+         ORDER BY ph.position, ph.id LIMIT 1) as CoverPhoto,
+        CASE 
+            WHEN p_viewerRole = 'ADMIN' OR p.agentId = p_viewerId THEN c.fullName 
+            ELSE 'CONFIDENCIAL' 
+        END as OwnerName,
+        CASE 
+            WHEN p_viewerRole = 'ADMIN' OR p.agentId = p_viewerId THEN c.phone 
+            ELSE NULL 
+        END as OwnerPhone
+    FROM tmp_SearchHits h
+    JOIN Properties p ON p.id = h.id
+    JOIN Users u ON p.agentId = u.id
+    JOIN Clients c ON p.ownerId = c.id
+    ORDER BY h.score DESC, p.id DESC
+    LIMIT p_limit OFFSET p_offset;
+
+    SELECT city, operation, status, currency, priceBucket, COUNT(*) as count
+    FROM tmp_SearchHits
+    GROUP BY city, operation, status, currency, priceBucket;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_SearchHits;
 END //
 
 -- SP CRÍTICO: Eliminar Propiedad (Borra documentos y ventas primero)
@@ -271,6 +640,35 @@ BEGIN
     VALUES (p_name, p_url, p_type, p_propertyId);
 END //
 
+-- Documento subido al almacén (blob ya guardado bajo p_sha256): url apunta a su descarga
+DROP PROCEDURE IF EXISTS `sp_Document_Store` //
+CREATE PROCEDURE `sp_Document_Store`(
+    IN p_name VARCHAR(100),
+    IN p_type VARCHAR(50),
+    IN p_propertyId INT,
+    IN p_sha256 CHAR(64),
+    IN p_size BIGINT,
+    IN p_contentType VARCHAR(100)
+)
+BEGIN
+    DECLARE v_id INT;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    START TRANSACTION;
+        INSERT INTO Documents (name, url, type, propertyId, sha256, size, contentType)
+        VALUES (p_name, '', p_type, p_propertyId, p_sha256, p_size, p_contentType);
+        SET v_id = LAST_INSERT_ID();
+        UPDATE Documents SET url = CONCAT('/api/documents/', v_id, '/content') WHERE id = v_id;
+
+        SELECT id, name, url, type, propertyId, uploadedAt, sha256, size, contentType
+        FROM Documents WHERE id = v_id;
+    COMMIT;
+END //
+
 -- ----------------------------
 -- SP: FINANZAS Y CIERRES
 -- ----------------------------
@@ -293,7 +691,112 @@ BEGIN
     VALUES (p_propertyId, p_finalPrice, p_totalCommission, p_listingAgentId, p_isShared, p_externalAgency, p_sharedPct, p_sellingAgentId, p_status);
 END //
 
--- Reporte de Dashboard (Filtrar ingresos por fecha)
+-- Aprobación/rechazo masivo (cierre de mes): una transacción y sentencias por conjunto.
+-- Solo pasan las ventas PENDIENTE; el trigger de Sales se omite (@sale_bulk_transition) y aquí
+-- se actualizan en bloque las propiedades (un solo JOIN), los contadores, el rollup y ChangeLog.
+-- Retorna un resultado por id: approved/rejected, already_approved/already_rejected,
+-- not_pending (en el otro estado final) o not_found.
+DROP PROCEDURE IF EXISTS `sp_Sale_BulkTransition` //
+CREATE PROCEDURE `sp_Sale_BulkTransition`(
+    IN p_ids JSON,
+    IN p_status VARCHAR(20) COLLATE utf8mb4_unicode_ci
+)
+BEGIN
+    DECLARE v_locked INT;
+    DECLARE v_count INT;
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        SET @sale_bulk_transition = NULL;
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_SaleIds;
+    CREATE TEMPORARY TABLE tmp_SaleIds (id INT NOT NULL PRIMARY KEY);
+    INSERT IGNORE INTO tmp_SaleIds
+        SELECT j.id FROM JSON_TABLE(p_ids, '$[*]' COLUMNS (id INT PATH '$')) j WHERE j.id IS NOT NULL;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_SaleTransition;
+    CREATE TEMPORARY TABLE tmp_SaleTransition (
+        id INT NOT NULL PRIMARY KEY,
+        propertyId INT NOT NULL,
+        previous VARCHAR(20) NOT NULL,
+        closedAt TIMESTAMP NULL,
+        listingAgentId INT NOT NULL,
+        finalPrice DECIMAL(12, 2) NOT NULL,
+        totalCommission DECIMAL(10, 2) NOT NULL,
+        operation VARCHAR(20) NOT NULL,
+        currency CHAR(3)
+    );
+
+    START TRANSACTION;
+        -- Bloquea las ventas pedidas: ninguna puede cambiar entre la lectura y la actualización
+        SELECT COUNT(*) INTO v_locked FROM Sales s JOIN tmp_SaleIds t ON t.id = s.id FOR UPDATE;
+
+        INSERT INTO tmp_SaleTransition
+            SELECT s.id, s.propertyId, s.status, s.closedAt, s.listingAgentId, s.finalPrice, s.totalCommission,
+                   p.operation, p.currency
+            FROM tmp_SaleIds t
+            JOIN Sales s ON s.id = t.id
+            JOIN Properties p ON p.id = s.propertyId
+            WHERE s.status = 'PENDIENTE';
+        SELECT COUNT(*) INTO v_count FROM tmp_SaleTransition;
+
+        IF v_count > 0 THEN
+            SET @sale_bulk_transition = 1;
+            UPDATE Sales s JOIN tmp_SaleTransition x ON x.id = s.id SET s.status = p_status;
+            SET @sale_bulk_transition = NULL;
+
+            CALL sp_Counter_Add('sales:pending', -v_count);
+
+            IF p_status = 'APROBADO' THEN
+                UPDATE Properties p
+                JOIN (SELECT DISTINCT propertyId, operation FROM tmp_SaleTransition) x ON x.propertyId = p.id
+                SET p.status = IF(x.operation = 'VENTA', 'VENDIDO', 'ALQUILADO');
+
+                INSERT INTO DashboardCounters (name, value)
+                    SELECT CONCAT('sales:count:', DATE_FORMAT(closedAt, '%Y-%m')), COUNT(*)
+                    FROM tmp_SaleTransition GROUP BY DATE_FORMAT(closedAt, '%Y-%m')
+                ON DUPLICATE KEY UPDATE value = value + VALUES(value);
+                INSERT INTO DashboardCounters (name, value)
+                    SELECT CONCAT('sales:income:', DATE_FORMAT(closedAt, '%Y-%m')), SUM(totalCommission)
+                    FROM tmp_SaleTransition GROUP BY DATE_FORMAT(closedAt, '%Y-%m')
+                ON DUPLICATE KEY UPDATE value = value + VALUES(value);
+
+                INSERT INTO SalesDailyRollup (day, agentId, operation, currency, salesCount, totalFinalPrice, totalCommission)
+                    SELECT DATE(closedAt), listingAgentId, operation, currency, COUNT(*), SUM(finalPrice), SUM(totalCommission)
+                    FROM tmp_SaleTransition GROUP BY DATE(closedAt), listingAgentId, operation, currency
+                ON DUPLICATE KEY UPDATE
+                    salesCount = SalesDailyRollup.salesCount + VALUES(salesCount),
+                    totalFinalPrice = SalesDailyRollup.totalFinalPrice + VALUES(totalFinalPrice),
+                    totalCommission = SalesDailyRollup.totalCommission + VALUES(totalCommission);
+            END IF;
+
+            INSERT INTO ChangeLog (entity, entityId, op, event, payload)
+                SELECT 'sale', id, 'upsert', IF(p_status = 'APROBADO', 'sale.approved', 'sale.status'),
+                       JSON_OBJECT('propertyId', propertyId, 'status', p_status, 'previous', previous)
+                FROM tmp_SaleTransition ORDER BY id;
+        END IF;
+
+        SELECT t.id, s.propertyId, s.status,
+            CASE
+                WHEN x.id IS NOT NULL THEN IF(p_status = 'APROBADO', 'approved', 'rejected')
+                WHEN s.id IS NULL THEN 'not_found'
+                WHEN s.status = p_status THEN IF(p_status = 'APROBADO', 'already_approved', 'already_rejected')
+                ELSE 'not_pending'
+            END as outcome
+        FROM tmp_SaleIds t
+        LEFT JOIN tmp_SaleTransition x ON x.id = t.id
+        LEFT JOIN Sales s ON s.id = t.id
+        ORDER BY t.id;
+    COMMIT;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_SaleIds;
+    DROP TEMPORARY TABLE IF EXISTS tmp_SaleTransition;
+END //
+
+-- Reporte detallado de ventas (Filtrar ingresos por fecha)
+-- Rango semiabierto [p_startDate, p_endDate + 1 día) sobre idx_sale_status_closed
 DROP PROCEDURE IF EXISTS `sp_Report_Sales` //
 CREATE PROCEDURE `sp_Report_Sales`(
     IN p_startDate DATE,
@@ -311,16 +814,256 @@ BEGIN
         u_capt.fullName as AgenteCaptador,
         CASE 
             WHEN s.isShared = 1 THEN CONCAT('EXTERNA: ', s.externalAgency)
-            WHEN s.sellingAgentId IS NOT NULL THEN (SELECT fullName FROM Users WHERE id = s.sellingAgentId)
+            WHEN s.sellingAgentId IS NOT NULL THEN u_cierre.fullName
             ELSE 'Mismo Captador'
         END as AgenteCierre
     FROM Sales s
     JOIN Properties p ON s.propertyId = p.id
     JOIN Users u_capt ON s.listingAgentId = u_capt.id
-    WHERE (DATE(s.closedAt) BETWEEN p_startDate AND p_endDate) AND s.status = 'APROBADO'
+    LEFT JOIN Users u_cierre ON s.sellingAgentId = u_cierre.id
+    WHERE s.status = 'APROBADO'
+      AND s.closedAt >= p_startDate
+      AND s.closedAt < p_endDate + INTERVAL 1 DAY
     ORDER BY s.closedAt DESC;
 END //
 
+-- Aplica (p_sign = 1) o revierte (p_sign = -1) una venta APROBADA en SalesDailyRollup
+DROP PROCEDURE IF EXISTS `sp_Rollup_ApplySale` //
+CREATE PROCEDURE `sp_Rollup_ApplySale`(
+    IN p_propertyId INT,
+    IN p_status VARCHAR(20),
+    IN p_closedAt TIMESTAMP,
+    IN p_agentId INT,
+    IN p_finalPrice DECIMAL(12, 2),
+    IN p_totalCommission DECIMAL(10, 2),
+    IN p_sign INT
+)
+BEGIN
+    IF p_status = 'APROBADO' THEN
+        INSERT INTO SalesDailyRollup (day, agentId, operation, currency, salesCount, totalFinalPrice, totalCommission)
+        SELECT DATE(p_closedAt), p_agentId, p.operation, p.currency, p_sign, p_sign * p_finalPrice, p_sign * p_totalCommission
+        FROM Properties p WHERE p.id = p_propertyId
+        ON DUPLICATE KEY UPDATE
+            salesCount = salesCount + VALUES(salesCount),
+            totalFinalPrice = totalFinalPrice + VALUES(totalFinalPrice),
+            totalCommission = totalCommission + VALUES(totalCommission);
+    END IF;
+END //
+
+-- Reconstruye SalesDailyRollup desde Sales (carga inicial sobre una base existente)
+DROP PROCEDURE IF EXISTS `sp_Rollup_Rebuild` //
+CREATE PROCEDURE `sp_Rollup_Rebuild`()
+BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    START TRANSACTION;
+        DELETE FROM SalesDailyRollup;
+        INSERT INTO SalesDailyRollup (day, agentId, operation, currency, salesCount, totalFinalPrice, totalCommission)
+        SELECT DATE(s.closedAt), s.listingAgentId, p.operation, p.currency,
+               COUNT(*), SUM(s.finalPrice), SUM(s.totalCommission)
+        FROM Sales s
+        JOIN Properties p ON s.propertyId = p.id
+        WHERE s.status = 'APROBADO'
+        GROUP BY DATE(s.closedAt), s.listingAgentId, p.operation, p.currency;
+    COMMIT;
+END //
+
+-- Reporte agregado desde el rollup: p_granularity = 'day' | 'month' | 'agent'
+DROP PROCEDURE IF EXISTS `sp_Report_SalesRollup` //
+CREATE PROCEDURE `sp_Report_SalesRollup`(
+    IN p_startDate DATE,
+    IN p_endDate DATE,
+    IN p_granularity VARCHAR(10)
+)
+BEGIN
+    IF p_granularity = 'agent' THEN
+        SELECT u.fullName as bucket, r.agentId, r.operation, r.currency,
+               SUM(r.salesCount) as salesCount, SUM(r.totalFinalPrice) as totalFinalPrice,
+               SUM(r.totalCommission) as totalCommission
+        FROM SalesDailyRollup r
+        JOIN Users u ON r.agentId = u.id
+        WHERE r.day BETWEEN p_startDate AND p_endDate
+        GROUP BY r.agentId, u.fullName, r.operation, r.currency
+        ORDER BY totalCommission DESC;
+    ELSEIF p_granularity = 'month' THEN
+        SELECT DATE_FORMAT(r.day, '%Y-%m') as bucket, NULL as agentId, r.operation, r.currency,
+               SUM(r.salesCount) as salesCount, SUM(r.totalFinalPrice) as totalFinalPrice,
+               SUM(r.totalCommission) as totalCommission
+        FROM SalesDailyRollup r
+        WHERE r.day BETWEEN p_startDate AND p_endDate
+        GROUP BY DATE_FORMAT(r.day, '%Y-%m'), r.operation, r.currency
+        ORDER BY bucket DESC;
+    ELSE
+        SELECT DATE_FORMAT(r.day, '%Y-%m-%d') as bucket, NULL as agentId, r.operation, r.currency,
+               SUM(r.salesCount) as salesCount, SUM(r.totalFinalPrice) as totalFinalPrice,
+               SUM(r.totalCommission) as totalCommission
+        FROM SalesDailyRollup r
+        WHERE r.day BETWEEN p_startDate AND p_endDate
+        GROUP BY r.day, r.operation, r.currency
+        ORDER BY bucket DESC;
+    END IF;
+END //
+
+-- ----------------------------
+-- SP: DASHBOARD (Contadores materializados)
+-- ----------------------------
+
+DROP PROCEDURE IF EXISTS `sp_Counter_Add` //
+CREATE PROCEDURE `sp_Counter_Add`(
+    IN p_name VARCHAR(60),
+    IN p_delta DECIMAL(14, 2)
+)
+BEGIN
+    INSERT INTO DashboardCounters (name, value) VALUES (p_name, p_delta)
+    ON DUPLICATE KEY UPDATE value = value + p_delta;
+END //
+
+-- Aplica (p_sign = 1) o revierte (p_sign = -1) el aporte de una venta a los contadores
+DROP PROCEDURE IF EXISTS `sp_Counter_ApplySale` //
+CREATE PROCEDURE `sp_Counter_ApplySale`(
+    IN p_status VARCHAR(20),
+    IN p_closedAt TIMESTAMP,
+    IN p_totalCommission DECIMAL(10, 2),
+    IN p_sign INT
+)
+BEGIN
+    IF p_status = 'PENDIENTE' THEN
+        CALL sp_Counter_Add('sales:pending', p_sign);
+    ELSEIF p_status = 'APROBADO' THEN
+        CALL sp_Counter_Add(CONCAT('sales:count:', DATE_FORMAT(p_closedAt, '%Y-%m')), p_sign);
+        CALL sp_Counter_Add(CONCAT('sales:income:', DATE_FORMAT(p_closedAt, '%Y-%m')), p_sign * p_totalCommission);
+    END IF;
+END //
+
+-- Lectura del Dashboard: solo búsquedas por clave primaria
+DROP PROCEDURE IF EXISTS `sp_Dashboard_Summary` //
+CREATE PROCEDURE `sp_Dashboard_Summary`()
+BEGIN
+    DECLARE v_month CHAR(7) DEFAULT DATE_FORMAT(CURRENT_DATE(), '%Y-%m');
+
+    SELECT name, value FROM DashboardCounters
+    WHERE name LIKE 'properties:%'
+       OR name IN ('users:active', 'sales:pending',
+                   CONCAT('sales:count:', v_month), CONCAT('sales:income:', v_month));
+END //
+
+-- Reconstruye los contadores desde cero y reporta las diferencias (drift) encontradas.
+-- Ejecutar periódicamente o tras cargar este script sobre una base existente.
+DROP PROCEDURE IF EXISTS `sp_Dashboard_Reconcile` //
+CREATE PROCEDURE `sp_Dashboard_Reconcile`()
+BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        RESIGNAL;
+    END;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_DashboardCounters;
+    CREATE TEMPORARY TABLE tmp_DashboardCounters (
+        name VARCHAR(60) COLLATE utf8mb4_unicode_ci NOT NULL PRIMARY KEY,
+        value DECIMAL(14, 2) NOT NULL
+    );
+
+    START TRANSACTION;
+        INSERT INTO tmp_DashboardCounters
+            SELECT CONCAT('properties:', status), COUNT(*) FROM Properties GROUP BY status;
+        INSERT INTO tmp_DashboardCounters
+            SELECT 'users:active', COUNT(*) FROM Users WHERE isActive = 1;
+        INSERT INTO tmp_DashboardCounters
+            SELECT 'sales:pending', COUNT(*) FROM Sales WHERE status = 'PENDIENTE';
+        INSERT INTO tmp_DashboardCounters
+            SELECT CONCAT('sales:count:', DATE_FORMAT(closedAt, '%Y-%m')), COUNT(*)
+            FROM Sales WHERE status = 'APROBADO' GROUP BY DATE_FORMAT(closedAt, '%Y-%m');
+        INSERT INTO tmp_DashboardCounters
+            SELECT CONCAT('sales:income:', DATE_FORMAT(closedAt, '%Y-%m')), SUM(totalCommission)
+            FROM Sales WHERE status = 'APROBADO' GROUP BY DATE_FORMAT(closedAt, '%Y-%m');
+        -- Contadores guardados que ya no tienen filas de origen deben quedar en 0
+        INSERT IGNORE INTO tmp_DashboardCounters SELECT name, 0 FROM DashboardCounters;
+
+        -- Reporte de drift
+        SELECT t.name, COALESCE(d.value, 0) as stored, t.value as actual, t.value - COALESCE(d.value, 0) as drift
+        FROM tmp_DashboardCounters t
+        LEFT JOIN DashboardCounters d ON d.name = t.name
+        WHERE COALESCE(d.value, 0) <> t.value;
+
+        INSERT INTO DashboardCounters (name, value)
+            SELECT name, value FROM tmp_DashboardCounters
+        ON DUPLICATE KEY UPDATE value = VALUES(value);
+    COMMIT;
+
+    DROP TEMPORARY TABLE IF EXISTS tmp_DashboardCounters;
+END //
+
+-- ----------------------------
+-- SP: SINCRONIZACIÓN INCREMENTAL (ChangeLog)
+-- ----------------------------
+
+DROP PROCEDURE IF EXISTS `sp_Change_Log` //
+CREATE PROCEDURE `sp_Change_Log`(
+    IN p_entity VARCHAR(20),
+    IN p_entityId INT,
+    IN p_op VARCHAR(10),
+    IN p_event VARCHAR(40),
+    IN p_payload JSON
+)
+BEGIN
+    INSERT INTO ChangeLog (entity, entityId, op, event, payload)
+    VALUES (p_entity, p_entityId, p_op, p_event, p_payload);
+END //
+
+-- Estado actual de lo que cambió en el rango (p_since, p_upto] de ChangeLog: tres result sets
+-- (propiedades con la forma y el enmascarado de sp_Property_List, ventas y documentos).
+-- Las filas borradas no aparecen: sus lápidas las arma la app con las filas op = 'delete'.
+DROP PROCEDURE IF EXISTS `sp_Sync_Snapshot` //
+CREATE PROCEDURE `sp_Sync_Snapshot`(
+    IN p_since BIGINT,
+    IN p_upto BIGINT,
+    IN p_viewerRole VARCHAR(10) COLLATE utf8mb4_unicode_ci,
+    IN p_viewerId INT
+)
+BEGIN
+    SELECT
+        p.id, p.title, p.price, p.currency, p.operation, p.status, p.address, p.city,
+        p.commissionPct, p.exclusive, p.createdAt, p.updatedAt,
+        u.fullName as AgentName, u.phone as AgentPhone, u.photoUrl as AgentPhoto,
+        CASE
+            WHEN p_viewerRole = 'ADMIN' OR p.agentId = p_viewerId THEN c.fullName
+            ELSE 'CONFIDENCIAL'
+        END as OwnerName,
+        CASE
+            WHEN p_viewerRole = 'ADMIN' OR p.agentId = p_viewerId THEN c.phone
+            ELSE NULL
+        END as OwnerPhone
+    FROM (SELECT DISTINCT entityId FROM ChangeLog
+          WHERE seq > p_since AND seq <= p_upto AND entity = 'property' AND op = 'upsert') ch
+    JOIN Properties p ON p.id = ch.entityId
+    JOIN Users u ON p.agentId = u.id
+    JOIN Clients c ON p.ownerId = c.id;
+
+    SELECT s.id, s.propertyId, s.finalPrice, s.totalCommission, s.listingAgentId, s.sellingAgentId,
+           s.isShared, s.status, s.closedAt
+    FROM (SELECT DISTINCT entityId FROM ChangeLog
+          WHERE seq > p_since AND seq <= p_upto AND entity = 'sale' AND op = 'upsert') ch
+    JOIN Sales s ON s.id = ch.entityId;
+
+    SELECT d.id, d.name, d.url, d.type, d.propertyId, d.uploadedAt, d.sha256, d.size, d.contentType
+    FROM (SELECT DISTINCT entityId FROM ChangeLog
+          WHERE seq > p_since AND seq <= p_upto AND entity = 'document' AND op = 'upsert') ch
+    JOIN Documents d ON d.id = ch.entityId;
+END //
+
+-- Borra el registro anterior a p_days días. Los clientes con una marca de agua más vieja
+-- reciben 410 en /api/sync y deben hacer una descarga completa.
+DROP PROCEDURE IF EXISTS `sp_ChangeLog_Purge` //
+CREATE PROCEDURE `sp_ChangeLog_Purge`(IN p_days INT)
+BEGIN
+    DELETE FROM ChangeLog WHERE changedAt < NOW(3) - INTERVAL p_days DAY;
+END //
+
 DELIMITER ;
 
 
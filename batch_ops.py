@@ -0,0 +1,75 @@
+"""
+Operaciones de /api/batch: validación y referencias a resultados anteriores.
+
+Cada operación es {"method", "path", "query"?, "body"?, "ref"?}. Un valor de texto
+"${ref.campo}" (en path, query o body) se reemplaza por un dato de la respuesta de una
+operación previa: `ref` es su nombre ("ref") o su posición (desde 0) y lo que sigue es
+la ruta dentro del JSON de respuesta (claves o índices de lista), ej: "${owner.last_id}"
+o "${2.0.id}". Si el texto es solo la referencia se conserva el tipo (un id sigue siendo
+entero); dentro de un texto mayor (ej: "/api/properties/${prop.0.id}") se inserta como texto.
+"""
+import re
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+REFERENCE = re.compile(r'\$\{(\w+)((?:\.[\w-]+)*)\}')
+
+
+class UnresolvedReference(Exception):
+    pass
+
+
+def validate(operations, max_operations):
+    """Retorna (operaciones normalizadas, error)."""
+    if not isinstance(operations, list) or not operations:
+        return None, "operations debe ser una lista no vacía"
+    if len(operations) > max_operations:
+        return None, f"Máximo {max_operations} operaciones por batch"
+    normalized, names = [], set()
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            return None, f"Operación {index}: debe ser un objeto"
+        method = str(op.get('method', 'GET')).upper()
+        path = op.get('path')
+        if method not in METHODS:
+            return None, f"Operación {index}: método {method} no soportado"
+        if not isinstance(path, str) or not path.startswith('/api/'):
+            return None, f"Operación {index}: path debe empezar con /api/"
+        if op.get('query') is not None and not isinstance(op['query'], dict):
+            return None, f"Operación {index}: query debe ser un objeto"
+        name = op.get('ref')
+        if name is not None:
+            if not isinstance(name, str) or not re.fullmatch(r'[A-Za-z_]\w*', name) or name in names:
+                return None, f"Operación {index}: ref debe ser un nombre único (letras, dígitos, _)"
+            names.add(name)
+        normalized.append({'method': method, 'path': path, 'query': op.get('query'),
+                           'body': op.get('body'), 'ref': name})
+    return normalized, None
+
+
+def lookup(results, name, path):
+    """Dato `path` ('.a.0.b') del cuerpo de la operación `name`; lanza UnresolvedReference."""
+    if name not in results:
+        raise UnresolvedReference(f"${{{name}}}: operación inexistente, posterior o fallida")
+    value = results[name]
+    for key in path.split('.')[1:]:
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise UnresolvedReference(f"${{{name}{path}}}: no existe en la respuesta")
+    return value
+
+
+def resolve(value, results):
+    """Reemplaza las referencias en `value` (recorriendo listas y dicts) con los cuerpos de `results`."""
+    if isinstance(value, str):
+        whole = REFERENCE.fullmatch(value)
+        if whole:
+            return lookup(results, whole.group(1), whole.group(2))
+        return REFERENCE.sub(lambda m: str(lookup(results, m.group(1), m.group(2))), value)
+    if isinstance(value, list):
+        return [resolve(item, results) for item in value]
+    if isinstance(value, dict):
+        return {key: resolve(item, results) for key, item in value.items()}
+    return value
@@ -0,0 +1,245 @@
+"""
+Generador determinista de datos sintéticos para benchmarks.
+
+Puebla Users, Clients, Properties, Documents, SocialMediaLogs, Sales e
+InternalPosts con distribuciones realistas. El tamaño se controla con
+--scale (número de propiedades); el resto de tablas se deriva de él:
+
+    usuarios   = scale / 200 (mín. 5)     documentos   ~ 2.5 por propiedad
+    clientes   = scale * 0.6              publicaciones ~ 1.5 por propiedad
+    ventas     ~ 25% de las propiedades   posts internos = 2 por usuario
+
+La misma semilla produce siempre los mismos datos. Las filas se generan e
+insertan por lotes (executemany), así la memoria no crece con la escala.
+
+Uso:
+    python bench/generate_data.py --scale 10000 --reset
+    python bench/generate_data.py --scale 1000000 --seed 7 --reset --database arteca_bench
+"""
+import argparse
+import datetime
+import math
+import os
+import random
+import sys
+import time
+
+import mysql.connector
+
+CHUNK = 5000
+
+CITIES = (('Ilo', 45), ('Moquegua', 20), ('Tacna', 15), ('Arequipa', 12), ('Lima', 8))
+STREETS = ('Av. Costanera', 'Jr. Moquegua', 'Calle Zepita', 'Av. Mariscal Nieto', 'Jr. Abtao',
+           'Calle Callao', 'Av. Venecia', 'Urb. Pampa Inalámbrica', 'Jr. 2 de Mayo', 'Av. Ejército')
+KINDS = ('Casa', 'Departamento', 'Terreno', 'Local comercial', 'Oficina', 'Casa de playa', 'Cochera')
+ADJECTIVES = ('amplia', 'moderna', 'céntrica', 'con vista al mar', 'remodelada', 'de estreno',
+              'con jardín', 'en esquina', 'iluminada', 'con cochera')
+FIRST_NAMES = ('Juan', 'María', 'Carlos', 'Rosa', 'Luis', 'Ana', 'Jorge', 'Lucía', 'Pedro', 'Carmen',
+               'José', 'Elena', 'Miguel', 'Sofía', 'Víctor', 'Patricia', 'Raúl', 'Gabriela')
+LAST_NAMES = ('Quispe', 'Flores', 'Mamani', 'García', 'Rodríguez', 'Huamán', 'Chávez', 'Torres',
+              'Ramos', 'Vargas', 'Mendoza', 'Castillo', 'Rojas', 'Salazar', 'Paredes', 'Ticona')
+DOC_TYPES = (('PARTIDA_REGISTRAL', 30), ('ESCRITURA_PUBLICA', 20), ('HR_PU', 15),
+             ('DNI_PROPIETARIO', 20), ('CONTRATO_FIRMADO', 10), ('POSESION', 3), ('OTRO', 2))
+NETWORKS = (('FACEBOOK', 45), ('INSTAGRAM', 30), ('TIKTOK', 15), ('PORTAL_WEB', 10))
+POST_CATEGORIES = (('NOTICIA', 60), ('CURSO', 15), ('EVENTO', 15), ('URGENTE', 10))
+
+HISTORY_DAYS = 3 * 365
+
+
+def weighted(rng, options):
+    values, weights = zip(*options)
+    return rng.choices(values, weights)[0]
+
+def person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+def past(rng, now, max_days=HISTORY_DAYS):
+    # Más actividad reciente: distribución sesgada hacia hoy
+    days = max_days * (rng.random() ** 1.6)
+    return now - datetime.timedelta(days=days, seconds=rng.randint(0, 86399))
+
+
+class Generator:
+    def __init__(self, conn, scale, seed):
+        self.conn = conn
+        self.rng = random.Random(seed)
+        self.now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+        self.n_properties = scale
+        self.n_users = max(5, scale // 200)
+        self.n_clients = max(5, int(scale * 0.6))
+
+    def insert(self, sql, rows):
+        cursor = self.conn.cursor()
+        batch, total = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= CHUNK:
+                cursor.executemany(sql, batch)
+                self.conn.commit()
+                total += len(batch)
+                batch.clear()
+        if batch:
+            cursor.executemany(sql, batch)
+            self.conn.commit()
+            total += len(batch)
+        cursor.close()
+        return total
+
+    # ------------------------------------------
+
+    def users(self):
+        rng = self.rng
+        yield ('admin@sistema.com', '123456', 'Erwin Admin', '999000111', 'ADMIN', None, 1, self.now - datetime.timedelta(days=HISTORY_DAYS))
+        for i in range(2, self.n_users + 1):
+            role = 'ADMIN' if i % 25 == 0 else 'AGENTE'
+            yield (f'agente{i}@atiqa.pe', '123456', person(rng), f'9{rng.randint(10000000, 99999999)}',
+                   role, f'https://cdn.atiqa.pe/agents/{i}.jpg', int(rng.random() > 0.08), past(rng, self.now))
+
+    def clients(self):
+        rng = self.rng
+        for i in range(1, self.n_clients + 1):
+            yield (person(rng), f'{rng.randint(10000000, 79999999)}', f'9{rng.randint(10000000, 99999999)}',
+                   f'cliente{i}@mail.com' if rng.random() < 0.7 else None, int(rng.random() < 0.8),
+                   None, past(rng, self.now))
+
+    def properties(self):
+        rng = self.rng
+        # Pocos agentes concentran muchas captaciones (Pareto)
+        agent_weights = [1 / (i ** 0.8) for i in range(1, self.n_users + 1)]
+        agents = list(range(1, self.n_users + 1))
+        for i in range(1, self.n_properties + 1):
+            operation = 'VENTA' if rng.random() < 0.7 else 'ALQUILER'
+            if operation == 'VENTA':
+                currency = 'USD' if rng.random() < 0.85 else 'PEN'
+                price = rng.lognormvariate(math.log(110000), 0.6)
+            else:
+                currency = 'PEN' if rng.random() < 0.9 else 'USD'
+                price = rng.lognormvariate(math.log(1500), 0.5)
+            kind = rng.choice(KINDS)
+            city = weighted(rng, CITIES)
+            created = past(rng, self.now)
+            status = rng.choices(('DISPONIBLE', 'RESERVADO', 'RETIRADO'), (85, 8, 7))[0]
+            yield (f'{kind} {rng.choice(ADJECTIVES)} en {city}',
+                   f'{kind} {rng.choice(ADJECTIVES)}, {rng.randint(1, 5)} dormitorios, {rng.randint(60, 450)} m2. '
+                   f'Cerca de {rng.choice(STREETS)}.',
+                   f'{rng.choice(STREETS)} {rng.randint(100, 2500)}', city, round(price, 2), currency,
+                   rng.choice((3.00, 3.00, 4.00, 5.00)), status, operation,
+                   rng.choices(agents, agent_weights)[0], rng.randint(1, self.n_clients),
+                   int(rng.random() < 0.2), created, created + datetime.timedelta(days=rng.randint(0, 60)))
+
+    def documents(self):
+        rng = self.rng
+        for prop_id in range(1, self.n_properties + 1):
+            for _ in range(min(7, int(rng.expovariate(1 / 2.5)))):
+                doc_type = weighted(rng, DOC_TYPES)
+                yield (f'{doc_type.lower()}_{prop_id}.pdf', f'https://docs.atiqa.pe/{prop_id}/{rng.getrandbits(48):x}.pdf',
+                       doc_type, prop_id, past(rng, self.now))
+
+    def social_logs(self):
+        rng = self.rng
+        for prop_id in range(1, self.n_properties + 1):
+            for _ in range(min(6, int(rng.expovariate(1 / 1.5)))):
+                network = weighted(rng, NETWORKS)
+                yield (prop_id, network, f'https://{network.lower()}.com/post/{rng.getrandbits(40):x}', past(rng, self.now))
+
+    def sales(self):
+        rng = self.rng
+        # Ventas sobre una muestra determinista de propiedades (propertyId es único en Sales)
+        for prop_id in range(1, self.n_properties + 1):
+            if rng.random() >= 0.25:
+                continue
+            price = rng.lognormvariate(math.log(100000), 0.6)
+            commission = price * rng.choice((0.03, 0.04, 0.05))
+            shared = rng.random() < 0.15
+            selling = rng.randint(1, self.n_users) if not shared and rng.random() < 0.3 else None
+            status = rng.choices(('APROBADO', 'PENDIENTE', 'RECHAZADO'), (80, 12, 8))[0]
+            yield (prop_id, round(price, 2), round(commission, 2), rng.randint(1, self.n_users),
+                   int(shared), 'Inmobiliaria Externa SAC' if shared else None, 50.00, selling,
+                   past(rng, self.now, 2 * 365), status)
+
+    def posts(self):
+        rng = self.rng
+        for i in range(self.n_users * 2):
+            yield (f'Novedad #{i + 1}', 'Comunicado interno de la oficina.', weighted(rng, POST_CATEGORIES),
+                   rng.randint(1, self.n_users), past(rng, self.now))
+
+    # ------------------------------------------
+
+    def run(self):
+        steps = (
+            ('Users', "INSERT INTO Users (email, password, fullName, phone, role, photoUrl, isActive, createdAt) "
+                      "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", self.users),
+            ('Clients', "INSERT INTO Clients (fullName, dniRuc, phone, email, isOwner, notes, createdAt) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s)", self.clients),
+            ('Properties', "INSERT INTO Properties (title, description, address, city, price, currency, commissionPct, "
+                           "status, operation, agentId, ownerId, exclusive, createdAt, updatedAt) "
+                           "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", self.properties),
+            ('Documents', "INSERT INTO Documents (name, url, type, propertyId, uploadedAt) "
+                          "VALUES (%s, %s, %s, %s, %s)", self.documents),
+            ('SocialMediaLogs', "INSERT INTO SocialMediaLogs (propertyId, network, postUrl, postedAt) "
+                                "VALUES (%s, %s, %s, %s)", self.social_logs),
+            ('Sales', "INSERT INTO Sales (propertyId, finalPrice, totalCommission, listingAgentId, isShared, "
+                      "externalAgency, sharedPct, sellingAgentId, closedAt, status) "
+                      "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)", self.sales),
+            ('InternalPosts', "INSERT INTO InternalPosts (title, body, category, authorId, createdAt) "
+                              "VALUES (%s, %s, %s, %s, %s)", self.posts),
+        )
+        for table, sql, rows in steps:
+            start = time.perf_counter()
+            count = self.insert(sql, rows())
+            print(f"{table:<16} {count:>10} filas  {time.perf_counter() - start:7.1f}s")
+
+
+def reset(conn):
+    """Vacía las tablas de datos para que los ids empiecen en 1 (la generación depende de ello)."""
+    cursor = conn.cursor()
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    for table in ('InternalPosts', 'Sales', 'SocialMediaLogs', 'Documents', 'Properties', 'Clients', 'Users',
+                  'DashboardCounters', 'SalesDailyRollup'):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    conn.commit()
+    cursor.close()
+
+
+def finalize(conn):
+    """Los triggers mantienen contadores y rollup; se reconcilian para verificar que no haya drift."""
+    cursor = conn.cursor()
+    cursor.callproc('sp_Dashboard_Reconcile')
+    drift = [row for res in cursor.stored_results() for row in res.fetchall()]
+    cursor.close()
+    print(f"Contadores del dashboard: {len(drift)} con drift")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10000, help='Número de propiedades (10k a 5M)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='Vaciar las tablas antes de generar')
+    parser.add_argument('--host', default=os.getenv('DB_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('DB_PORT', 3306)))
+    parser.add_argument('--user', default=os.getenv('DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('DB_PASSWORD', 'root'))
+    parser.add_argument('--database', default=os.getenv('DB_NAME', 'arteca'))
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(host=args.host, port=args.port, user=args.user,
+                                   password=args.password, database=args.database)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM Properties")
+    existing = cursor.fetchone()[0]
+    cursor.close()
+    if existing and not args.reset:
+        sys.exit("La base ya tiene propiedades: use --reset (los ids generados asumen tablas vacías)")
+    if args.reset:
+        reset(conn)
+
+    start = time.perf_counter()
+    Generator(conn, args.scale, args.seed).run()
+    finalize(conn)
+    print(f"Total: {time.perf_counter() - start:.1f}s")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
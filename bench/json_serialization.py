@@ -0,0 +1,127 @@
+"""
+Benchmark de serialización JSON: proveedor por defecto de Flask vs. FastJSONProvider.
+
+Usa filas con la forma exacta de sp_Property_List y sp_Report_Sales (Decimal,
+datetime, textos). Por defecto las genera en memoria; con --from-db las lee
+de MySQL llamando a los procedimientos (ej: tras bench/generate_data.py).
+
+Uso:
+    python bench/json_serialization.py --rows 20000
+    python bench/json_serialization.py --from-db --rows 50000
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+from json_provider import FastJSONProvider  # noqa: E402
+
+
+def synthetic_property_list(n, rng):
+    base = datetime.datetime(2024, 1, 1)
+    return [{
+        'id': i, 'title': f'Casa de playa {i} con vista al mar', 'price': Decimal(rng.randint(30_000, 900_000)) + Decimal('0.50'),
+        'currency': rng.choice(('USD', 'PEN')), 'operation': rng.choice(('VENTA', 'ALQUILER')),
+        'status': 'DISPONIBLE', 'address': f'Av. Costanera {i}', 'city': 'Ilo',
+        'commissionPct': Decimal('3.00'), 'exclusive': i % 2, 'createdAt': base + datetime.timedelta(minutes=i),
+        'AgentName': 'María Quispe', 'AgentPhone': '952000000', 'AgentPhoto': None,
+        'OwnerName': 'CONFIDENCIAL', 'OwnerPhone': None,
+    } for i in range(n)]
+
+def synthetic_report_sales(n, rng):
+    base = datetime.datetime(2025, 1, 1)
+    return [{
+        'id': i, 'Property': f'Departamento {i}', 'operation': 'VENTA',
+        'finalPrice': Decimal(rng.randint(50_000, 500_000)), 'IngresoComision': Decimal(rng.randint(1_500, 15_000)) + Decimal('0.75'),
+        'EstadoCierre': 'APROBADO', 'FechaCierre': base + datetime.timedelta(hours=i),
+        'AgenteCaptador': 'José Mamani', 'AgenteCierre': 'Mismo Captador',
+    } for i in range(n)]
+
+def from_db(args):
+    import mysql.connector
+
+    conn = mysql.connector.connect(host=args.host, port=args.port, user=args.user,
+                                   password=args.password, database=args.database)
+    cursor = conn.cursor(dictionary=True)
+    cursor.callproc('sp_Property_List', (None, None, 'ADMIN', 1, None, None, None, None, None, None, None, args.rows))
+    properties = [row for res in cursor.stored_results() for row in res.fetchall()]
+    cursor.callproc('sp_Report_Sales', ('2000-01-01', '2100-01-01'))
+    sales = [row for res in cursor.stored_results() for row in res.fetchall()][:args.rows]
+    cursor.close()
+    conn.close()
+    return properties, sales
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(label, rows, providers, repeat):
+    print(f"\n{label}: {len(rows)} filas")
+    baseline = None
+    for name, fn in providers:
+        elapsed = timed(lambda: fn(rows), repeat)
+        baseline = baseline or elapsed
+        print(f"  {name:<34} {elapsed * 1000:9.1f} ms   {baseline / elapsed:5.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--from-db', action='store_true')
+    parser.add_argument('--host', default=os.getenv('DB_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('DB_PORT', 3306)))
+    parser.add_argument('--user', default=os.getenv('DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('DB_PASSWORD', 'root'))
+    parser.add_argument('--database', default=os.getenv('DB_NAME', 'arteca'))
+    args = parser.parse_args()
+
+    if args.from_db:
+        properties, sales = from_db(args)
+    else:
+        rng = random.Random(42)
+        properties, sales = synthetic_property_list(args.rows, rng), synthetic_report_sales(args.rows, rng)
+
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    stdlib = FastJSONProvider(app)
+    stdlib.use_orjson = False
+    as_number = FastJSONProvider(app)
+    as_number.use_orjson = False
+    as_number.decimal_as = 'number'
+
+    providers = [
+        ('Flask DefaultJSONProvider', lambda rows: default.dumps(rows).encode()),
+        ('FastJSONProvider (json estándar)', stdlib.dumps_bytes),
+        ('FastJSONProvider decimal=number', as_number.dumps_bytes),
+        ('FastJSONProvider streaming', lambda rows: b''.join(stdlib.iter_array(rows))),
+    ]
+    if json_provider.orjson is not None:
+        fast = FastJSONProvider(app)
+        providers += [
+            ('FastJSONProvider (orjson)', fast.dumps_bytes),
+            ('FastJSONProvider (orjson) streaming', lambda rows: b''.join(fast.iter_array(rows))),
+        ]
+    else:
+        print("orjson no está instalado: se omite (pip install orjson)")
+
+    run('sp_Property_List', properties, providers, args.repeat)
+    run('sp_Report_Sales', sales, providers, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
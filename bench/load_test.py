@@ -0,0 +1,214 @@
+"""
+Benchmark de carga reproducible contra la API (servidor local + MySQL poblado
+con bench/generate_data.py).
+
+Cada escenario se ejecuta con N hilos durante D segundos y reporta throughput
+(req/s), errores y latencias p50/p95/p99. Los resultados pueden guardarse como
+baseline y compararse en ejecuciones posteriores: si algún escenario empeora
+más que --tolerance (p95 o throughput) el proceso termina con código 1.
+
+Uso:
+    python bench/load_test.py --base-url http://localhost:5000 --save bench/baseline.json
+    python bench/load_test.py --compare bench/baseline.json --tolerance 0.15
+    python bench/load_test.py --scenarios listing,detail --duration 30 --concurrency 16
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def call(self, method, path, body=None, headers=None):
+        """Retorna (status, cuerpo_json_o_None)."""
+        data = json.dumps(body).encode() if body is not None else None
+        req = urlrequest.Request(self.base_url + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json', **(headers or {})})
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as resp:
+                raw = resp.read()
+                status = resp.status
+        except urlerror.HTTPError as e:
+            raw, status = e.read(), e.code
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+
+# ------------------------------------------
+# Escenarios: cada uno ejecuta una "operación" y retorna True si fue exitosa
+# ------------------------------------------
+
+ADMIN_HEADERS = {'X-Role': 'ADMIN', 'X-User-Id': '1'}
+
+def scenario_listing(client, rng, ctx):
+    status, body = client.call('GET', '/api/properties?limit=50', headers=ADMIN_HEADERS)
+    if status == 200 and body.get('next') and rng.random() < 0.5:
+        status, _ = client.call('GET', f"/api/properties?limit=50&cursor={body['next']}", headers=ADMIN_HEADERS)
+    return status == 200
+
+def scenario_detail(client, rng, ctx):
+    status, _ = client.call('GET', f"/api/properties/{rng.randint(1, ctx['max_property_id'])}")
+    return status in (200, 404)
+
+def scenario_dashboard(client, rng, ctx):
+    status, _ = client.call('GET', '/api/dashboard/summary')
+    return status == 200
+
+def scenario_reports(client, rng, ctx):
+    year = rng.choice((2024, 2025))
+    month = rng.randint(1, 12)
+    path = f'/api/reports/sales?startDate={year}-{month:02d}-01&endDate={year}-{month:02d}-28'
+    if rng.random() < 0.5:
+        path = f'/api/reports/sales?startDate={year}-01-01&endDate={year}-12-31&granularity=month'
+    status, _ = client.call('GET', path)
+    return status == 200
+
+def scenario_login(client, rng, ctx):
+    status, _ = client.call('POST', '/api/auth/login', {'email': 'admin@sistema.com', 'password': '123456'})
+    return status == 200
+
+def scenario_clients(client, rng, ctx):
+    status, body = client.call('POST', '/api/clients', {'fullName': 'Cliente Benchmark', 'phone': '900000000'})
+    if status != 201:
+        return False
+    client_id = body['last_id']
+    ok = client.call('GET', f'/api/clients/{client_id}')[0] == 200
+    ok &= client.call('PUT', f'/api/clients/{client_id}', {'fullName': 'Cliente Benchmark 2', 'phone': '900000001'})[0] == 200
+    ok &= client.call('DELETE', f'/api/clients/{client_id}')[0] == 200
+    return ok
+
+SCENARIOS = {
+    'listing': scenario_listing,
+    'detail': scenario_detail,
+    'dashboard': scenario_dashboard,
+    'reports': scenario_reports,
+    'login': scenario_login,
+    'clients': scenario_clients,
+}
+
+
+# ------------------------------------------
+# Ejecución y reporte
+# ------------------------------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def run_scenario(name, client, ctx, concurrency, duration, seed):
+    fn = SCENARIOS[name]
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = random.Random(f'{seed}-{name}-{worker_id}')
+        local, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                ok = fn(client, rng, ctx)
+            except OSError:
+                ok = False
+            local.append(time.perf_counter() - start)
+            local_errors += not ok
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+def compare(results, baseline, tolerance):
+    """Retorna la lista de regresiones (escenario, métrica, baseline, actual)."""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append((name, 'p95_ms', base['p95_ms'], current['p95_ms']))
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append((name, 'throughput', base['throughput'], current['throughput']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=15, help='Segundos por escenario')
+    parser.add_argument('--max-property-id', type=int, default=10000, help='Rango de ids para el escenario detail')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--save', help='Guardar resultados como baseline en este archivo JSON')
+    parser.add_argument('--compare', help='Comparar contra un baseline guardado')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Degradación aceptada (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(',') if n.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Escenarios desconocidos: {', '.join(sorted(unknown))}")
+
+    client = Client(args.base_url, args.timeout)
+    ctx = {'max_property_id': args.max_property_id}
+    results = {}
+
+    print(f"{'escenario':<12} {'req':>8} {'err':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name in names:
+        res = results[name] = run_scenario(name, client, ctx, args.concurrency, args.duration, args.seed)
+        print(f"{name:<12} {res['requests']:>8} {res['errors']:>6} {res['throughput']:>9.1f} "
+              f"{res['p50_ms']:>9.1f} {res['p95_ms']:>9.1f} {res['p99_ms']:>9.1f}")
+
+    report = {
+        'config': {'concurrency': args.concurrency, 'duration': args.duration, 'seed': args.seed,
+                   'base_url': args.base_url},
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline guardado en {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nRegresiones (tolerancia {args.tolerance:.0%}):")
+            for name, metric, before, after in regressions:
+                print(f"  {name}.{metric}: {before} -> {after}")
+            sys.exit(1)
+        print(f"\nSin regresiones respecto a {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Microbenchmark del costo de la instrumentación (metrics.py).
+
+Mide el costo por llamada de lo que execute_query/execute_procedure y
+after_request agregan a cada consulta y petición.
+
+Uso: python bench/metrics_overhead.py [iteraciones]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import metrics  # noqa: E402
+
+SQL = """SELECT p.*, u.fullName as AgentName, c.fullName as OwnerName
+         FROM Properties p JOIN Users u ON p.agentId = u.id
+         JOIN Clients c ON p.ownerId = c.id WHERE p.id = %s"""
+
+
+def bench(label, fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<52} {elapsed / n * 1e9:10.0f} ns/op")
+    return elapsed / n
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    baseline = bench("baseline (llamada vacía)", lambda: None, n)
+    per_query = bench("observe_db (fingerprint cacheado + 2 histogramas)",
+                      lambda: metrics.observe_db('query', metrics.fingerprint(SQL), 0.0042, 1, None, 0.5, (1,)), n)
+    per_request = bench("after_request (latencia + bytes)",
+                        lambda: (metrics.http_request_duration.observe(0.012, 'manage_property', 'GET', '200'),
+                                 metrics.http_response_bytes.observe(2048, 'manage_property')), n)
+    bench("perf_counter() x2", lambda: (time.perf_counter(), time.perf_counter()), n)
+    bench("fingerprint (sin caché)", lambda: metrics.fingerprint.__wrapped__(SQL), n // 10)
+
+    # Petición típica: 1 consulta instrumentada + after_request
+    overhead = (per_query - baseline) + (per_request - baseline)
+    print(f"\nSobrecosto estimado por petición con 1 consulta: {overhead * 1e6:.2f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark de sentencias preparadas y filas como tuplas (RowSet).
+
+Compara, para las sentencias calientes (login, usuario/cliente por id, datos de
+contrato), el camino anterior de execute_query (cursor dictionary=True, SQL en
+texto) contra el cursor preparado del pool + RowSet. También mide por separado
+el costo de materializar filas como dicts vs. tuplas con mapa de columnas.
+
+Uso:
+    python bench/prepared_statements.py --iterations 5000
+    python bench/prepared_statements.py --offline      # solo armado de filas, sin BD
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from rowset import RowSet  # noqa: E402
+
+STATEMENTS = {
+    'login': ("SELECT id, fullName, role, photoUrl FROM Users WHERE email = %s AND password = %s AND isActive = 1",
+              ('admin@sistema.com', '123456')),
+    'user_by_id': ("SELECT id, email, fullName, phone, role, photoUrl, isActive, createdAt FROM Users WHERE id = %s",
+                   (1,)),
+    'client_by_id': ("SELECT * FROM Clients WHERE id = %s", (1,)),
+    'contract_data': ("""SELECT p.address, p.price, p.commissionPct, p.exclusive,
+                         p.ownerId, c.fullName as OwnerName, c.dniRuc as OwnerDNI,
+                         p.agentId, u.fullName as AgentName
+                         FROM Properties p
+                         JOIN Clients c ON p.ownerId = c.id
+                         JOIN Users u ON p.agentId = u.id
+                         WHERE p.id = %s""", (1,)),
+}
+
+
+def timed(n, fn):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n
+
+
+def bench_row_building(n_rows, repeat):
+    """Costo de construir resultados en Python (sin red): dict por fila vs. tuplas + columnas."""
+    columns = ('id', 'title', 'price', 'currency', 'operation', 'status', 'city', 'createdAt')
+    rows = [(i, f'Casa {i}', Decimal('125000.00'), 'USD', 'VENTA', 'DISPONIBLE', 'Ilo',
+             datetime.datetime(2025, 1, 1)) for i in range(n_rows)]
+    as_dicts = timed(repeat, lambda: [dict(zip(columns, row)) for row in rows])
+    as_rowset = timed(repeat, lambda: RowSet(columns, rows))
+    first_only = timed(repeat, lambda: RowSet(columns, rows).first())
+    print(f"Armado de {n_rows} filas:")
+    print(f"  {'dict por fila':<32} {as_dicts * 1e6:10.1f} µs")
+    print(f"  {'RowSet (tuplas)':<32} {as_rowset * 1e6:10.1f} µs")
+    print(f"  {'RowSet + first()':<32} {first_only * 1e6:10.1f} µs")
+
+
+def bench_statements(args):
+    import mysql.connector
+
+    conn = mysql.connector.connect(host=args.host, port=args.port, user=args.user,
+                                   password=args.password, database=args.database)
+    print(f"\n{'sentencia':<16} {'texto+dict µs':>14} {'preparada µs':>14} {'prep+records µs':>16} {'mejora':>8}")
+    for name, (sql, params) in STATEMENTS.items():
+        def plain():
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(sql, params)
+            cursor.fetchall()
+            cursor.close()
+
+        prepared_cursor = conn.cursor(prepared=True)
+
+        def prepared():
+            prepared_cursor.execute(sql, params)
+            return RowSet(prepared_cursor.column_names, prepared_cursor.fetchall())
+
+        def prepared_records():
+            return prepared().records()
+
+        for fn in (plain, prepared):   # Calentar caché del servidor y preparar la sentencia
+            fn()
+        t_plain = timed(args.iterations, plain)
+        t_prepared = timed(args.iterations, prepared)
+        t_records = timed(args.iterations, prepared_records)
+        prepared_cursor.close()
+        print(f"{name:<16} {t_plain * 1e6:>14.1f} {t_prepared * 1e6:>14.1f} {t_records * 1e6:>16.1f} "
+              f"{t_plain / t_prepared:>7.2f}x")
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--offline', action='store_true', help='Solo medir el armado de filas (sin MySQL)')
+    parser.add_argument('--host', default=os.getenv('DB_HOST', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('DB_PORT', 3306)))
+    parser.add_argument('--user', default=os.getenv('DB_USER', 'root'))
+    parser.add_argument('--password', default=os.getenv('DB_PASSWORD', 'root'))
+    parser.add_argument('--database', default=os.getenv('DB_NAME', 'arteca'))
+    args = parser.parse_args()
+
+    bench_row_building(1, args.iterations * 10)
+    bench_row_building(1000, max(1, args.iterations // 20))
+    if not args.offline:
+        bench_statements(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Prueba de read-your-writes con un primario y una réplica MySQL locales.
+
+Crea un cliente y lo busca de inmediato en GET /api/clients (lectura enviada a
+réplica), de dos formas:
+  - con token:  reenvía el header X-Consistency-Token de la escritura; el
+                cliente debe aparecer siempre (la app lee en el primario o en
+                una réplica que ya aplicó la escritura).
+  - sin token:  como otro usuario; mide cuántas veces la réplica aún no lo tiene.
+Al final muestra el enrutamiento (/api/system/replicas) y borra los clientes.
+Termina con código 1 si alguna lectura con token no vio su escritura.
+
+Dos instancias locales (replicación con retraso para que el lag sea visible):
+
+    docker run -d --name atiqa-primary -p 3306:3306 -e MYSQL_ROOT_PASSWORD=root mysql:8.4 \\
+        --server-id=1 --log-bin=mysql-bin --gtid-mode=ON --enforce-gtid-consistency=ON
+    docker run -d --name atiqa-replica -p 3307:3306 -e MYSQL_ROOT_PASSWORD=root mysql:8.4 \\
+        --server-id=2 --gtid-mode=ON --enforce-gtid-consistency=ON --read-only=ON
+    mysql -h127.0.0.1 -P3307 -uroot -proot -e "
+        CHANGE REPLICATION SOURCE TO SOURCE_HOST='host.docker.internal', SOURCE_PORT=3306,
+            SOURCE_USER='root', SOURCE_PASSWORD='root', SOURCE_AUTO_POSITION=1,
+            GET_SOURCE_PUBLIC_KEY=1, SOURCE_DELAY=2;
+        START REPLICA;"
+    mysql -h127.0.0.1 -P3306 -uroot -proot < base.sql      # llega a la réplica por replicación
+
+    DB_REPLICAS=127.0.0.1:3307 DB_REPLICA_MAX_LAG=5 flask --app app run
+    python bench/replica_consistency.py --iterations 50
+
+(En Linux usar la IP del host o una red de docker en lugar de host.docker.internal.)
+"""
+import argparse
+import json
+import sys
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+ADMIN_HEADERS = {'X-Role': 'ADMIN', 'X-User-Id': '1'}
+TOKEN_HEADER = 'X-Consistency-Token'
+
+
+class Client:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def call(self, method, path, body=None, headers=None):
+        """Retorna (status, cuerpo_json_o_None, headers)."""
+        data = json.dumps(body).encode() if body is not None else None
+        req = urlrequest.Request(self.base_url + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json', **ADMIN_HEADERS, **(headers or {})})
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as resp:
+                raw, status, resp_headers = resp.read(), resp.status, resp.headers
+        except urlerror.HTTPError as e:
+            raw, status, resp_headers = e.read(), e.code, e.headers
+        return status, json.loads(raw) if raw else None, resp_headers
+
+
+def client_ids(client, token=None):
+    status, body, _ = client.call('GET', '/api/clients', headers={TOKEN_HEADER: token} if token else None)
+    if status != 200:
+        raise RuntimeError(f"GET /api/clients respondió {status}: {body}")
+    return {row['id'] for row in body}
+
+
+def create_client(client, n):
+    """Crea un cliente y retorna (id, token de consistencia)."""
+    status, body, headers = client.call('POST', '/api/clients',
+                                        {'fullName': f'Réplica bench {n}', 'phone': '000000000', 'isOwner': 0})
+    if status != 201:
+        raise RuntimeError(f"POST /api/clients respondió {status}: {body}")
+    return body['last_id'], headers.get(TOKEN_HEADER)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--timeout', type=float, default=10)
+    args = parser.parse_args()
+
+    client = Client(args.base_url, args.timeout)
+    _, before, _ = client.call('GET', '/api/system/replicas')
+    if not before.get('enabled'):
+        print("Aviso: la app no tiene réplicas (DB_REPLICAS); todas las lecturas van al primario")
+
+    created, missing_with_token, stale_without_token = [], 0, 0
+    for n in range(args.iterations):
+        new_id, token = create_client(client, n)
+        created.append(new_id)
+        if new_id not in client_ids(client, token):
+            missing_with_token += 1
+        if new_id not in client_ids(client):
+            stale_without_token += 1
+
+    _, after, _ = client.call('GET', '/api/system/replicas')
+    for new_id in created:
+        client.call('DELETE', f'/api/clients/{new_id}')
+
+    routed = {key: value - before['routed'].get(key, 0) for key, value in after['routed'].items()}
+    print(f"escrituras: {args.iterations}")
+    print(f"con token, sin ver su escritura: {missing_with_token}   (debe ser 0)")
+    print(f"sin token, lectura atrasada:     {stale_without_token}   (> 0 si la réplica tiene lag)")
+    print(f"lecturas -> réplica: {routed.get('replica', 0)}  primario por token: "
+          f"{routed.get('read_your_writes', 0)}  primario por lag: {routed.get('lag', 0)}")
+    for name, replica in after['replicas'].items():
+        print(f"  {name}: lag={replica['lag']} lecturas={replica['reads']} fallos={replica['failures']}")
+    sys.exit(1 if missing_with_token else 0)
+
+
+if __name__ == '__main__':
+    main()
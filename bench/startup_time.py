@@ -0,0 +1,89 @@
+"""
+Tiempo de arranque en frío: import de app.py hasta la primera respuesta.
+
+Cada medición corre en un proceso nuevo (como un worker recién escalado) y
+reporta la mediana de: import, primera página HTML (/login, compila plantilla)
+y primer GET del spec (/apispec_1.json, parsea docstrings si no está
+precompilado). Compara el modo desarrollo contra el precompilado.
+
+Con --ref se mide además otra revisión (ej: la anterior a la precompilación) en un
+worktree temporal de git, en su modo por defecto.
+
+Requiere el spec generado:  flask --app app export-openapi
+
+Uso: python bench/startup_time.py [--runs 10] [--ref <revisión> ...]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PROBE = r"""
+import json, time
+t0 = time.perf_counter()
+import app as module
+t1 = time.perf_counter()
+client = module.app.test_client()
+client.get('/login')
+t2 = time.perf_counter()
+client.get('/apispec_1.json')
+t3 = time.perf_counter()
+queue = getattr(module, 'publish_queue', None)    # Las revisiones viejas no la tienen
+if queue is not None:
+    queue.shutdown(wait=False)
+print(json.dumps({'import': t1 - t0, 'first_page': t2 - t1, 'first_spec': t3 - t2, 'total': t3 - t0}))
+"""
+
+MODES = {
+    'docstrings (antes)': {'OPENAPI_PRECOMPILED': '0', 'JINJA_PRECOMPILE': '0'},
+    'precompilado (después)': {'OPENAPI_PRECOMPILED': '1', 'JINJA_PRECOMPILE': '1'},
+}
+
+
+def measure(env_overrides, runs, cwd=ROOT):
+    samples = []
+    for _ in range(runs):
+        env = {**os.environ, **env_overrides}
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=cwd, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+
+
+def measure_ref(ref, runs):
+    """Mide la revisión `ref` en un worktree temporal (sin variables de precompilación)."""
+    path = tempfile.mkdtemp(prefix='atiqa-bench-ref-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', '--quiet', path, ref], cwd=ROOT, check=True)
+    try:
+        env = {key: '' for key in ('OPENAPI_PRECOMPILED', 'JINJA_PRECOMPILE')}
+        return measure(env, runs, cwd=path)
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', path], cwd=ROOT, check=True)
+
+
+def report(name, result):
+    print(f"{name:<24} {result['import'] * 1000:>10.1f} {result['first_page'] * 1000:>10.1f} "
+          f"{result['first_spec'] * 1000:>10.1f} {result['total'] * 1000:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--ref', action='append', default=[], help="Revisión de git a medir además del árbol actual")
+    args = parser.parse_args()
+
+    cache_dir = tempfile.mkdtemp(prefix='atiqa-jinja-bench-')
+    print(f"{'modo':<24} {'import ms':>10} {'1ª página':>10} {'1er spec':>10} {'total ms':>10}")
+    for ref in args.ref:
+        report(ref[:24], measure_ref(ref, args.runs))
+    for name, overrides in MODES.items():
+        report(name, measure({**overrides, 'JINJA_CACHE_DIR': cache_dir}, args.runs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""
+Feed de cambios sobre la tabla ChangeLog (llenada por triggers).
+
+  - settled(): filas que ya se pueden entregar. seq es AUTO_INCREMENT y se asigna
+    al insertar, no al hacer commit: una transacción más lenta puede confirmar un
+    seq menor después de que otro mayor ya es visible. Ante un hueco se pregunta
+    a gap_open() si todavía puede llenarse (una transacción en curso tiene filas
+    ahí, o ya se confirmaron pero esta lectura no las ve): entonces se corta; si
+    no, es un rollback (o valores de AUTO_INCREMENT descartados) y se salta. Un
+    hueco de más de `grace` segundos se salta siempre, para que una transacción
+    colgada no frene el feed: `grace` debe superar la transacción de escritura
+    más larga. Así ningún cliente avanza su marca de agua por encima de un
+    cambio que todavía no vio.
+
+  - ChangeFeed: un solo hilo por worker consulta ChangeLog cada `poll_interval`
+    segundos y reparte los eventos a los suscriptores SSE en memoria. Los
+    suscriptores no usan conexiones a la base de datos; los últimos `backlog`
+    eventos se conservan para reanudar con Last-Event-ID. Los huecos saltados se
+    vuelven a mirar durante `recheck` segundos: si aparece una fila en uno (una
+    transacción más larga que `grace`), los suscriptores reciben 'reset' con el
+    token desde el que deben resincronizar.
+"""
+import json
+import queue
+import threading
+import time
+from collections import deque
+
+RESET_EVENT = "event: reset\ndata: {}\n\n"
+
+
+def settled(rows, since, grace, gap_open=None):
+    """
+    Prefijo de `rows` (ordenadas por seq, con 'age' en segundos) sin huecos que puedan llenarse.
+    gap_open(después, antes) -> True si algún seq entre ambos (exclusivo) puede aparecer todavía;
+    sin él todo hueco de menos de `grace` segundos cuenta como abierto.
+    """
+    expected = since + 1
+    ready = []
+    for row in rows:
+        if row['seq'] != expected and row['age'] < grace and (
+                gap_open is None or gap_open(expected - 1, row['seq'])):
+            break
+        ready.append(row)
+        expected = row['seq'] + 1
+    return ready
+
+
+def gaps(rows, since):
+    """Huecos (después, antes) de seq entre `since` y las filas, ej: los que settled() saltó."""
+    previous = since
+    for row in rows:
+        if row['seq'] > previous + 1:
+            yield previous, row['seq']
+        previous = row['seq']
+
+
+def format_event(event_id, name, data, dumps=json.dumps):
+    """Evento en formato text/event-stream."""
+    return f"id: {event_id}\nevent: {name}\ndata: {dumps(data)}\n\n"
+
+
+class Subscription:
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(max_queue)
+        self.overflowed = False     # El cliente no leyó a tiempo: se corta y reanuda con Last-Event-ID
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def messages(self, heartbeat):
+        """Mensajes SSE ya formateados; un comentario cada `heartbeat` segundos mantiene viva la conexión."""
+        while not self.overflowed:
+            try:
+                message = self.queue.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": ping\n\n"
+                continue
+            if message is None:     # Feed detenido (apagado del worker)
+                return
+            yield message
+        yield RESET_EVENT
+
+
+class ChangeFeed:
+    """
+    fetch(since, limit) -> (filas, error): filas de ChangeLog con seq > since ordenadas por seq
+    (seq, entity, entityId, op, event, payload, changedAt, age).
+    head() -> (seq, error): último seq del registro, para empezar sin repetir la historia.
+    on_events(filas) -> [(nombre, datos)]: eventos extra por lote (ej: contadores del dashboard).
+    gap_open(después, antes) -> bool: ver settled().
+    find_late([(después, antes), ...]) -> (seqs, error): seqs que ya existen dentro de esos huecos.
+    """
+
+    def __init__(self, fetch, head, poll_interval=1.0, grace=120.0, batch_size=1000, backlog=1000,
+                 max_queue=256, dumps=json.dumps, on_events=None, on_error=None, gap_open=None,
+                 find_late=None, recheck=600.0, max_skipped=256):
+        self.fetch = fetch
+        self.head = head
+        self.poll_interval = poll_interval
+        self.grace = grace
+        self.gap_open = gap_open
+        self.find_late = find_late
+        self.recheck = recheck
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.dumps = dumps
+        self.on_events = on_events
+        self.on_error = on_error
+        self.last_seq = None
+        self.published = 0
+        self.dropped = 0            # Suscriptores cortados por no leer a tiempo
+        self.late_resets = 0        # Veces que apareció una fila en un hueco ya saltado
+        self._skipped = deque(maxlen=max_skipped)   # (después, antes, instante) de huecos saltados
+        self._backlog = deque(maxlen=backlog)   # (seq, mensaje)
+        self._floor = None          # El backlog tiene todos los eventos con seq > _floor
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, last_event_id=None):
+        """
+        Nuevo suscriptor. Con last_event_id se reenvían los eventos posteriores si siguen en
+        el backlog; si no, recibe 'reset' y debe resincronizar con /api/sync.
+        """
+        sub = Subscription(self.max_queue)
+        with self._lock:
+            if last_event_id is not None:
+                if self._floor is not None and last_event_id >= self._floor:
+                    for seq, message in self._backlog:
+                        if seq > last_event_id:
+                            sub.push(message)
+                else:
+                    sub.push(RESET_EVENT)
+            self._subscribers.add(sub)
+        self._ensure_thread()
+        self._wake.set()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def poll_once(self):
+        """Lee los cambios nuevos y los publica. Retorna cuántas filas consumió."""
+        if self.last_seq is None:
+            seq, error = self.head()
+            if error:
+                raise RuntimeError(error)
+            with self._lock:
+                self.last_seq = self._floor = seq
+
+        self._check_late()
+        rows, error = self.fetch(self.last_seq, self.batch_size)
+        if error:
+            raise RuntimeError(error)
+        rows = settled(rows, self.last_seq, self.grace, self.gap_open)
+        if not rows:
+            return 0
+        now = time.monotonic()
+        self._skipped.extend((after, before, now) for after, before in gaps(rows, self.last_seq))
+
+        messages = []
+        for row in rows:
+            if row['event']:
+                payload = row['payload']
+                if isinstance(payload, (str, bytes)):
+                    payload = json.loads(payload)
+                data = {'seq': row['seq'], 'entity': row['entity'], 'id': row['entityId'],
+                        'at': row['changedAt'], **(payload or {})}
+                messages.append((row['seq'], format_event(row['seq'], row['event'], data, self.dumps)))
+        last = rows[-1]['seq']
+        if messages and self.on_events:
+            evented = [row for row in rows if row['event']]
+            for name, data in self.on_events(evented):
+                messages.append((last, format_event(last, name, data, self.dumps)))
+        self._publish(messages, last)
+        return len(rows)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.push(None)
+
+    def reset_after_fork(self):
+        """En el hijo tras un fork: sin hilo ni suscriptores (sus sockets son del padre)."""
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._subscribers = set()
+        self._skipped.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'last_seq': self.last_seq,
+                'backlog': len(self._backlog),
+                'published': self.published,
+                'dropped_subscribers': self.dropped,
+                'skipped_gaps': len(self._skipped),
+                'late_resets': self.late_resets,
+            }
+
+    # ------------------------------------------
+    # Internos
+    # ------------------------------------------
+
+    def _check_late(self):
+        """Si apareció una fila en un hueco saltado, los suscriptores resincronizan desde antes de ella."""
+        cutoff = time.monotonic() - self.recheck
+        while self._skipped and self._skipped[0][2] < cutoff:
+            self._skipped.popleft()
+        if not self._skipped or self.find_late is None:
+            return
+        late, error = self.find_late([(after, before) for after, before, _ in self._skipped])
+        if error:
+            raise RuntimeError(error)
+        if not late:
+            return
+        # El resto de cada hueco (entre las filas que aparecieron) se sigue mirando
+        remaining = []
+        for after, before, skipped_at in self._skipped:
+            bounds = [after] + sorted(seq for seq in late if after < seq < before) + [before]
+            remaining.extend((lo, hi, skipped_at) for lo, hi in zip(bounds, bounds[1:]) if hi > lo + 1)
+        self._skipped.clear()
+        self._skipped.extend(remaining)
+        message = f"event: reset\ndata: {self.dumps({'since': str(min(late) - 1)})}\n\n"
+        with self._lock:
+            # Quien reanude con un Last-Event-ID anterior a ahora tampoco vio la fila: también 'reset'
+            self._backlog.clear()
+            self._floor = self.last_seq + 1
+            self.late_resets += 1
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            sub.push(message)
+
+    def _publish(self, messages, last_seq):
+        with self._lock:
+            for seq, message in messages:
+                if len(self._backlog) == self._backlog.maxlen:
+                    self._floor = self._backlog[0][0]
+                self._backlog.append((seq, message))
+            self.last_seq = last_seq
+            if not messages:
+                return
+            self.published += len(messages)
+            subscribers = list(self._subscribers)
+        overflowed = []
+        for sub in subscribers:
+            for _, message in messages:
+                sub.push(message)
+            if sub.overflowed:
+                overflowed.append(sub)
+        if overflowed:
+            with self._lock:
+                self._subscribers.difference_update(overflowed)
+                self.dropped += len(overflowed)
+
+    def _ensure_thread(self):
+        # Se arranca con el primer suscriptor (no al importar): cada worker tiene el suyo
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            if not self._subscribers:
+                # Sin suscriptores no se consulta la base. Lo ocurrido mientras tanto no queda en el
+                # backlog, así que quien reanude después recibe 'reset' en lugar de un hueco
+                with self._lock:
+                    self.last_seq = self._floor = None
+                    self._backlog.clear()
+                    self._skipped.clear()
+                self._wake.wait()
+                continue
+            try:
+                consumed = self.poll_once()
+            except Exception as e:  # La BD caída no debe terminar el hilo
+                consumed = 0
+                if self.on_error:
+                    self.on_error(e)
+            if consumed < self.batch_size:
+                self._stop.wait(self.poll_interval)
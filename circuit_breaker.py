@@ -0,0 +1,93 @@
+"""
+Circuit breaker para la conexión a MySQL.
+
+  - closed:    funcionamiento normal; cuenta fallos de conexión consecutivos.
+  - open:      tras `failure_threshold` fallos se rechaza al instante (sin intentar
+               conectar) durante `reset_timeout` segundos.
+  - half_open: pasado ese tiempo se deja pasar una sola petición de prueba; si
+               conecta se cierra el circuito, si falla vuelve a abrirse.
+"""
+import threading
+import time
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, on_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change      # on_change(estado_anterior, estado_nuevo)
+        self.state = CLOSED
+        self.failures = 0               # Fallos consecutivos
+        self.opened_at = None
+        self.rejected = 0
+        self.last_error = None
+        self._probe_started = None     # Prueba en curso (half_open)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True si se puede intentar usar la base de datos."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._set_state(HALF_OPEN)
+            # half_open: una sola prueba a la vez. Si la prueba nunca informó su resultado
+            # (ej: la petición no llegó a consultar) se permite otra pasado reset_timeout
+            now = time.monotonic()
+            if self._probe_started is not None and now - self._probe_started < self.reset_timeout:
+                self.rejected += 1
+                return False
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_started = None
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else self.last_error
+            self._probe_started = None
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._set_state(OPEN)
+
+    def record_neutral(self):
+        """El intento terminó sin saber si la BD está sana (ej: pool agotado): libera la prueba."""
+        with self._lock:
+            self._probe_started = None
+
+    def is_open(self):
+        return self.state != CLOSED
+
+    def stats(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 2)
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_in': retry_in,
+                'rejected': self.rejected,
+                'last_error': self.last_error,
+            }
+
+    def _set_state(self, state):
+        previous, self.state = self.state, state
+        if self.on_change:
+            self.on_change(previous, state)
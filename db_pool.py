@@ -0,0 +1,253 @@
+"""
+Pool de conexiones MySQL.
+
+Mantiene un conjunto de conexiones abiertas para no pagar el handshake TCP +
+autenticación en cada consulta. Soporta:
+  - size: conexiones que se conservan abiertas en reposo
+  - max_overflow: conexiones extra temporales cuando el pool está agotado
+  - recycle: segundos máximos que una conexión puede estar ociosa antes de reemplazarla
+  - pre_ping: verificación (ping) de la conexión antes de entregarla
+  - max_prepared: sentencias preparadas que se conservan por conexión (LRU)
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import mysql.connector
+from mysql.connector import Error
+
+
+# Errores de red/conexión (no de SQL): servidor caído, conexión perdida o timeout de lectura
+CONNECTION_ERRNOS = {2002, 2003, 2005, 2006, 2013, 2055, 4031}
+
+
+class PoolTimeout(Error):
+    """No se pudo obtener una conexión del pool dentro del tiempo de espera."""
+
+
+def is_connection_error(error):
+    """True si el error indica que la base de datos no responde (y no un error de la consulta)."""
+    return not isinstance(error, PoolTimeout) and (
+        error.errno in CONNECTION_ERRNOS or isinstance(error, mysql.connector.errors.InterfaceError))
+
+
+class PreparedStatements:
+    """
+    Sentencias preparadas de una conexión: SQL -> cursor preparado (protocolo binario).
+    Un cursor preparado que vuelve a ejecutar la misma sentencia no la envía ni la planifica
+    otra vez. Al superar `max_size` se cierra la menos usada (DEALLOCATE en el servidor).
+    Solo la usa el hilo que tiene la conexión, por eso no lleva lock.
+    """
+
+    def __init__(self, conn, max_size):
+        self.conn = conn
+        self.max_size = max_size
+        self._cursors = OrderedDict()
+        self.hits = 0
+        self.prepares = 0
+
+    def cursor(self, sql):
+        cursor = self._cursors.get(sql)
+        if cursor is not None:
+            self._cursors.move_to_end(sql)
+            self.hits += 1
+            return cursor
+        cursor = self.conn.cursor(prepared=True)
+        self._cursors[sql] = cursor
+        self.prepares += 1
+        while len(self._cursors) > self.max_size:
+            _, oldest = self._cursors.popitem(last=False)
+            _close_cursor(oldest)
+        return cursor
+
+    def discard(self, sql):
+        """Descarta una sentencia tras un error (ej: el servidor perdió el handle)."""
+        cursor = self._cursors.pop(sql, None)
+        if cursor is not None:
+            _close_cursor(cursor)
+
+    def close(self):
+        cursors, self._cursors = self._cursors, OrderedDict()
+        for cursor in cursors.values():
+            _close_cursor(cursor)
+
+    def __len__(self):
+        return len(self._cursors)
+
+
+def _close_cursor(cursor):
+    try:
+        cursor.close()
+    except Error:
+        pass
+
+
+class ConnectionPool:
+    def __init__(self, db_config, size=5, max_overflow=10, recycle=1800, pre_ping=True, timeout=10,
+                 max_prepared=64):
+        self.db_config = dict(db_config)
+        self.size = size
+        self.max_overflow = max_overflow
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.timeout = timeout
+        self.max_prepared = max_prepared
+
+        self._idle = []         # Pila LIFO de (conexión, último_uso)
+        self._checked_out = 0   # Conexiones entregadas (o reservadas mientras se crean)
+        self._statements = {}   # id(conexión) -> PreparedStatements (vive lo mismo que la conexión)
+        self._cond = threading.Condition()
+        self._counters = {
+            'checkouts': 0,
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'ping_failures': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'wait_seconds_total': 0.0,
+        }
+
+    # ------------------------------------------
+    # Ciclo de vida de las conexiones
+    # ------------------------------------------
+
+    def acquire(self):
+        """Entrega una conexión lista para usar. Lanza PoolTimeout si el pool sigue agotado tras `timeout`."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn, last_used = None, None
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._checked_out + len(self._idle) < self.size + self.max_overflow:
+                    # Reservamos el hueco; la conexión se crea fuera del lock
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(msg=f"Pool agotado: {self._checked_out} conexiones en uso")
+                if not waited:
+                    self._counters['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+            self._checked_out += 1
+            self._counters['checkouts'] += 1
+            self._counters['wait_seconds_total'] += time.monotonic() - start
+
+        try:
+            return self._prepare(conn, last_used)
+        except Exception:
+            with self._cond:
+                self._checked_out -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        """Devuelve la conexión al pool. Descarta la transacción pendiente y cierra las de desborde."""
+        healthy = True
+        try:
+            conn.rollback()
+        except Error:
+            healthy = False
+
+        with self._cond:
+            self._checked_out -= 1
+            keep = healthy and len(self._idle) < self.size
+            if keep:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+        if not keep:
+            self._close(conn)
+
+    def prepared(self, conn, sql):
+        """Cursor preparado para `sql` en esta conexión (se prepara solo la primera vez)."""
+        statements = self._statements.get(id(conn))
+        if statements is None:
+            with self._cond:
+                statements = self._statements[id(conn)] = PreparedStatements(conn, self.max_prepared)
+        return statements.cursor(sql)
+
+    def discard_prepared(self, conn, sql):
+        statements = self._statements.get(id(conn))
+        if statements is not None:
+            statements.discard(sql)
+
+    def reset_after_fork(self):
+        """
+        En el proceso hijo tras un fork: olvida las conexiones heredadas sin cerrarlas
+        (cerrarlas enviaría COM_QUIT por sockets que siguen siendo del padre).
+        """
+        self._cond = threading.Condition()
+        self._idle = []
+        self._checked_out = 0
+        self._statements = {}
+
+    def dispose(self):
+        """Cierra todas las conexiones ociosas (ej: al apagar o tras un fork)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Estadísticas del pool para dimensionarlo (size/overflow)."""
+        with self._cond:
+            data = dict(self._counters)
+            total = self._checked_out + len(self._idle)
+            data.update({
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'checked_out': self._checked_out,
+                'idle': len(self._idle),
+                'overflow': max(0, total - self.size),
+                'prepared_statements': sum(len(st) for st in self._statements.values()),
+                'prepared_hits': sum(st.hits for st in self._statements.values()),
+                'prepared_misses': sum(st.prepares for st in self._statements.values()),
+            })
+        checkouts = data['checkouts'] or 1
+        data['avg_wait_ms'] = round(data['wait_seconds_total'] * 1000 / checkouts, 3)
+        return data
+
+    # ------------------------------------------
+    # Internos
+    # ------------------------------------------
+
+    def _prepare(self, conn, last_used):
+        if conn is not None and self.recycle and time.monotonic() - last_used > self.recycle:
+            self._count('recycled')
+            self._close(conn)
+            conn = None
+
+        if conn is not None and self.pre_ping:
+            try:
+                conn.ping(reconnect=False)
+            except Error:
+                self._count('ping_failures')
+                self._close(conn)
+                conn = None
+
+        if conn is None:
+            conn = mysql.connector.connect(**self.db_config)
+            self._count('created')
+        return conn
+
+    def _close(self, conn):
+        with self._cond:
+            statements = self._statements.pop(id(conn), None)
+        if statements is not None:
+            statements.close()
+        try:
+            conn.close()
+        except Error:
+            pass
+        self._count('closed')
+
+    def _count(self, key):
+        with self._cond:
+            self._counters[key] += 1
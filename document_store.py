@@ -0,0 +1,476 @@
+"""
+Almacén de documentos direccionado por contenido (SHA-256).
+
+Cada archivo se guarda una sola vez bajo su hash: las copias idénticas (DNI, contratos
+modelo) ocupan el espacio de una. La subida es en streaming: los bloques se escriben a
+medida que llegan mientras se calcula el hash y al terminar el blob queda bajo su clave
+definitiva (o se descarta si ya existía). Un blob es inmutable: su hash es su ETag.
+
+  - LocalStorage:  sistema de archivos local; path() permite servir con sendfile.
+  - S3Storage:     API de S3 (boto3 contra un servicio compatible, o LocalS3Client).
+                   Sube por partes de `part_size` mientras calcula el hash.
+  - LocalS3Client: subconjunto de la API de S3 sobre un directorio, sin red.
+
+Los blobs sin documentos que los referencien se borran con purge(); nunca al borrar un
+documento, porque otro puede estar subiendo el mismo contenido en ese momento.
+"""
+import datetime
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from collections import namedtuple
+
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+CHUNK_SIZE = 64 * 1024
+
+Blob = namedtuple('Blob', 'digest size deduplicated')
+
+
+class BlobTooLarge(Exception):
+    pass
+
+
+class MultipartError(ValueError):
+    pass
+
+
+def blob_key(digest):
+    """Clave del blob: dos niveles de directorio para no juntar millones de archivos en uno."""
+    return f'{digest[:2]}/{digest[2:4]}/{digest}'
+
+
+def receive_multipart(stream, boundary, open_writer, field_limit=64 * 1024):
+    """
+    Lee un multipart/form-data en streaming. Los campos de texto se juntan en un dict; el
+    archivo (uno por petición) se escribe bloque a bloque en open_writer(), sin pasar por
+    memoria ni por los temporales del parser de formularios.
+    Retorna (campos, (blob, nombre_archivo, content_type) o None).
+    """
+    decoder = MultipartDecoder(boundary.encode('latin-1'), max_form_memory_size=field_limit)
+    fields, upload = {}, None
+    writer = name = buffer = filename = content_type = None
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                decoder.receive_data(stream.read(CHUNK_SIZE) or None)
+            elif isinstance(event, File):
+                if writer is not None:
+                    raise MultipartError("Solo se admite un archivo por petición")
+                writer, filename = open_writer(), event.filename
+                content_type = event.headers.get('Content-Type')
+                name, buffer = None, None
+            elif isinstance(event, Field):
+                name, buffer = event.name, bytearray()
+            elif isinstance(event, Data):
+                if buffer is None:
+                    writer.write(event.data)
+                    if not event.more_data:
+                        upload = (writer.commit(), filename, content_type)
+                else:
+                    buffer.extend(event.data)
+                    if not event.more_data:
+                        fields[name] = buffer.decode('utf-8')
+            elif isinstance(event, Epilogue):
+                break
+    except Exception:
+        if writer is not None and upload is None:
+            writer.abort()
+        raise
+    return fields, upload
+
+
+# ------------------------------------------
+# Sistema de archivos local
+# ------------------------------------------
+
+class LocalBlobWriter:
+    def __init__(self, storage, max_size=None):
+        self.storage = storage
+        self.max_size = max_size
+        self.size = 0
+        self._hash = hashlib.sha256()
+        fd, self._tmp = tempfile.mkstemp(dir=storage.tmp_dir, prefix='upload-')
+        self._file = os.fdopen(fd, 'wb')
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise BlobTooLarge(f"El archivo supera {self.max_size} bytes")
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        digest = self._hash.hexdigest()
+        path = self.storage.path(digest)
+        if os.path.exists(path):
+            os.unlink(self._tmp)
+            os.utime(path)  # Aleja el blob del purge mientras se registra el documento
+            return Blob(digest, self.size, True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self._tmp, path)  # Atómico: dos subidas iguales a la vez dejan el mismo contenido
+        return Blob(digest, self.size, False)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.unlink(self._tmp)
+        except FileNotFoundError:
+            pass
+
+
+class LocalStorage:
+    backend = 'local'
+
+    def __init__(self, root):
+        self.root = root
+        self.blobs_dir = os.path.join(root, 'sha256')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def writer(self, max_size=None):
+        return LocalBlobWriter(self, max_size)
+
+    def path(self, digest):
+        """Ruta del blob en disco (para send_file/sendfile)."""
+        return os.path.join(self.blobs_dir, *blob_key(digest).split('/'))
+
+    def size(self, digest):
+        try:
+            return os.path.getsize(self.path(digest))
+        except FileNotFoundError:
+            return None
+
+    def open_range(self, digest, start, end):
+        """Bytes [start, end] del blob, en bloques."""
+        with open(self.path(digest), 'rb') as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, digest):
+        try:
+            os.unlink(self.path(digest))
+        except FileNotFoundError:
+            pass
+
+    def iter_blobs(self):
+        """(hash, mtime) de cada blob guardado."""
+        for dirpath, _, filenames in os.walk(self.blobs_dir):
+            for filename in filenames:
+                yield filename, os.path.getmtime(os.path.join(dirpath, filename))
+
+
+# ------------------------------------------
+# S3 (o compatible)
+# ------------------------------------------
+
+def not_found(error):
+    """True si el error de la API de S3 (botocore ClientError o S3Error) es de objeto inexistente."""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+    return code in ('404', 'NoSuchKey', 'NotFound')
+
+
+def boto3_client(endpoint_url):
+    import boto3  # Dependencia opcional: solo si se configura DOCUMENT_S3_ENDPOINT
+    return boto3.client('s3', endpoint_url=endpoint_url)
+
+
+class S3BlobWriter:
+    def __init__(self, storage, max_size=None):
+        self.storage = storage
+        self.max_size = max_size
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._tmp_key = f'{storage.prefix}tmp/{uuid.uuid4().hex}'
+        self._upload_id = None
+        self._parts = []
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_size and self.size > self.max_size:
+            raise BlobTooLarge(f"El archivo supera {self.max_size} bytes")
+        self._hash.update(chunk)
+        self._buffer.extend(chunk)
+        if len(self._buffer) >= self.storage.part_size:
+            self._flush_part()
+
+    def commit(self):
+        s3, bucket = self.storage.client, self.storage.bucket
+        digest = self._hash.hexdigest()
+        key = self.storage.key(digest)
+        if self._upload_id is None:
+            # Cabe en una parte: ya está en memoria, no hace falta objeto temporal
+            if self.storage.exists(digest):
+                self.storage.touch(digest)
+                return Blob(digest, self.size, True)
+            s3.put_object(Bucket=bucket, Key=key, Body=bytes(self._buffer))
+            return Blob(digest, self.size, False)
+
+        if self._buffer:
+            self._flush_part()
+        s3.complete_multipart_upload(Bucket=bucket, Key=self._tmp_key, UploadId=self._upload_id,
+                                     MultipartUpload={'Parts': self._parts})
+        try:
+            deduplicated = self.storage.exists(digest)
+            if deduplicated:
+                self.storage.touch(digest)
+            else:
+                s3.copy_object(Bucket=bucket, Key=key, CopySource={'Bucket': bucket, 'Key': self._tmp_key})
+        finally:
+            s3.delete_object(Bucket=bucket, Key=self._tmp_key)
+        return Blob(digest, self.size, deduplicated)
+
+    def abort(self):
+        if self._upload_id is not None:
+            self.storage.client.abort_multipart_upload(Bucket=self.storage.bucket, Key=self._tmp_key,
+                                                       UploadId=self._upload_id)
+        self._buffer = bytearray()
+
+    def _flush_part(self):
+        s3 = self.storage.client
+        if self._upload_id is None:
+            self._upload_id = s3.create_multipart_upload(Bucket=self.storage.bucket, Key=self._tmp_key)['UploadId']
+        number = len(self._parts) + 1
+        part = s3.upload_part(Bucket=self.storage.bucket, Key=self._tmp_key, UploadId=self._upload_id,
+                              PartNumber=number, Body=bytes(self._buffer))
+        self._parts.append({'PartNumber': number, 'ETag': part['ETag']})
+        self._buffer = bytearray()
+
+
+class S3Storage:
+    backend = 's3'
+
+    def __init__(self, client, bucket, prefix='sha256/', part_size=8 * 1024 * 1024):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.part_size = part_size  # S3 exige partes de al menos 5 MB (salvo la última)
+
+    def key(self, digest):
+        return self.prefix + blob_key(digest)
+
+    def writer(self, max_size=None):
+        return S3BlobWriter(self, max_size)
+
+    def path(self, digest):
+        return None  # Sin archivo local: se sirve con open_range
+
+    def size(self, digest):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(digest))['ContentLength']
+        except Exception as e:
+            if not_found(e):
+                return None
+            raise
+
+    def exists(self, digest):
+        return self.size(digest) is not None
+
+    def touch(self, digest):
+        """Renueva LastModified (copia sobre sí mismo) para alejar el blob del purge."""
+        key = self.key(digest)
+        self.client.copy_object(Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': key},
+                                MetadataDirective='REPLACE')
+
+    def open_range(self, digest, start, end):
+        body = self.client.get_object(Bucket=self.bucket, Key=self.key(digest), Range=f'bytes={start}-{end}')['Body']
+        try:
+            while True:
+                chunk = body.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            body.close()
+
+    def delete(self, digest):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(digest))
+
+    def iter_blobs(self):
+        kwargs = {'Bucket': self.bucket, 'Prefix': self.prefix}
+        while True:
+            page = self.client.list_objects_v2(**kwargs)
+            for item in page.get('Contents', []):
+                name = item['Key'].rsplit('/', 1)[-1]
+                if not item['Key'].startswith(self.prefix + 'tmp/'):
+                    yield name, item['LastModified'].timestamp()
+            if not page.get('IsTruncated'):
+                return
+            kwargs['ContinuationToken'] = page['NextContinuationToken']
+
+
+class S3Error(Exception):
+    """Error con la forma de botocore ClientError (e.response['Error']['Code'])."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+        self.response = {'Error': {'Code': code, 'Message': message}}
+
+
+class _RangeReader:
+    def __init__(self, f, length):
+        self._file = f
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class LocalS3Client:
+    """
+    Lo necesario de la API de S3 (mismas firmas que boto3) guardando los objetos en
+    `root/<bucket>/<key>`. Permite usar S3Storage sin red: desarrollo, CI y pruebas de carga.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def put_object(self, Bucket, Key, Body):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{uuid.uuid4().hex}.part'
+        with open(tmp, 'wb') as f:
+            if isinstance(Body, (bytes, bytearray)):
+                f.write(Body)
+            else:
+                shutil.copyfileobj(Body, f, CHUNK_SIZE)
+        os.replace(tmp, path)
+        return {'ETag': self._etag(path)}
+
+    def head_object(self, Bucket, Key):
+        path = self._existing(Bucket, Key)
+        stat = os.stat(path)
+        return {'ContentLength': stat.st_size, 'ETag': self._etag(path), 'LastModified': self._mtime(stat.st_mtime)}
+
+    def get_object(self, Bucket, Key, Range=None):
+        path = self._existing(Bucket, Key)
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        if Range:
+            first, _, last = Range.removeprefix('bytes=').partition('-')
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+        f = open(path, 'rb')
+        f.seek(start)
+        return {'Body': _RangeReader(f, end - start + 1), 'ContentLength': end - start + 1}
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective='COPY'):
+        source = self._existing(CopySource['Bucket'], CopySource['Key'])
+        target = self._path(Bucket, Key)
+        if source == target:
+            os.utime(target)
+        else:
+            with open(source, 'rb') as f:
+                self.put_object(Bucket, Key, f)
+        return {'CopyObjectResult': {'LastModified': self._mtime(os.path.getmtime(target))}}
+
+    def delete_object(self, Bucket, Key):
+        try:
+            os.unlink(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(Bucket, upload_id))
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        path = os.path.join(self._upload_dir(Bucket, UploadId), f'{PartNumber:05d}')
+        with open(path, 'wb') as f:
+            f.write(Body)
+        return {'ETag': self._etag(path)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        directory = self._upload_dir(Bucket, UploadId)
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as out:
+            for part in MultipartUpload['Parts']:
+                with open(os.path.join(directory, f"{part['PartNumber']:05d}"), 'rb') as f:
+                    shutil.copyfileobj(f, out, CHUNK_SIZE)
+        shutil.rmtree(directory)
+        return {'Key': Key}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        shutil.rmtree(self._upload_dir(Bucket, UploadId), ignore_errors=True)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', ContinuationToken=None, MaxKeys=1000):
+        base = os.path.join(self.root, Bucket, 'objects')
+        keys = []
+        for dirpath, _, filenames in os.walk(base):
+            for filename in filenames:
+                key = os.path.relpath(os.path.join(dirpath, filename), base).replace(os.sep, '/')
+                if key.startswith(Prefix) and not key.endswith('.part'):
+                    keys.append(key)
+        keys.sort()
+        if ContinuationToken:
+            keys = [key for key in keys if key > ContinuationToken]
+        page = keys[:MaxKeys]
+        contents = []
+        for key in page:
+            stat = os.stat(self._path(Bucket, key))
+            contents.append({'Key': key, 'Size': stat.st_size, 'LastModified': self._mtime(stat.st_mtime)})
+        result = {'Contents': contents, 'IsTruncated': len(keys) > MaxKeys}
+        if result['IsTruncated']:
+            result['NextContinuationToken'] = page[-1]
+        return result
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, 'objects', *key.split('/'))
+
+    def _existing(self, bucket, key):
+        path = self._path(bucket, key)
+        if not os.path.isfile(path):
+            raise S3Error('NoSuchKey', f"{bucket}/{key}")
+        return path
+
+    def _upload_dir(self, bucket, upload_id):
+        return os.path.join(self.root, bucket, 'uploads', upload_id)
+
+    @staticmethod
+    def _etag(path):
+        stat = os.stat(path)
+        return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+    @staticmethod
+    def _mtime(timestamp):
+        return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc)
+
+
+def purge(storage, referenced, grace_seconds):
+    """
+    Borra los blobs que no están en `referenced` (documentos, fotos) y que no se tocaron en `grace_seconds`
+    (una subida en curso ya tiene su blob pero todavía no su fila).
+    Retorna cuántos borró.
+    """
+    cutoff = time.time() - grace_seconds
+    removed = 0
+    for digest, modified in list(storage.iter_blobs()):
+        if digest not in referenced and modified < cutoff:
+            storage.delete(digest)
+            removed += 1
+    return removed
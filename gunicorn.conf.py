@@ -0,0 +1,65 @@
+"""
+Configuración de producción (gunicorn la lee automáticamente):
+
+    gunicorn app:app
+
+Prefork: WEB_CONCURRENCY procesos con WEB_THREADS hilos cada uno. Cada worker
+importa la app después del fork, así que crea su propio pool de conexiones
+(DB_POOL_SIZE, por defecto = WEB_THREADS). Antes de aceptar tráfico el worker
+ejecuta app.warm_up(); al apagarse (SIGTERM) deja de aceptar conexiones,
+termina las peticiones en curso dentro de GRACEFUL_TIMEOUT y ejecuta app.drain().
+"""
+import multiprocessing
+import os
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('WEB_THREADS', 4))
+# gthread: un hilo por petición en curso, incluidos los streams SSE (/api/events). Para muchos
+# suscriptores usar WORKER_CLASS=gevent (pip install gevent) con WORKER_CONNECTIONS por worker
+worker_class = os.getenv('WORKER_CLASS', 'gthread')
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 1000))
+
+# Con preload el código se importa una vez en el master (arranque más rápido, memoria compartida);
+# el pool y los executors se reinician en cada hijo (os.register_at_fork en app.py)
+preload_app = os.getenv('PRELOAD_APP', '0') == '1'
+
+timeout = int(os.getenv('WORKER_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('KEEPALIVE', 5))
+
+# Reciclar workers de a poco para acotar fugas de memoria sin reiniciarlos todos a la vez
+max_requests = int(os.getenv('MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.getenv('MAX_REQUESTS_JITTER', 1000))
+
+accesslog = os.getenv('ACCESS_LOG', '-')
+loglevel = os.getenv('LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """Se ejecuta en el worker con la app ya cargada y antes de aceptar conexiones."""
+    from app import close_streams, warm_up
+    warm_up()
+
+    # SIGTERM: cerrar los streams SSE para que el apagado ordenado no espere graceful_timeout.
+    # Se hace en otro hilo: el handler no debe tomar locks que el hilo interrumpido podría tener
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(sig, frame):
+        threading.Thread(target=close_streams, daemon=True).start()
+        if callable(previous):
+            previous(sig, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_exit(server, worker):
+    """Tras terminar las peticiones en curso: vaciar colas y cerrar conexiones."""
+    from app import drain
+    drain()
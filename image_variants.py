@@ -0,0 +1,273 @@
+"""
+Derivados de imágenes (fotos de propiedades y de agentes) generados fuera de la petición.
+
+  - render(): redimensiona y recodifica una imagen (Pillow). Corre en un proceso del pool:
+    decodificar y escalar una foto de 12 MP es CPU pura y con hilos tomaría el GIL del worker.
+  - VariantCache: derivados en disco bajo `root/<variante>/<aa>/<hash>.<ext>`, acotados a
+    `max_bytes`; al pasarse borra los menos usados (mtime, renovado al servirlos).
+  - ImagePipeline: encola los derivados de una imagen (al subirla o al pedir uno que falta)
+    y evita generar dos veces el mismo.
+
+Los derivados se direccionan por el hash del original, así que nunca cambian: se sirven
+con Cache-Control immutable.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+# Nombre -> caja máxima (ancho, alto); la imagen se escala sin deformar y nunca se agranda
+VARIANTS = {
+    'thumbnail': (160, 120),
+    'card': (480, 360),
+    'full': (1600, 1200),
+}
+FORMATS = {'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+MAX_SOURCE_PIXELS = 50_000_000  # Una foto de cámara tiene ~12-50 MP; más es una bomba de descompresión
+
+
+class NotAnImage(Exception):
+    pass
+
+
+def render(source, box, fmt, quality, dest):
+    """
+    Escribe en `dest` la imagen `source` (ruta o bytes) ajustada a `box` en formato `fmt`.
+    Retorna los bytes escritos. Se ejecuta en el proceso del pool.
+    """
+    import io
+    from PIL import Image, ImageOps  # Dependencia pesada: solo en los procesos del pool
+
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    tmp = f'{dest}.{uuid.uuid4().hex}.tmp'
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            # JPEG puede decodificar ya reducido (1/2, 1/4, 1/8): mucho menos trabajo para miniaturas
+            img.draft('RGB', (box[0] * 2, box[1] * 2))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail(box, Image.LANCZOS)
+            pil_format = FORMATS[fmt][0]
+            if pil_format == 'JPEG' and img.mode != 'RGB':
+                img = img.convert('RGB')
+            elif img.mode not in ('RGB', 'RGBA'):
+                img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            img.save(tmp, pil_format, quality=quality, optimize=True)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise NotAnImage(str(e)) from None
+    os.replace(tmp, dest)
+    return os.path.getsize(dest)
+
+
+class VariantCache:
+    def __init__(self, root, max_bytes, ext, touch_interval=3600):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ext = ext
+        self.touch_interval = touch_interval   # mtime = último uso, renovado como mucho cada tanto
+        self.low_watermark = int(max_bytes * 0.9)
+        self.evicted = 0
+        self.hits = 0
+        self.misses = 0
+        self._estimate = None       # Bytes en disco según el último recorrido + lo escrito después
+        self._lock = threading.Lock()
+
+    def path(self, digest, variant):
+        return os.path.join(self.root, variant, digest[:2], f'{digest}.{self.ext}')
+
+    def get(self, digest, variant):
+        """Ruta del derivado si ya existe (y lo marca como usado), o None."""
+        path = self.path(digest, variant)
+        try:
+            modified = os.path.getmtime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if time.time() - modified > self.touch_interval:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return None     # Lo borró la expulsión de otro worker
+        return path
+
+    def added(self, size):
+        """Registra un derivado nuevo; si el total pasa de max_bytes expulsa hasta low_watermark."""
+        with self._lock:
+            if self._estimate is None:
+                self._estimate = self._scan_total()     # Ya incluye el derivado nuevo
+            else:
+                self._estimate += size
+            if self._estimate <= self.max_bytes:
+                return
+            # Los otros workers también escriben: el total real se mide al recorrer
+            self._estimate = self._evict()
+
+    def stats(self):
+        return {
+            'max_bytes': self.max_bytes,
+            'estimated_bytes': self._estimate or 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evicted': self.evicted,
+        }
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith('.tmp'):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, path
+
+    def _scan_total(self):
+        return sum(size for _, size, _ in self._files())
+
+    def _evict(self):
+        files = sorted(self._files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.low_watermark:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.evicted += 1
+        return total
+
+
+class ImagePipeline:
+    """
+    load_source(hash) -> ruta o bytes del original (o None si no existe).
+    wait: segundos que una petición espera un derivado que falta antes de responder 503.
+    """
+
+    def __init__(self, cache, load_source, fmt='webp', quality=80, max_workers=2, wait=5.0, on_error=None):
+        self.cache = cache
+        self.load_source = load_source
+        self.fmt = fmt
+        self.quality = quality
+        self.max_workers = max_workers
+        self.wait = wait
+        self.on_error = on_error
+        self.rendered = 0
+        self.failed = 0
+        self._pending = {}          # (hash, variante) -> Future
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def mimetype(self):
+        return FORMATS[self.fmt][1]
+
+    def submit(self, digest, variants=tuple(VARIANTS)):
+        """Encola los derivados que falten (ej: al subir una foto). Retorna {variante: Future}."""
+        futures = {}
+        source = None
+        for variant in variants:
+            if os.path.exists(self.cache.path(digest, variant)):
+                continue
+            with self._lock:
+                future = self._pending.get((digest, variant))
+            if future is None:
+                if source is None:
+                    source = self.load_source(digest)
+                    if source is None:
+                        break
+                future = self._start(digest, variant, source)
+            futures[variant] = future
+        return futures
+
+    def get(self, digest, variant):
+        """
+        Ruta del derivado, generándolo si falta. Retorna (ruta, error) con error
+        'not_found' (no hay original), 'not_image' o 'timeout' (sigue generándose).
+        """
+        path = self.cache.get(digest, variant)
+        if path is not None:
+            return path, None
+        future = self.submit(digest, (variant,)).get(variant)
+        if future is None:
+            path = self.cache.get(digest, variant)
+            return (path, None) if path else (None, 'not_found')
+        try:
+            future.result(timeout=self.wait)
+        except FutureTimeout:
+            return None, 'timeout'
+        except NotAnImage:
+            return None, 'not_image'
+        except Exception:   # Ya informado por on_error (ej: un proceso del pool murió)
+            return None, 'error'
+        return self.cache.path(digest, variant), None
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def reset_after_fork(self):
+        """En el hijo tras un fork: los procesos del pool son del padre; se crea otro al usarlo."""
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = {}
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {'pending': pending, 'rendered': self.rendered, 'failed': self.failed, **self.cache.stats()}
+
+    # ------------------------------------------
+    # Internos
+    # ------------------------------------------
+
+    def _start(self, digest, variant, source):
+        key = (digest, variant)
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            args = (render, source, VARIANTS[variant], self.fmt, self.quality, self.cache.path(digest, variant))
+            try:
+                future = self._get_executor().submit(*args)
+            except BrokenProcessPool:
+                # Un proceso murió (ej: OOM con una imagen enorme): el pool queda inservible
+                self._executor = None
+                future = self._get_executor().submit(*args)
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _done(self, key, future):
+        with self._lock:
+            self._pending.pop(key, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.failed += 1
+            if self.on_error and not isinstance(error, NotAnImage):
+                self.on_error(key, error)
+            return
+        self.rendered += 1
+        self.cache.added(future.result())
+
+    def _get_executor(self):
+        # Se crea al primer uso y sin fork directo: el worker tiene hilos (gthread, monitores) y un
+        # fork podría copiar locks tomados. forkserver arranca un proceso limpio una vez y clona ese
+        if self._executor is None:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(method))
+        return self._executor
@@ -0,0 +1,265 @@
+"""
+Importación masiva de Clientes y Propiedades (CSV o NDJSON).
+
+Las filas se leen y validan en streaming, se agrupan en lotes de `chunk_size`
+y cada lote se inserta con un executemany (INSERT multi-fila) en su propia
+transacción. Las referencias a Clientes (ownerId u ownerDniRuc) y Agentes se
+resuelven con una sola consulta IN (...) por lote.
+"""
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from mysql.connector import Error
+
+CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+CURRENCIES = ('USD', 'PEN')
+OPERATIONS = ('VENTA', 'ALQUILER')
+PROPERTY_STATUSES = ('DISPONIBLE', 'RESERVADO', 'VENDIDO', 'ALQUILADO', 'RETIRADO')
+
+CLIENT_INSERT = """INSERT INTO Clients (fullName, dniRuc, phone, email, isOwner, notes)
+                   VALUES (%s, %s, %s, %s, %s, %s)"""
+PROPERTY_INSERT = """INSERT INTO Properties (title, description, address, city, price, currency, commissionPct,
+                                             status, operation, agentId, ownerId, exclusive)
+                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
+
+# ------------------------------------------
+# Lectura
+# ------------------------------------------
+
+def iter_records(stream, fmt):
+    """Genera (número_de_fila, dict) desde un stream binario CSV o NDJSON sin cargarlo completo."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        # La fila 1 es la cabecera
+        for line_no, record in enumerate(csv.DictReader(text), start=2):
+            yield line_no, record
+        return
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            record = {'__error__': f"JSON inválido: {e}"}
+        if not isinstance(record, dict):
+            record = {'__error__': "Cada línea debe ser un objeto JSON"}
+        yield line_no, record
+
+
+# ------------------------------------------
+# Validación por fila
+# ------------------------------------------
+
+def _text(record, key, errors, required=False, max_len=None):
+    value = record.get(key)
+    value = str(value).strip() if value not in (None, '') else None
+    if value is None:
+        if required:
+            errors.append(f"{key} es obligatorio")
+        return None
+    if max_len and len(value) > max_len:
+        errors.append(f"{key} excede {max_len} caracteres")
+    return value
+
+def _decimal(record, key, errors, default=None, required=False):
+    value = record.get(key)
+    if value in (None, ''):
+        if required:
+            errors.append(f"{key} es obligatorio")
+        return default
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        errors.append(f"{key} no es numérico")
+        return None
+    if number < 0:
+        errors.append(f"{key} no puede ser negativo")
+    return number
+
+def _int(record, key, errors, required=False):
+    value = record.get(key)
+    if value in (None, ''):
+        if required:
+            errors.append(f"{key} es obligatorio")
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors.append(f"{key} debe ser entero")
+        return None
+
+def _flag(record, key, default):
+    value = record.get(key)
+    if value in (None, ''):
+        return default
+    return int(str(value).strip().lower() in ('1', 'true', 'si', 'sí', 'yes'))
+
+def _choice(record, key, choices, errors, default=None):
+    value = (str(record.get(key) or '').strip().upper()) or default
+    if value is None:
+        errors.append(f"{key} es obligatorio")
+    elif value not in choices:
+        errors.append(f"{key} debe ser uno de {', '.join(choices)}")
+    return value
+
+def validate_client(record):
+    """Retorna (valores para CLIENT_INSERT, errores)."""
+    errors = []
+    values = (
+        _text(record, 'fullName', errors, required=True, max_len=100),
+        _text(record, 'dniRuc', errors, max_len=20),
+        _text(record, 'phone', errors, required=True, max_len=20),
+        _text(record, 'email', errors, max_len=100),
+        _flag(record, 'isOwner', 1),
+        _text(record, 'notes', errors),
+    )
+    return values, errors
+
+def validate_property(record):
+    """
+    Retorna (valores para PROPERTY_INSERT, errores).
+    El propietario se indica con ownerId o con ownerDniRuc; se resuelve luego por lote.
+    """
+    errors = []
+    values = {
+        'title': _text(record, 'title', errors, required=True, max_len=200),
+        'description': _text(record, 'description', errors),
+        'address': _text(record, 'address', errors, max_len=255),
+        'city': _text(record, 'city', errors, max_len=100) or 'Ilo',
+        'price': _decimal(record, 'price', errors, required=True),
+        'currency': _choice(record, 'currency', CURRENCIES, errors, default='USD'),
+        'commissionPct': _decimal(record, 'commissionPct', errors, default=Decimal('3.00')),
+        'status': _choice(record, 'status', PROPERTY_STATUSES, errors, default='DISPONIBLE'),
+        'operation': _choice(record, 'operation', OPERATIONS, errors),
+        'agentId': _int(record, 'agentId', errors, required=True),
+        'ownerId': _int(record, 'ownerId', errors),
+        'ownerDniRuc': _text(record, 'ownerDniRuc', errors, max_len=20),
+        'exclusive': _flag(record, 'exclusive', 0),
+    }
+    if values['ownerId'] is None and values['ownerDniRuc'] is None:
+        errors.append("ownerId u ownerDniRuc es obligatorio")
+    return values, errors
+
+
+# ------------------------------------------
+# Resolución de referencias por lote
+# ------------------------------------------
+
+def _lookup(cursor, sql, keys):
+    keys = list(keys)
+    if not keys:
+        return {}
+    placeholders = ', '.join(['%s'] * len(keys))
+    cursor.execute(sql.format(placeholders=placeholders), keys)
+    return {key: row_id for row_id, key in cursor.fetchall()}
+
+def resolve_property_refs(cursor, chunk):
+    """Completa ownerId desde ownerDniRuc y valida que existan propietarios y agentes activos."""
+    owner_ids = _lookup(cursor, "SELECT id, id FROM Clients WHERE id IN ({placeholders})",
+                        {v['ownerId'] for _, v in chunk if v['ownerId'] is not None})
+    owner_dnis = _lookup(cursor, "SELECT id, dniRuc FROM Clients WHERE dniRuc IN ({placeholders})",
+                         {v['ownerDniRuc'] for _, v in chunk if v['ownerId'] is None})
+    agents = _lookup(cursor, "SELECT id, id FROM Users WHERE isActive = 1 AND id IN ({placeholders})",
+                     {v['agentId'] for _, v in chunk})
+
+    resolved, failed = [], []
+    for line_no, v in chunk:
+        errors = []
+        owner_id = v['ownerId'] if v['ownerId'] is not None else owner_dnis.get(v['ownerDniRuc'])
+        if v['ownerId'] is not None and v['ownerId'] not in owner_ids:
+            errors.append(f"ownerId {v['ownerId']} no existe")
+        elif owner_id is None:
+            errors.append(f"No existe cliente con dniRuc {v['ownerDniRuc']}")
+        if v['agentId'] not in agents:
+            errors.append(f"agentId {v['agentId']} no existe o está inactivo")
+        if errors:
+            failed.append((line_no, errors))
+            continue
+        resolved.append((line_no, (
+            v['title'], v['description'], v['address'], v['city'], v['price'], v['currency'],
+            v['commissionPct'], v['status'], v['operation'], v['agentId'], owner_id, v['exclusive'],
+        )))
+    return resolved, failed
+
+
+# ------------------------------------------
+# Orquestación
+# ------------------------------------------
+
+class ImportReport:
+    def __init__(self, entity):
+        self.entity = entity
+        self.total_rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line_no, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line_no, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'entity': self.entity,
+            'total_rows': self.total_rows,
+            'inserted': self.inserted,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+def run_import(conn, entity, records, chunk_size=CHUNK_SIZE):
+    """
+    Importa `records` (iterable de (fila, dict)) usando `conn`.
+    Cada lote es una transacción: si el INSERT del lote falla se revierte y todas sus filas
+    se reportan con el error de la base de datos.
+    """
+    validate = validate_client if entity == 'clients' else validate_property
+    report = ImportReport(entity)
+    chunk = []
+
+    def flush():
+        cursor = conn.cursor()
+        rows = chunk
+        try:
+            if entity == 'clients':
+                failed = []
+                sql = CLIENT_INSERT
+            else:
+                rows, failed = resolve_property_refs(cursor, chunk)
+                sql = PROPERTY_INSERT
+            for line_no, errors in failed:
+                report.fail(line_no, errors)
+            if rows:
+                cursor.executemany(sql, [values for _, values in rows])
+                conn.commit()
+                report.inserted += len(rows)
+        except Error as e:
+            conn.rollback()
+            for line_no, _ in rows:
+                report.fail(line_no, [f"Error de base de datos en el lote: {e}"])
+        finally:
+            cursor.close()
+        chunk.clear()
+
+    for line_no, record in records:
+        report.total_rows += 1
+        if '__error__' in record:
+            report.fail(line_no, [record['__error__']])
+            continue
+        values, errors = validate(record)
+        if errors:
+            report.fail(line_no, errors)
+            continue
+        chunk.append((line_no, values))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return report
@@ -0,0 +1,142 @@
+"""
+Proveedor JSON de Flask optimizado para filas de MySQL.
+
+- Decimal (price, commissionPct, totalCommission...) como string (por defecto,
+  igual que Flask) o como número: JSON_DECIMAL_AS=string|number.
+- Fechas en el formato HTTP de Flask (por defecto) o ISO 8601: JSON_DATE_FORMAT=http|iso.
+- Tipos de MySQL: TIME (timedelta), BLOB/bytearray, SET, RowSet.
+- Usa orjson si está instalado (dependencia opcional); si no, el json estándar
+  con un `default` que resuelve los tipos anteriores sin pasar por la cadena
+  de isinstance de Flask.
+- Listas grandes (más de stream_threshold filas) se envían en streaming por
+  bloques en lugar de construir una sola cadena gigante.
+"""
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+
+from flask.json.provider import DefaultJSONProvider
+
+from rowset import RowSet
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional
+    orjson = None
+
+_WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value):
+    """
+    Mismo resultado que werkzeug.http.http_date ('Thu, 02 Jan 2025 03:04:00 GMT') sin pasar
+    por email.utils: es el costo dominante al serializar listados con createdAt.
+    """
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        hour, minute, second = value.hour, value.minute, value.second
+    else:
+        hour = minute = second = 0
+    return (f'{_WEEKDAYS[value.weekday()]}, {value.day:02d} {_MONTHS[value.month - 1]} {value.year:04d} '
+            f'{hour:02d}:{minute:02d}:{second:02d} GMT')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    decimal_as = 'string'       # 'string' conserva la precisión exacta; 'number' emite 125000.5
+    date_format = 'http'        # 'http' = formato actual de Flask; 'iso' = 2025-01-31T10:00:00
+    stream_threshold = 5000     # Filas a partir de las cuales la respuesta va en streaming
+    stream_chunk = 1000         # Filas por bloque en streaming
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None
+
+    # ------------------------------------------
+    # Conversión de tipos no nativos
+    # ------------------------------------------
+
+    def _convert(self, o):
+        if isinstance(o, decimal.Decimal):
+            return str(o) if self.decimal_as == 'string' else float(o)
+        if isinstance(o, datetime.date):
+            # datetime es subclase de date
+            return o.isoformat() if self.date_format == 'iso' else http_date(o)
+        if isinstance(o, datetime.time):
+            return o.isoformat()
+        if isinstance(o, datetime.timedelta):
+            return str(o)
+        if isinstance(o, RowSet):
+            return o.records()
+        if isinstance(o, (bytes, bytearray)):
+            return o.decode('utf-8', 'replace')
+        if isinstance(o, (set, frozenset)):
+            return list(o)
+        if isinstance(o, uuid.UUID):
+            return str(o)
+        if dataclasses.is_dataclass(o) and not isinstance(o, type):
+            return dataclasses.asdict(o)
+        if hasattr(o, '__html__'):
+            return str(o.__html__())
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.date_format != 'iso':
+            options |= orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    # ------------------------------------------
+    # API del proveedor
+    # ------------------------------------------
+
+    def dumps_bytes(self, obj):
+        if self.use_orjson:
+            return orjson.dumps(obj, default=self._convert, option=self._orjson_options())
+        return json.dumps(obj, default=self._convert, ensure_ascii=self.ensure_ascii,
+                          sort_keys=self.sort_keys, separators=(',', ':')).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Opciones explícitas (ej: indent): se respeta el comportamiento estándar
+            kwargs.setdefault('default', self._convert)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def ndjson(self, columns, rows):
+        """Un bloque NDJSON (una línea por fila) desde tuplas y nombres de columna."""
+        return b''.join(self.dumps_bytes(dict(zip(columns, row))) + b'\n' for row in rows)
+
+    def iter_array(self, items):
+        """Genera un arreglo JSON por bloques de stream_chunk elementos."""
+        if isinstance(items, RowSet):
+            columns, rows = items.columns, items.rows
+            chunks = ([dict(zip(columns, row)) for row in rows[i:i + self.stream_chunk]]
+                      for i in range(0, len(rows), self.stream_chunk))
+        else:
+            chunks = (items[i:i + self.stream_chunk] for i in range(0, len(items), self.stream_chunk))
+        yield b'['
+        first = True
+        for chunk in chunks:
+            body = self.dumps_bytes(chunk)[1:-1]
+            if not body:
+                continue
+            yield body if first else b',' + body
+            first = False
+        yield b']'
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if isinstance(obj, (list, RowSet)) and len(obj) > self.stream_threshold:
+            return self._app.response_class(self.iter_array(obj), mimetype=self.mimetype)
+        if self._app.debug and self.compact is None:
+            # En modo debug Flask indenta las respuestas: se mantiene
+            return self._app.response_class(self.dumps(obj, indent=2) + '\n', mimetype=self.mimetype)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
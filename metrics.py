@@ -0,0 +1,169 @@
+"""
+Métricas en formato de texto Prometheus (sin dependencias externas).
+
+Histogram/Counter/Gauge con etiquetas, un registro que los expone en /metrics
+y un log de consultas lentas. Pensado para quedar activo en producción:
+observar un valor cuesta un bisect y una suma bajo un lock.
+"""
+import bisect
+import logging
+import re
+import threading
+from functools import lru_cache
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+
+slow_query_log = logging.getLogger('atiqa.slow_query')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names, values, extra=''):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f'{self.name}{_labels(self.labelnames, labels)} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [conteos por bucket..., +Inf, suma]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]}'
+            yield f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """fn() se llama al exponer /metrics para refrescar gauges (ej: estado del pool)."""
+        self._collectors.append(fn)
+
+    def render(self):
+        for fn in self._collectors:
+            fn()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.doc}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+# ------------------------------------------
+# Huella de sentencias SQL (para etiquetar sin explotar la cardinalidad)
+# ------------------------------------------
+
+_LITERALS = re.compile(r"'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))+\s*\)')
+_SPACES = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """'SELECT * FROM Clients WHERE id = %s' -> 'SELECT * FROM Clients WHERE id = ?' (máx. 120 caracteres)."""
+    text = _LITERALS.sub('?', sql.replace('%s', '?'))
+    text = _IN_LISTS.sub('(?+)', text)
+    return _SPACES.sub(' ', text).strip()[:120]
+
+
+# ------------------------------------------
+# Métricas de la aplicación
+# ------------------------------------------
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Latencia de peticiones HTTP por endpoint', ('endpoint', 'method', 'status')))
+http_response_bytes = registry.register(Histogram(
+    'http_response_bytes', 'Tamaño de respuesta HTTP por endpoint', ('endpoint',), SIZE_BUCKETS))
+db_query_duration = registry.register(Histogram(
+    'db_query_duration_seconds', 'Duración de consultas y procedimientos', ('kind', 'statement')))
+db_rows_returned = registry.register(Histogram(
+    'db_rows_returned', 'Filas devueltas por consulta o procedimiento', ('kind', 'statement'), ROW_BUCKETS))
+db_errors = registry.register(Counter(
+    'db_errors_total', 'Errores de base de datos', ('kind', 'statement')))
+db_connection_acquire = registry.register(Histogram(
+    'db_connection_acquire_seconds', 'Tiempo para obtener una conexión del pool'))
+slow_queries = registry.register(Counter(
+    'db_slow_queries_total', 'Consultas que superaron el umbral del slow log', ('kind', 'statement')))
+db_circuit_transitions = registry.register(Counter(
+    'db_circuit_transitions_total', 'Cambios de estado del circuit breaker de MySQL', ('state',)))
+db_circuit_rejections = registry.register(Counter(
+    'db_circuit_rejections_total', 'Consultas rechazadas al instante con el circuito abierto'))
+admission_shed = registry.register(Counter(
+    'admission_shed_total', 'Peticiones rechazadas con 503 por el control de admisión', ('class', 'reason')))
+admission_wait = registry.register(Histogram(
+    'admission_wait_seconds', 'Tiempo en la cola de admisión', ('class',)))
+
+
+def observe_db(kind, statement, seconds, rows=None, error=None, slow_threshold=None, params=None):
+    """Registra una ejecución en los histogramas y en el log de consultas lentas."""
+    db_query_duration.observe(seconds, kind, statement)
+    if rows is not None:
+        db_rows_returned.observe(rows, kind, statement)
+    if error is not None:
+        db_errors.inc(kind, statement)
+    if slow_threshold is not None and seconds >= slow_threshold:
+        slow_queries.inc(kind, statement)
+        slow_query_log.warning("Consulta lenta (%.1f ms) [%s] %s params=%r",
+                               seconds * 1000, kind, statement, params)
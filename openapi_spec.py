@@ -0,0 +1,90 @@
+"""
+Spec OpenAPI precompilado y plantillas Jinja precompiladas (arranque en frío).
+
+En desarrollo flasgger arma el spec leyendo el YAML de cada docstring. Para
+producción el spec se genera una vez en el build/deploy (`flask export-openapi`)
+en un JSON versionado que se sirve desde memoria, sin parsear docstrings.
+
+El artefacto guarda una huella de las rutas (regla, métodos, endpoint y
+docstring). Si alguien agrega o edita una ruta sin regenerarlo, la huella no
+coincide y el arranque falla (StaleSpecError) en lugar de publicar un spec
+desactualizado.
+"""
+import hashlib
+import json
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+# Endpoints propios de flasgger y de Flask que no forman parte de la API
+IGNORED_ENDPOINTS = ('static', 'flasgger.')
+
+
+class StaleSpecError(RuntimeError):
+    """El spec precompilado no corresponde a las rutas registradas."""
+
+
+def routes_fingerprint(app):
+    """SHA-256 de las rutas de la app y sus docstrings (no parsea el YAML)."""
+    digest = hashlib.sha256()
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: (r.rule, r.endpoint)):
+        if rule.endpoint.startswith(IGNORED_ENDPOINTS):
+            continue
+        view = app.view_functions.get(rule.endpoint)
+        methods = ','.join(sorted(rule.methods - {'HEAD', 'OPTIONS'}))
+        digest.update(f'{rule.rule}|{methods}|{rule.endpoint}|{getattr(view, "__doc__", "") or ""}\n'.encode())
+    return digest.hexdigest()
+
+
+def export_spec(app, path, spec_route='/apispec_1.json'):
+    """Genera el spec con flasgger (parseando docstrings) y lo guarda con la huella de rutas."""
+    response = app.test_client().get(spec_route)
+    if response.status_code != 200:
+        raise RuntimeError(f"No se pudo generar el spec ({response.status_code})")
+    spec = response.get_json()
+    spec['x-routes-fingerprint'] = routes_fingerprint(app)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f, ensure_ascii=False, indent=2, sort_keys=True)
+    return spec
+
+
+def load_spec(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def check_spec(app, spec):
+    """Lanza StaleSpecError si el artefacto no corresponde a las rutas actuales."""
+    expected = spec.get('x-routes-fingerprint')
+    actual = routes_fingerprint(app)
+    if expected != actual:
+        raise StaleSpecError(
+            f"El spec OpenAPI precompilado está desactualizado (huella {str(expected)[:12]} != {actual[:12]}). "
+            "Regenerarlo con: flask --app app export-openapi")
+
+
+def precompiled_swagger_config(default_config):
+    """Config de flasgger que no recorre las rutas: el spec sale completo del template precompilado."""
+    config = dict(default_config)
+    config['specs'] = [{
+        'endpoint': 'apispec_1',
+        'route': '/apispec_1.json',
+        'rule_filter': lambda rule: False,
+        'model_filter': lambda tag: False,
+    }]
+    return config
+
+
+def precompile_templates(app, cache_dir):
+    """
+    Activa el caché de bytecode de Jinja en disco y compila todas las plantillas al arrancar:
+    la primera petición de cada página ya no paga el parseo, y los workers siguientes
+    (o un reinicio) cargan el bytecode en lugar de recompilar.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    env = app.jinja_env
+    env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    names = env.list_templates(extensions=('html',))
+    for name in names:
+        env.get_template(name)
+    return len(names)
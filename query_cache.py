@@ -0,0 +1,235 @@
+"""
+Caché de lectura (read-through) para los helpers de base de datos.
+
+Las entradas se identifican por (sentencia, parámetros), tienen TTL propio y
+etiquetas (tags) como 'users', 'user:5' o 'client:12'. Las rutas de escritura
+invalidan por etiqueta, lo que elimina exactamente las entradas afectadas.
+
+Backends:
+  - MemoryCacheBackend: en proceso, LRU acotado por tamaño en bytes.
+  - RedisCacheBackend: compartido entre workers (requiere el paquete `redis`).
+
+Los valores se guardan serializados con pickle: cada lectura entrega una copia,
+así los handlers pueden modificar las filas sin alterar la caché.
+
+Las entradas vencidas por TTL se conservan `stale_ttl` segundos más: si la base
+de datos no está disponible (circuito abierto) se entregan como dato obsoleto.
+Las invalidadas por etiqueta se eliminan y nunca se entregan.
+"""
+import hashlib
+import pickle
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(kind, statement, params):
+    raw = repr((kind, statement, tuple(params or ())))
+    return 'qc:' + hashlib.sha1(raw.encode()).hexdigest()
+
+
+class MemoryCacheBackend:
+    def __init__(self, max_bytes=64 * 1024 * 1024, stale_ttl=3600):
+        self.max_bytes = max_bytes
+        self.stale_ttl = stale_ttl
+        self._entries = OrderedDict()   # key -> (blob, expira_en, tags)
+        self._tags = {}                 # tag -> {keys}
+        self._bytes = 0
+        self._generation = 0            # Aumenta con cada invalidación
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def generation(self):
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            now = time.monotonic()
+            if entry[1] < now:
+                if entry[1] + self.stale_ttl < now:
+                    self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def get_stale(self, key):
+        """Entrada aunque haya vencido su TTL (dentro de stale_ttl)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] + self.stale_ttl < time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, key, blob, ttl, tags, generation):
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            # Si hubo una invalidación mientras se consultaba la BD, el valor puede estar obsoleto
+            if generation != self._generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (blob, time.monotonic() + ttl, tags)
+            self._bytes += len(blob)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self._lock:
+            self._generation += 1
+            removed = 0
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        removed += 1
+            return removed
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def info(self):
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_bytes': self.max_bytes, 'evictions': self.evictions}
+
+    def _remove(self, key):
+        blob, _, tags = self._entries.pop(key)
+        self._bytes -= len(blob)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCacheBackend:
+    """
+    Backend compartido: todos los workers ven las mismas entradas e invalidaciones.
+    El límite de memoria y el LRU los aplica Redis (maxmemory + allkeys-lru).
+    """
+
+    def __init__(self, url, stale_ttl=3600):
+        import redis  # Dependencia opcional: solo si se configura CACHE_URL
+        self._redis = redis.Redis.from_url(url)
+        self.stale_ttl = stale_ttl
+
+    def generation(self):
+        return int(self._redis.get('qc:generation') or 0)
+
+    # Cada valor lleva delante su instante de vencimiento (epoch, 8 bytes): Redis lo
+    # conserva stale_ttl segundos más para poder entregarlo como dato obsoleto
+    def get(self, key):
+        raw = self._redis.get(key)
+        if raw is None or struct.unpack('!d', raw[:8])[0] < time.time():
+            return None
+        return raw[8:]
+
+    def get_stale(self, key):
+        raw = self._redis.get(key)
+        return raw[8:] if raw is not None else None
+
+    def set(self, key, blob, ttl, tags, generation):
+        if generation != self.generation():
+            return
+        expire = int(ttl) + self.stale_ttl
+        pipe = self._redis.pipeline()
+        pipe.set(key, struct.pack('!d', time.time() + ttl) + blob, ex=expire)
+        for tag in tags:
+            pipe.sadd(f'qc:tag:{tag}', key)
+            pipe.expire(f'qc:tag:{tag}', expire * 2)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        pipe = self._redis.pipeline()
+        pipe.incr('qc:generation')
+        for tag in tags:
+            pipe.smembers(f'qc:tag:{tag}')
+        results = pipe.execute()[1:]
+        keys = set().union(*results) if results else set()
+        if keys:
+            self._redis.delete(*keys)
+        self._redis.delete(*[f'qc:tag:{tag}' for tag in tags])
+        return len(keys)
+
+    def clear(self):
+        keys = list(self._redis.scan_iter('qc:*'))
+        if keys:
+            self._redis.delete(*keys)
+
+    def info(self):
+        return {'backend': 'redis', 'entries': sum(1 for _ in self._redis.scan_iter('qc:[0-9a-f]*'))}
+
+
+class QueryCache:
+    def __init__(self, backend, enabled=True, serve_stale=None):
+        self.backend = backend
+        self.enabled = enabled
+        self.serve_stale = serve_stale  # serve_stale() -> True si ante un error conviene entregar datos vencidos
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, key, loader, ttl, tags=()):
+        """
+        Retorna (resultado, error) desde la caché o, si no está, desde loader().
+        `tags` puede ser una lista o una función del resultado (ej: para etiquetar por agentId).
+        Los errores nunca se guardan; si serve_stale() lo permite se responde con la entrada vencida.
+        """
+        if not self.enabled:
+            return loader()
+
+        blob = self.backend.get(key)
+        if blob is not None:
+            self._count(hit=True)
+            return pickle.loads(blob), None
+
+        self._count(hit=False)
+        generation = self.backend.generation()
+        result, error = loader()
+        if error is None:
+            entry_tags = tags(result) if callable(tags) else tags
+            self.backend.set(key, pickle.dumps(result, pickle.HIGHEST_PROTOCOL), ttl, tuple(entry_tags), generation)
+        elif self.serve_stale is not None and self.serve_stale():
+            blob = self.backend.get_stale(key)
+            if blob is not None:
+                with self._lock:
+                    self.stale_hits += 1
+                return pickle.loads(blob), None
+        return result, error
+
+    def invalidate(self, *tags):
+        if not self.enabled:
+            return 0
+        return self.backend.invalidate(tags)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        data = {'enabled': self.enabled, 'hits': hits, 'misses': misses, 'stale_hits': self.stale_hits,
+                'hit_ratio': round(hits / total, 4) if total else 0.0}
+        if self.enabled:
+            data.update(self.backend.info())
+        return data
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
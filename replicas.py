@@ -0,0 +1,275 @@
+"""
+Réplicas de lectura de MySQL con enrutamiento según su retraso (lag).
+
+Cada réplica tiene su propio ConnectionPool. Un hilo monitor consulta cada
+`check_interval` segundos SHOW REPLICA STATUS (SHOW SLAVE STATUS antes de
+MySQL 8.0.22) y @@GLOBAL.gtid_executed. Una réplica recibe lecturas solo si:
+  - la replicación está corriendo y el último chequeo es reciente,
+  - su retraso (Seconds_Behind_Source) no supera `max_lag` segundos,
+  - y, si la lectura debe ver una escritura anterior (read-your-writes), la réplica
+    ya aplicó las transacciones del token: el GTID set del primario tras la escritura
+    es subconjunto del gtid_executed de la réplica.
+
+Seconds_Behind_Source no sirve para read-your-writes: es 0 en cuanto el hilo SQL
+vacía el relay log aunque el hilo IO vaya atrasado, y tiene resolución de un
+segundo. El GTID set es exacto. El gtid_executed de la réplica se lee en el último
+chequeo, así que como mucho es más viejo de lo que debería: nunca da por aplicada
+una transacción que no lo está.
+
+Si ninguna cumple (o el token está vacío: el primario no tiene gtid_mode=ON),
+choose() retorna None y la lectura va al primario.
+"""
+import re
+import threading
+import time
+from functools import lru_cache
+
+import mysql.connector
+from mysql.connector import Error
+
+
+GTID_INTERVAL = re.compile(r'(\d+)(?:-(\d+))?')
+
+
+@lru_cache(maxsize=256)
+def parse_gtid_set(text):
+    """
+    'uuid:1-5:7,uuid2:tag:1-3' -> {fuente: ((inicio, fin), ...)} con fuente = 'uuid' o 'uuid:tag'.
+    Retorna None si el texto no es un GTID set (o está vacío: no se puede verificar nada).
+    """
+    sources = {}
+    for part in (text or '').replace('\n', '').split(','):
+        fields = part.strip().split(':')
+        if len(fields) < 2 or len(fields[0]) != 36:
+            return None
+        source = fields[0].lower()
+        for field in fields[1:]:
+            match = GTID_INTERVAL.fullmatch(field)
+            if match is None:
+                source = f'{fields[0].lower()}:{field.lower()}'   # Etiqueta (MySQL 8.3+)
+                continue
+            start = int(match.group(1))
+            sources.setdefault(source, []).append((start, int(match.group(2) or start)))
+    if not sources:
+        return None
+    return {source: tuple(sorted(intervals)) for source, intervals in sources.items()}
+
+
+def gtid_subset(required, executed):
+    """True si cada transacción de `required` está en `executed` (ambos de parse_gtid_set)."""
+    for source, intervals in required.items():
+        available = executed.get(source, ())
+        for start, end in intervals:
+            if not any(a <= start and end <= b for a, b in available):
+                return False
+    return True
+
+
+class Replica:
+    def __init__(self, name, pool):
+        self.name = name
+        self.pool = pool
+        self.lag = None             # Segundos de retraso en el último chequeo (None = desconocido o caída)
+        self.checked_at = None      # time.time() del último chequeo exitoso
+        self.gtid_executed = None   # GTID set aplicado en el último chequeo (parse_gtid_set)
+        self.last_error = None
+        self.failures = 0
+        self.reads = 0
+        self._monitor_conn = None   # Conexión propia del monitor (no ocupa el pool)
+
+    def has_applied(self, token):
+        """True si la réplica ya aplicó todas las transacciones del GTID set `token`."""
+        required = parse_gtid_set(token)
+        return required is not None and self.gtid_executed is not None and gtid_subset(
+            required, self.gtid_executed)
+
+    def stats(self):
+        return {
+            'lag': self.lag,
+            'checked_ago': None if self.checked_at is None else round(time.time() - self.checked_at, 2),
+            'reads': self.reads,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'pool': {key: value for key, value in self.pool.stats().items()
+                     if key in ('size', 'checked_out', 'idle', 'timeouts')},
+        }
+
+
+class ReplicaRouter:
+    def __init__(self, replicas, max_lag=5.0, check_interval=1.0):
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # Un chequeo más viejo que esto no sirve para asegurar el lag (monitor colgado o réplica sin responder)
+        self.stale_after = max(3 * check_interval, 2.0)
+        self.routed = {'replica': 0, 'lag': 0, 'read_your_writes': 0}
+        self._owners = {}           # id(conexión) -> Replica de la que se tomó
+        self._next = 0
+        self._lock = threading.Lock()
+        self._monitor = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    # ------------------------------------------
+    # Enrutamiento
+    # ------------------------------------------
+
+    def choose(self, read_after=None):
+        """
+        Retorna (réplica, None) o (None, motivo) para leer en el primario.
+        read_after: GTID set del primario tras la última escritura que la lectura debe ver (o None).
+        """
+        self._ensure_monitor()
+        now = time.time()
+        healthy = [r for r in self.replicas if self._healthy(r, now)]
+        if not healthy:
+            self._count('lag')
+            return None, 'lag'
+        if read_after is not None:
+            healthy = [r for r in healthy if r.has_applied(read_after)]
+            if not healthy:
+                self._count('read_your_writes')
+                return None, 'read_your_writes'
+        with self._lock:
+            self._next += 1
+            replica = healthy[self._next % len(healthy)]
+            self.routed['replica'] += 1
+            replica.reads += 1
+        return replica, None
+
+    def eligible(self, replica, read_after=None):
+        """True si la réplica sigue sirviendo para una lectura (para reutilizar la conexión de la petición)."""
+        now = time.time()
+        return self._healthy(replica, now) and (read_after is None or replica.has_applied(read_after))
+
+    def acquire(self, replica):
+        """Conexión del pool de la réplica. Lanza Error (incluido PoolTimeout) como ConnectionPool.acquire()."""
+        conn = replica.pool.acquire()
+        with self._lock:
+            self._owners[id(conn)] = replica
+        return conn
+
+    def owner(self, conn):
+        """Réplica de la que salió la conexión, o None si es del primario."""
+        return self._owners.get(id(conn))
+
+    def release(self, conn):
+        with self._lock:
+            replica = self._owners.pop(id(conn))
+        replica.pool.release(conn)
+
+    def mark_failed(self, replica, error):
+        """Saca la réplica de la rotación hasta que el monitor vuelva a medir su lag."""
+        with self._lock:
+            replica.lag = None
+            replica.failures += 1
+            replica.last_error = str(error)
+
+    # ------------------------------------------
+    # Monitor de lag
+    # ------------------------------------------
+
+    def check(self, replica):
+        """Mide el retraso de una réplica. Retorna el lag en segundos o None si no replica."""
+        try:
+            if replica._monitor_conn is None:
+                replica._monitor_conn = mysql.connector.connect(**replica.pool.db_config)
+            cursor = replica._monitor_conn.cursor(dictionary=True)
+            try:
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except Error:
+                    cursor.execute("SHOW SLAVE STATUS")
+                status = cursor.fetchone()
+                cursor.execute("SELECT @@GLOBAL.gtid_executed AS gtid_executed")
+                gtid_executed = cursor.fetchone()['gtid_executed']
+            finally:
+                cursor.close()
+        except Error as e:
+            self._close_monitor_conn(replica)
+            self.mark_failed(replica, e)
+            return None
+
+        lag = None
+        if status:
+            lag = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        with self._lock:
+            if lag is None:
+                # Sin estado de réplica o hilo SQL detenido: no se puede confiar en sus datos
+                replica.lag = None
+                replica.gtid_executed = None
+                replica.last_error = "Replicación detenida o no configurada"
+            else:
+                replica.lag = int(lag)
+                replica.gtid_executed = parse_gtid_set(gtid_executed)   # None sin gtid_mode=ON
+                replica.checked_at = time.time()
+        return replica.lag
+
+    def check_all(self):
+        for replica in self.replicas:
+            self.check(replica)
+
+    def stop(self):
+        self._stop.set()
+        for replica in self.replicas:
+            self._close_monitor_conn(replica)
+            replica.pool.dispose()
+
+    def reset_after_fork(self):
+        """En el hijo tras un fork: el hilo monitor no existe y los sockets heredados son del padre."""
+        self._lock = threading.Lock()
+        self._owners = {}
+        self._monitor = None
+        self._stop = threading.Event()
+        for replica in self.replicas:
+            replica._monitor_conn = None
+            replica.pool.reset_after_fork()
+
+    def stats(self):
+        with self._lock:
+            routed = dict(self.routed)
+        return {
+            'enabled': self.enabled,
+            'max_lag': self.max_lag,
+            'check_interval': self.check_interval,
+            'routed': routed,
+            'replicas': {r.name: r.stats() for r in self.replicas},
+        }
+
+    # ------------------------------------------
+    # Internos
+    # ------------------------------------------
+
+    def _healthy(self, replica, now):
+        return (replica.lag is not None and replica.lag <= self.max_lag
+                and now - replica.checked_at <= self.stale_after)
+
+    def _count(self, reason):
+        with self._lock:
+            self.routed[reason] += 1
+
+    def _ensure_monitor(self):
+        # Se arranca con la primera lectura (no al importar) para que cada worker tenga el suyo
+        if self._monitor is not None:
+            return
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(target=self._run_monitor, name='replica-monitor', daemon=True)
+            self._monitor.start()
+
+    def _run_monitor(self):
+        while not self._stop.is_set():
+            self.check_all()
+            self._stop.wait(self.check_interval)
+
+    def _close_monitor_conn(self, replica):
+        conn, replica._monitor_conn = replica._monitor_conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Error:
+                pass
@@ -0,0 +1,50 @@
+"""
+Resultado compacto de una consulta: filas como tuplas + mapa de columnas.
+
+Evita construir un dict por fila al leer (cursor dictionary=True). Los handlers
+acceden por nombre con get()/first() y los dicts se arman recién al serializar
+con records().
+"""
+
+
+class RowSet:
+    __slots__ = ('columns', 'rows', 'index')
+
+    def __init__(self, columns, rows):
+        self.columns = tuple(columns)
+        self.rows = rows
+        self.index = {name: i for i, name in enumerate(self.columns)}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def get(self, row, column):
+        """Valor de `column` en la fila número `row`."""
+        return self.rows[row][self.index[column]]
+
+    def record(self, row):
+        return dict(zip(self.columns, self.rows[row]))
+
+    def first(self):
+        """Primera fila como dict, o None si no hay filas."""
+        return dict(zip(self.columns, self.rows[0])) if self.rows else None
+
+    def records(self):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def __getstate__(self):
+        return self.columns, self.rows
+
+    def __setstate__(self, state):
+        self.columns, self.rows = state
+        self.index = {name: i for i, name in enumerate(self.columns)}
+
+    def __repr__(self):
+        return f'RowSet(columns={self.columns!r}, rows={len(self.rows)})'
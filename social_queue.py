@@ -0,0 +1,218 @@
+"""
+Cola de publicación en redes sociales.
+
+El endpoint encola un trabajo y responde de inmediato; un pool de hilos
+publica en cada red en paralelo (con reintentos y backoff exponencial) y al
+terminar registra todos los SocialMediaLogs del trabajo en un solo lote.
+
+El estado del trabajo se guarda con save_job al encolarlo y al terminar (con el
+resultado de cada red): con varios workers de gunicorn la consulta del estado
+puede llegar a cualquiera de ellos, y el trabajo tiene que sobrevivir a un
+reinicio del que lo encoló.
+
+El cliente de red es intercambiable: MockSocialClient (sin red, por defecto)
+o HttpSocialClient (API HTTP real o un servidor mock local para pruebas y benchmarks).
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib import request as urlrequest
+
+NETWORKS = ('FACEBOOK', 'INSTAGRAM', 'TIKTOK', 'PORTAL_WEB')
+
+
+class SocialPublishError(Exception):
+    """La red social rechazó o no respondió la publicación."""
+
+
+# ------------------------------------------
+# Clientes de red
+# ------------------------------------------
+
+class MockSocialClient:
+    """Simula la publicación sin salir a la red (comportamiento histórico)."""
+
+    def post(self, network, payload):
+        return f"https://{network.lower()}.com/post/mock{payload['propertyId']}"
+
+
+class HttpSocialClient:
+    """
+    Publica vía HTTP: POST {base_url}/{network}/posts con el payload en JSON.
+    La respuesta debe incluir {"postUrl": "..."}.
+    """
+
+    def __init__(self, base_url, timeout=10):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def post(self, network, payload):
+        req = urlrequest.Request(
+            f"{self.base_url}/{network.lower()}/posts",
+            data=json.dumps(payload, default=str).encode(),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as resp:
+                body = json.loads(resp.read() or b'{}')
+        except (OSError, ValueError) as e:
+            raise SocialPublishError(f"{network}: {e}") from e
+        if not body.get('postUrl'):
+            raise SocialPublishError(f"{network}: respuesta sin postUrl")
+        return body['postUrl']
+
+
+# ------------------------------------------
+# Cola de trabajos
+# ------------------------------------------
+
+class PublishQueue:
+    """
+    save_logs(rows) recibe [(propertyId, network, postUrl), ...] con las publicaciones
+    exitosas de un trabajo y debe insertarlas en un solo executemany.
+
+    save_job(job) persiste el estado del trabajo y retorna el error o None. Se llama una vez
+    por transición: al encolarlo (`version` 1, EN_PROCESO) y al terminar (`version` 2, con
+    el estado final y el resultado de cada red). Los intentos de cada red no se guardan
+    uno por uno: serían una escritura por intento y por red.
+
+    Mientras corre, el trabajo también está en memoria de este proceso (para contar las
+    redes pendientes); el estado se consulta siempre en lo guardado con save_job.
+    """
+
+    def __init__(self, client, save_logs, save_job, workers=4, max_retries=3, backoff=0.5, on_error=None):
+        self.client = client
+        self.save_logs = save_logs
+        self.save_job = save_job
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.on_error = on_error
+        self.workers = workers
+        self._executor = None
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload, networks):
+        """Guarda el trabajo y lanza una publicación por red. Retorna (id del trabajo, error)."""
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'propertyId': payload['propertyId'],
+            'status': 'EN_PROCESO',
+            'error': None,
+            'createdAt': time.time(),
+            'finishedAt': None,
+            'results': {net: {'status': 'PENDIENTE', 'attempts': 0} for net in networks},
+            'version': 1,
+            '_remaining': len(networks),
+        }
+        error = self.save_job(self._snapshot(job))
+        if error:
+            return None, error
+        with self._lock:
+            self._running[job_id] = job
+
+        executor = self._get_executor()
+        for net in networks:
+            executor.submit(self._publish, job, net, payload)
+        return job_id, None
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def reset_after_fork(self):
+        """En el hijo tras un fork: los hilos del pool y sus trabajos son del padre; se crea otro al usarlo."""
+        self._lock = threading.Lock()
+        self._executor = None
+        self._running = {}
+
+    # ------------------------------------------
+    # Internos
+    # ------------------------------------------
+
+    def _snapshot(self, job):
+        data = {k: v for k, v in job.items() if not k.startswith('_')}
+        data['results'] = {net: dict(res) for net, res in job['results'].items()}
+        return data
+
+    def _get_executor(self):
+        # Se crea al primer uso: los hilos no deben existir antes de un fork del servidor
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='social-publish')
+            return self._executor
+
+    def _changed(self, job, change):
+        """Aplica change(job) bajo el lock y guarda la versión resultante."""
+        with self._lock:
+            change(job)
+            job['version'] += 1
+            snapshot = self._snapshot(job)
+        try:
+            error = self.save_job(snapshot)
+        except Exception as e:
+            error = str(e)
+        if error and self.on_error:
+            self.on_error(job['id'], error)
+
+    def _publish(self, job, network, payload):
+        result = job['results'][network]
+        for attempt in range(1, self.max_retries + 1):
+            with self._lock:
+                result['attempts'] = attempt
+            try:
+                post_url = self.client.post(network, payload)
+            except Exception as e:
+                with self._lock:
+                    result['error'] = str(e)
+                if attempt < self.max_retries:
+                    # Backoff exponencial con jitter para no golpear la API en ráfaga
+                    time.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random()))
+                continue
+            with self._lock:
+                result.update({'status': 'PUBLICADO', 'postUrl': post_url})
+                result.pop('error', None)
+            break
+        else:
+            with self._lock:
+                result['status'] = 'FALLIDO'
+
+        with self._lock:
+            job['_remaining'] -= 1
+            last = job['_remaining'] == 0
+        if last:
+            self._finish(job)
+
+    def _finish(self, job):
+        rows = [(job['propertyId'], net, res['postUrl'])
+                for net, res in job['results'].items() if res['status'] == 'PUBLICADO']
+        error = None
+        if rows:
+            try:
+                error = self.save_logs(rows)
+            except Exception as e:
+                error = str(e)
+
+        def finish(job):
+            published = len(rows)
+            if error:
+                job['status'] = 'ERROR_REGISTRO'
+                job['error'] = error
+            elif published == len(job['results']):
+                job['status'] = 'COMPLETADO'
+            elif published:
+                job['status'] = 'PARCIAL'
+            else:
+                job['status'] = 'FALLIDO'
+            job['finishedAt'] = time.time()
+
+        self._changed(job, finish)
+        with self._lock:
+            self._running.pop(job['id'], None)
@@ -0,0 +1,7 @@
+"""
+Pruebas unitarias de los módulos sin base de datos: python -m pytest (desde la raíz del repo).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionClass, AdmissionController
+
+
+def test_admits_up_to_limit_then_sheds_when_queue_is_full():
+    cls = AdmissionClass('light', limit=2, max_queue=0)
+    assert cls.try_acquire() == (True, None, 0.0, 1)
+    assert cls.try_acquire() == (True, None, 0.0, 1)
+    assert cls.try_acquire() == (False, 'queue_full', 0.0, 0)
+    cls.release(1)
+    assert cls.try_acquire()[0]
+    assert cls.stats()['shed_queue_full'] == 1 and cls.stats()['admitted'] == 3
+
+
+def test_queued_request_times_out():
+    cls = AdmissionClass('heavy', limit=1, max_queue=1, timeout=0.05)
+    cls.try_acquire()
+    admitted, reason, waited, _ = cls.try_acquire()
+    assert (admitted, reason) == (False, 'timeout') and waited >= 0.05
+    assert cls.queued == 0 and cls.stats()['shed_timeout'] == 1
+
+
+def test_queued_request_is_admitted_on_release():
+    cls = AdmissionClass('heavy', limit=1, max_queue=1, timeout=5)
+    cls.try_acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cls.try_acquire()))
+    waiter.start()
+    while cls.queued == 0:
+        time.sleep(0.001)
+    cls.release(1)
+    waiter.join(5)
+    assert results[0][0] and cls.in_use == 1
+
+
+def test_weight_is_capped_at_limit():
+    cls = AdmissionClass('heavy', limit=2)
+    assert cls.try_acquire(weight=5) == (True, None, 0.0, 2)
+    assert cls.in_use == 2
+    cls.release(2)
+    assert cls.in_use == 0
+
+
+def test_release_after_configure_returns_the_weight_taken():
+    cls = AdmissionClass('heavy', limit=1)
+    taken = cls.try_acquire(weight=2)[3]
+    cls.configure(limit=4)      # Ahora el peso 2 ya no se acotaría a 1
+    cls.release(taken)
+    assert cls.in_use == 0
+
+    cls = AdmissionClass('heavy', limit=4, max_queue=1, timeout=0.05)
+    taken = cls.try_acquire(weight=2)[3]
+    cls.configure(limit=1)
+    cls.release(taken)
+    assert cls.in_use == 0
+    assert cls.try_acquire(weight=2) == (True, None, 0.0, 1)
+
+
+def test_raising_the_limit_admits_waiting_requests():
+    cls = AdmissionClass('default', limit=1, max_queue=1, timeout=5)
+    cls.try_acquire()
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cls.try_acquire()))
+    waiter.start()
+    while cls.queued == 0:
+        time.sleep(0.001)
+    cls.configure(limit=2)
+    waiter.join(5)
+    assert results[0][0] and cls.in_use == 2
+
+
+def test_controller_lookup_and_configure():
+    light, default = AdmissionClass('light', 4), AdmissionClass('default', 3)
+    controller = AdmissionController([light, default], {'login': ('light', 1)}, exempt=('metrics',))
+    assert controller.lookup('login') == (light, 1)
+    assert controller.lookup('otro') == (default, 1)
+    assert controller.lookup('metrics') is None and controller.lookup(None) is None
+    controller.configure({'light': {'limit': 8, 'ignorado': 1}})
+    assert light.limit == 8
+    with pytest.raises(KeyError):
+        controller.configure({'heavy': {'limit': 1}})
+    controller.enabled = False
+    assert controller.lookup('login') is None
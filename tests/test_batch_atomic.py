@@ -0,0 +1,61 @@
+from flask import g
+
+import app as app_module
+
+
+class RecordingCache:
+    def __init__(self, events):
+        self.events = events
+
+    def invalidate(self, *tags):
+        self.events.append(('invalidate', set(tags)))
+
+
+class FakeConnection:
+    def __init__(self, events):
+        self.events = events
+
+    def commit(self):
+        self.events.append(('commit',))
+
+    def rollback(self):
+        self.events.append(('rollback',))
+
+
+def start_batch(monkeypatch, events):
+    monkeypatch.setattr(app_module, 'query_cache', RecordingCache(events))
+    g.db_conn = FakeConnection(events)
+    g.db_atomic = True
+    g.cache_tags_pending = set()
+
+
+def test_atomic_batch_invalidates_cache_after_commit(monkeypatch):
+    events = []
+    with app_module.app.app_context():
+        start_batch(monkeypatch, events)
+        app_module.invalidate_cache('users', 'user:1')
+        app_module.invalidate_cache('property:7')
+        assert events == []
+        assert app_module.finish_atomic_batch(True) == (True, None)
+        g.db_atomic = False
+        g.pop('db_conn')
+    assert events == [('commit',), ('invalidate', {'users', 'user:1', 'property:7'})]
+
+
+def test_rolled_back_batch_does_not_invalidate(monkeypatch):
+    events = []
+    with app_module.app.app_context():
+        start_batch(monkeypatch, events)
+        app_module.invalidate_cache('users')
+        assert app_module.finish_atomic_batch(False) == (False, None)
+        g.db_atomic = False
+        g.pop('db_conn')
+    assert events == [('rollback',)]
+
+
+def test_outside_a_batch_invalidates_immediately(monkeypatch):
+    events = []
+    monkeypatch.setattr(app_module, 'query_cache', RecordingCache(events))
+    with app_module.app.app_context():
+        app_module.invalidate_cache('users')
+    assert events == [('invalidate', {'users'})]
@@ -0,0 +1,47 @@
+import pytest
+
+from batch_ops import UnresolvedReference, resolve, validate
+
+
+def test_validate_normalizes_operations():
+    ops, error = validate([{'path': '/api/properties'},
+                           {'method': 'post', 'path': '/api/users', 'body': {'a': 1}, 'ref': 'user'}], 10)
+    assert error is None
+    assert ops == [
+        {'method': 'GET', 'path': '/api/properties', 'query': None, 'body': None, 'ref': None},
+        {'method': 'POST', 'path': '/api/users', 'query': None, 'body': {'a': 1}, 'ref': 'user'},
+    ]
+
+
+@pytest.mark.parametrize('operations, message', [
+    ([], "operations debe ser una lista no vacía"),
+    ({'path': '/api/x'}, "operations debe ser una lista no vacía"),
+    ([{'path': '/api/x'}] * 3, "Máximo 2 operaciones por batch"),
+    (['GET /api/x'], "Operación 0: debe ser un objeto"),
+    ([{'method': 'TRACE', 'path': '/api/x'}], "Operación 0: método TRACE no soportado"),
+    ([{'path': '/otro'}], "Operación 0: path debe empezar con /api/"),
+    ([{'path': '/api/x', 'query': 'a=1'}], "Operación 0: query debe ser un objeto"),
+    ([{'path': '/api/x', 'ref': 'a'}, {'path': '/api/y', 'ref': 'a'}],
+     "Operación 1: ref debe ser un nombre único (letras, dígitos, _)"),
+    ([{'path': '/api/x', 'ref': '1a'}], "Operación 0: ref debe ser un nombre único (letras, dígitos, _)"),
+])
+def test_validate_rejects_invalid_operations(operations, message):
+    assert validate(operations, 2) == (None, message)
+
+
+def test_resolve_keeps_type_of_whole_references():
+    results = {'owner': {'last_id': 7}, '0': [{'id': 3}, {'id': 4}]}
+    body = {'ownerId': '${owner.last_id}', 'ids': ['${0.1.id}', 5], 'nota': 'sin referencias'}
+    assert resolve(body, results) == {'ownerId': 7, 'ids': [4, 5], 'nota': 'sin referencias'}
+
+
+def test_resolve_interpolates_references_inside_text():
+    results = {'prop': [{'id': 12}], 'user': {'name': 'Ana'}}
+    assert resolve('/api/properties/${prop.0.id}/photos', results) == '/api/properties/12/photos'
+    assert resolve('${user.name}-${prop.0.id}', results) == 'Ana-12'
+
+
+@pytest.mark.parametrize('value', ['${missing.id}', '${prop.1.id}', '${prop.0.nombre}', '${prop.x}'])
+def test_resolve_raises_for_unresolved_references(value):
+    with pytest.raises(UnresolvedReference):
+        resolve(value, {'prop': [{'id': 12}]})
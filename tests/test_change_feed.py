@@ -0,0 +1,121 @@
+import json
+
+from change_feed import RESET_EVENT, ChangeFeed, gaps, settled
+
+
+def row(seq, age=0.0, event='property.updated'):
+    return {'seq': seq, 'entity': 'property', 'entityId': seq, 'op': 'update', 'event': event,
+            'payload': None, 'changedAt': '2026-01-01T00:00:00', 'age': age}
+
+
+def seqs(rows):
+    return [r['seq'] for r in rows]
+
+
+def test_settled_stops_at_a_young_gap():
+    rows = [row(11), row(12), row(14), row(15)]
+    assert seqs(settled(rows, 10, grace=120)) == [11, 12]
+    assert seqs(settled(rows, 9, grace=120)) == []
+
+
+def test_settled_skips_gap_older_than_grace():
+    rows = [row(11), row(14, age=200), row(15)]
+    assert seqs(settled(rows, 10, grace=120)) == [11, 14, 15]
+
+
+def test_settled_asks_gap_open_for_young_gaps():
+    rows = [row(11), row(14), row(17)]
+    asked = []
+
+    def gap_open(after, before):
+        asked.append((after, before))
+        return before == 17     # 12-13 fue un rollback; 15-16 sigue en curso
+
+    assert seqs(settled(rows, 10, grace=120, gap_open=gap_open)) == [11, 14]
+    assert asked == [(11, 14), (14, 17)]
+
+
+def test_gaps():
+    assert list(gaps([row(11), row(14), row(15), row(20)], 10)) == [(11, 14), (15, 20)]
+    assert list(gaps([row(12)], 10)) == [(10, 12)]
+
+
+class FakeLog:
+    def __init__(self, head=0):
+        self.rows = []
+        self.head_seq = head
+        self.looked_up = []
+
+    def fetch(self, since, limit):
+        return [r for r in self.rows if r['seq'] > since][:limit], None
+
+    def head(self):
+        return self.head_seq, None
+
+    def find_late(self, ranges):
+        self.looked_up.append(list(ranges))
+        return [r['seq'] for r in self.rows if any(a < r['seq'] < b for a, b in ranges)], None
+
+
+def drain(sub):
+    messages = []
+    while not sub.queue.empty():
+        messages.append(sub.queue.get_nowait())
+    return messages
+
+
+def feed_for(log, **kwargs):
+    feed = ChangeFeed(log.fetch, log.head, gap_open=lambda after, before: False,
+                      find_late=log.find_late, **kwargs)
+    feed._ensure_thread = lambda: None
+    return feed
+
+
+def test_poll_publishes_to_subscribers_and_backlog():
+    log = FakeLog(head=10)
+    feed = feed_for(log)
+    sub = feed.subscribe()
+    feed.poll_once()
+    log.rows = [row(11), row(12, event=None), row(13)]
+    assert feed.poll_once() == 3
+    messages = drain(sub)
+    assert [m.split('\n')[0] for m in messages] == ['id: 11', 'id: 13']
+    assert feed.last_seq == 13
+
+    resumed = feed.subscribe(last_event_id=11)
+    assert drain(resumed) == messages[1:]
+    assert drain(feed.subscribe(last_event_id=5)) == [RESET_EVENT]
+
+
+def test_row_in_a_skipped_gap_sends_reset():
+    log = FakeLog(head=10)
+    feed = feed_for(log)
+    sub = feed.subscribe()
+    feed.poll_once()
+    log.rows = [row(11), row(15)]
+    feed.poll_once()                        # 12-14 se saltan (gap_open dice que no pueden llenarse)
+    assert feed.stats()['skipped_gaps'] == 1
+    drain(sub)
+
+    log.rows.append(row(13))                # Una transacción más larga de lo previsto confirmó tarde
+    feed.poll_once()
+    assert log.looked_up[-1] == [(11, 15)]
+    reset = drain(sub)
+    assert reset == ['event: reset\ndata: ' + json.dumps({'since': '12'}) + '\n\n']
+    assert feed.late_resets == 1
+    # Los restos del hueco (12 y 14) se siguen mirando
+    feed.poll_once()
+    assert log.looked_up[-1] == [(11, 13), (13, 15)]
+    # Quien reanude desde antes del reset tampoco vio la fila
+    assert drain(feed.subscribe(last_event_id=11)) == [RESET_EVENT]
+
+
+def test_skipped_gaps_expire_after_recheck():
+    log = FakeLog(head=10)
+    feed = feed_for(log, recheck=-1)
+    feed.poll_once()
+    log.rows = [row(11), row(13)]
+    feed.poll_once()
+    log.rows.append(row(12))
+    feed.poll_once()
+    assert feed.late_resets == 0 and log.looked_up == []
@@ -0,0 +1,62 @@
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(monkeypatch, **kwargs):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', clock)
+    changes = []
+    return CircuitBreaker(on_change=lambda old, new: changes.append((old, new)), **kwargs), clock, changes
+
+
+def test_opens_after_consecutive_failures(monkeypatch):
+    cb, _, changes = breaker(monkeypatch, failure_threshold=3, reset_timeout=10)
+    cb.record_failure()
+    cb.record_success()     # Un éxito reinicia la cuenta
+    cb.record_failure()
+    cb.record_failure()
+    assert cb.allow() and cb.state == CLOSED
+    cb.record_failure(RuntimeError("caída"))
+    assert cb.state == OPEN and changes == [(CLOSED, OPEN)]
+    assert not cb.allow()
+    assert cb.stats()['last_error'] == "caída" and cb.stats()['rejected'] == 1
+
+
+def test_half_open_allows_a_single_probe(monkeypatch):
+    cb, clock, _ = breaker(monkeypatch, failure_threshold=1, reset_timeout=10)
+    cb.record_failure()
+    clock.now += 10
+    assert cb.allow() and cb.state == HALF_OPEN
+    assert not cb.allow()   # La prueba sigue en curso
+    cb.record_success()
+    assert cb.state == CLOSED and cb.allow()
+
+
+def test_failed_probe_reopens(monkeypatch):
+    cb, clock, changes = breaker(monkeypatch, failure_threshold=5, reset_timeout=10)
+    for _ in range(5):
+        cb.record_failure()
+    clock.now += 10
+    assert cb.allow()
+    cb.record_failure()
+    assert cb.state == OPEN and not cb.allow()
+    assert changes == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, OPEN)]
+
+
+def test_probe_without_result_is_released(monkeypatch):
+    cb, clock, _ = breaker(monkeypatch, failure_threshold=1, reset_timeout=10)
+    cb.record_failure()
+    clock.now += 10
+    assert cb.allow()
+    cb.record_neutral()     # Pool agotado: no se sabe si la BD está sana
+    assert cb.allow()
+    clock.now += 10         # Una prueba que nunca informó se reemplaza pasado reset_timeout
+    assert cb.allow()
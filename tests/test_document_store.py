@@ -0,0 +1,112 @@
+import hashlib
+import io
+import os
+import time
+
+import pytest
+
+from document_store import (BlobTooLarge, LocalS3Client, LocalStorage, MultipartError, S3Storage, purge,
+                            receive_multipart)
+
+BOUNDARY = 'frontera123'
+CONTENT = b'%PDF-1.4 contrato' * 5000       # ~85 KB: más de un bloque de lectura
+
+
+def multipart(*parts):
+    body = b''
+    for name, value, filename in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+        headers = f'Content-Disposition: {disposition}\r\n'
+        if filename:
+            headers += 'Content-Type: application/pdf\r\n'
+        body += f'--{BOUNDARY}\r\n{headers}\r\n'.encode() + value + b'\r\n'
+    return io.BytesIO(body + f'--{BOUNDARY}--\r\n'.encode())
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture(params=['local', 's3'])
+def storage(request, tmp_path):
+    if request.param == 'local':
+        return LocalStorage(str(tmp_path))
+    return S3Storage(LocalS3Client(str(tmp_path)), 'docs', part_size=32 * 1024)
+
+
+def test_receive_multipart_streams_file_and_collects_fields(storage):
+    stream = multipart(('title', 'Contrato de alquiler'.encode(), None),
+                       ('file', CONTENT, 'contrato.pdf'), ('kind', b'contract', None))
+    fields, (blob, filename, content_type) = receive_multipart(stream, BOUNDARY, storage.writer)
+    assert fields == {'title': 'Contrato de alquiler', 'kind': 'contract'}
+    assert (filename, content_type) == ('contrato.pdf', 'application/pdf')
+    assert blob.digest == sha256(CONTENT) and blob.size == len(CONTENT) and not blob.deduplicated
+    assert b''.join(storage.open_range(blob.digest, 0, len(CONTENT) - 1)) == CONTENT
+
+
+def test_same_content_is_stored_once(storage):
+    first = receive_multipart(multipart(('file', CONTENT, 'a.pdf')), BOUNDARY, storage.writer)[1][0]
+    second = receive_multipart(multipart(('file', CONTENT, 'b.pdf')), BOUNDARY, storage.writer)[1][0]
+    assert second.digest == first.digest and second.deduplicated
+    assert [digest for digest, _ in storage.iter_blobs()] == [first.digest]
+
+
+def test_too_large_upload_is_aborted(storage, tmp_path):
+    with pytest.raises(BlobTooLarge):
+        receive_multipart(multipart(('file', CONTENT, 'a.pdf')), BOUNDARY,
+                          lambda: storage.writer(max_size=1000))
+    assert list(storage.iter_blobs()) == []
+    leftovers = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert leftovers == []
+
+
+def test_only_one_file_per_request(storage):
+    with pytest.raises(MultipartError):
+        receive_multipart(multipart(('a', b'1', 'a.pdf'), ('b', b'2', 'b.pdf')), BOUNDARY, storage.writer)
+
+
+def test_without_file(storage):
+    assert receive_multipart(multipart(('title', b'x', None)), BOUNDARY, storage.writer) == ({'title': 'x'}, None)
+
+
+def test_open_range_returns_requested_bytes(storage):
+    blob = receive_multipart(multipart(('file', CONTENT, 'a.pdf')), BOUNDARY, storage.writer)[1][0]
+    assert storage.size(blob.digest) == len(CONTENT)
+    assert b''.join(storage.open_range(blob.digest, 10, 19)) == CONTENT[10:20]
+    assert b''.join(storage.open_range(blob.digest, 70000, 80000)) == CONTENT[70000:80001]
+    assert storage.size('0' * 64) is None
+
+
+def test_s3_multipart_upload_assembles_parts(tmp_path):
+    client = LocalS3Client(str(tmp_path))
+    storage = S3Storage(client, 'docs', part_size=32 * 1024)
+    writer = storage.writer()
+    for start in range(0, len(CONTENT), 10000):
+        writer.write(CONTENT[start:start + 10000])
+    assert writer._upload_id is not None and len(writer._parts) == 2
+    blob = writer.commit()
+    assert blob.digest == sha256(CONTENT)
+    body = client.get_object(Bucket='docs', Key=storage.key(blob.digest))['Body']
+    assert body.read() == CONTENT
+    # Ni el objeto temporal ni las partes quedan en el bucket
+    assert [item['Key'] for item in client.list_objects_v2(Bucket='docs')['Contents']] == [storage.key(blob.digest)]
+    assert os.listdir(tmp_path / 'docs' / 'uploads') == []
+
+
+def test_local_s3_get_object_range(tmp_path):
+    client = LocalS3Client(str(tmp_path))
+    client.put_object(Bucket='b', Key='k', Body=b'0123456789')
+    assert client.get_object(Bucket='b', Key='k', Range='bytes=2-5')['Body'].read() == b'2345'
+    assert client.get_object(Bucket='b', Key='k', Range='bytes=7-')['Body'].read() == b'789'
+    response = client.get_object(Bucket='b', Key='k', Range='bytes=8-100')
+    assert response['ContentLength'] == 2 and response['Body'].read() == b'89'
+
+
+def test_purge_keeps_referenced_and_recent_blobs(storage):
+    digests = []
+    for content in (b'uno', b'dos', b'tres'):
+        digests.append(receive_multipart(multipart(('file', content, 'a.pdf')), BOUNDARY, storage.writer)[1][0].digest)
+    assert purge(storage, {digests[0]}, grace_seconds=3600) == 0
+    time.sleep(0.01)
+    assert purge(storage, {digests[0]}, grace_seconds=0) == 2
+    assert [digest for digest, _ in storage.iter_blobs()] == [digests[0]]
@@ -0,0 +1,67 @@
+import io
+import os
+
+import pytest
+
+from image_variants import NotAnImage, VariantCache, render
+
+DIGEST = 'ab' + '0' * 62
+
+
+def write(cache, digest, variant, size, mtime):
+    path = cache.path(digest, variant)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(b'x' * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_path_and_get(tmp_path):
+    cache = VariantCache(str(tmp_path), max_bytes=1000, ext='webp', touch_interval=60)
+    assert cache.path(DIGEST, 'card') == os.path.join(str(tmp_path), 'card', 'ab', f'{DIGEST}.webp')
+    assert cache.get(DIGEST, 'card') is None
+    path = write(cache, DIGEST, 'card', 10, mtime=1000)
+    assert cache.get(DIGEST, 'card') == path
+    assert os.path.getmtime(path) > 1000      # Uso renovado: se aleja de la expulsión
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_added_evicts_least_recently_used_down_to_low_watermark(tmp_path):
+    cache = VariantCache(str(tmp_path), max_bytes=1000, ext='webp')
+    paths = [write(cache, f'{i:02d}' + '0' * 62, 'card', 200, mtime=1000 + i) for i in range(5)]
+    with open(os.path.join(os.path.dirname(paths[0]), 'en-curso.tmp'), 'wb') as f:
+        f.write(b'x' * 5000)                  # Un render a medio escribir no cuenta ni se borra
+    cache.added(200)
+    assert cache.evicted == 0 and cache.stats()['estimated_bytes'] == 1000
+    paths.append(write(cache, '05' + '0' * 62, 'card', 200, mtime=2000))
+    cache.added(200)                          # 1200 > 1000: se baja hasta 900
+    assert cache.evicted == 2 and cache.stats()['estimated_bytes'] == 800
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True, True, True]
+    assert os.path.exists(os.path.join(os.path.dirname(paths[0]), 'en-curso.tmp'))
+
+
+def png(width, height):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def test_render_fits_box_without_upscaling(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    dest = str(tmp_path / 'card' / 'ab' / 'x.webp')
+    assert render(png(1200, 600), (480, 360), 'webp', 80, dest) == os.path.getsize(dest)
+    with Image.open(dest) as img:
+        assert img.size == (480, 240) and img.format == 'WEBP'
+    render(png(100, 50), (480, 360), 'jpeg', 80, dest)
+    with Image.open(dest) as img:
+        assert img.size == (100, 50)
+
+
+def test_render_rejects_non_images(tmp_path):
+    pytest.importorskip('PIL')
+    dest = str(tmp_path / 'x.webp')
+    with pytest.raises(NotAnImage):
+        render(b'%PDF-1.4', (160, 120), 'webp', 80, dest)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,95 @@
+import io
+from decimal import Decimal
+
+import importer
+
+
+def records(data, fmt):
+    return list(importer.iter_records(io.BytesIO(data.encode('utf-8')), fmt))
+
+
+def test_csv_rows_are_numbered_after_the_header():
+    rows = records("\ufefffullName,phone\nAna,999\nLuis,888\n", 'csv')
+    assert rows == [(2, {'fullName': 'Ana', 'phone': '999'}), (3, {'fullName': 'Luis', 'phone': '888'})]
+
+
+def test_ndjson_reports_invalid_lines_and_skips_blank_ones():
+    rows = records('{"fullName": "Ana"}\n\nnot json\n[1, 2]\n', 'ndjson')
+    assert rows[0] == (1, {'fullName': 'Ana'})
+    assert rows[1][0] == 3 and rows[1][1]['__error__'].startswith("JSON inválido")
+    assert rows[2] == (4, {'__error__': "Cada línea debe ser un objeto JSON"})
+
+
+def test_valid_client():
+    values, errors = importer.validate_client({'fullName': ' Ana Pérez ', 'phone': '999', 'isOwner': 'no'})
+    assert errors == []
+    assert values == ('Ana Pérez', None, '999', None, 0, None)
+
+
+def test_client_required_fields_and_lengths():
+    _, errors = importer.validate_client({'fullName': 'x' * 101, 'dniRuc': '1' * 21})
+    assert errors == ["fullName excede 100 caracteres", "dniRuc excede 20 caracteres", "phone es obligatorio"]
+
+
+def test_property_defaults_and_normalization():
+    values, errors = importer.validate_property({
+        'title': 'Casa', 'price': '120000.50', 'operation': 'venta', 'agentId': '3', 'ownerDniRuc': '4455',
+    })
+    assert errors == []
+    assert values['price'] == Decimal('120000.50')
+    assert values['operation'] == 'VENTA'
+    assert (values['currency'], values['status'], values['city']) == ('USD', 'DISPONIBLE', 'Ilo')
+    assert values['commissionPct'] == Decimal('3.00')
+    assert (values['agentId'], values['ownerId'], values['exclusive']) == (3, None, 0)
+
+
+def test_property_errors_are_all_reported():
+    _, errors = importer.validate_property({
+        'title': 'Casa', 'price': '-5', 'currency': 'EUR', 'operation': 'PERMUTA', 'agentId': 'uno',
+    })
+    assert errors == [
+        "price no puede ser negativo",
+        "currency debe ser uno de USD, PEN",
+        "operation debe ser uno de VENTA, ALQUILER",
+        "agentId debe ser entero",
+        "ownerId u ownerDniRuc es obligatorio",
+    ]
+
+
+class FakeConnection:
+    def __init__(self):
+        self.inserted = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def executemany(self, sql, rows):
+        self.conn.inserted.append(list(rows))
+
+    def close(self):
+        pass
+
+
+def test_run_import_inserts_valid_rows_per_chunk_and_reports_the_rest():
+    conn = FakeConnection()
+    rows = [(2, {'fullName': 'Ana', 'phone': '1'}), (3, {'fullName': 'Sin teléfono'}),
+            (4, {'fullName': 'Luis', 'phone': '2'}), (5, {'__error__': "JSON inválido"}),
+            (6, {'fullName': 'Eva', 'phone': '3'})]
+    report = importer.run_import(conn, 'clients', rows, chunk_size=2).as_dict()
+    assert [len(chunk) for chunk in conn.inserted] == [2, 1]
+    assert conn.commits == 2
+    assert (report['total_rows'], report['inserted'], report['failed']) == (5, 3, 2)
+    assert report['errors'] == [{'row': 3, 'errors': ["phone es obligatorio"]},
+                                {'row': 5, 'errors': ["JSON inválido"]}]
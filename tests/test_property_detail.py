@@ -0,0 +1,40 @@
+import datetime
+import decimal
+import json
+
+import app as app_module
+
+CREATED = datetime.datetime(2025, 1, 31, 10, 0, 0)
+
+
+def detail_row():
+    # Así llegan las columnas JSON_OBJECT/JSON_ARRAYAGG de sp_Property_Detail
+    return {
+        'id': 7, 'title': 'Casa', 'price': decimal.Decimal('125000.50'), 'createdAt': CREATED,
+        'AgentPhoto': None,
+        'photos': '[]',
+        'documents': '[{"id": 1, "name": "DNI", "uploadedAt": "2025-01-31 10:00:00.000000", "size": 10}]',
+        'socialLogs': '[{"id": 2, "network": "FACEBOOK", "postedAt": "2025-01-31 10:00:00.000000"}]',
+        'sale': '{"id": 3, "finalPrice": 125000.50, "closedAt": null}',
+    }
+
+
+def test_nested_dates_and_amounts_use_the_row_format(monkeypatch):
+    monkeypatch.setattr(app_module, 'execute_procedure', lambda name, args: ([detail_row()], None))
+    prop, error = app_module.fetch_property_detail(7)
+    assert error is None
+    assert prop['documents'][0]['uploadedAt'] == CREATED
+    assert prop['sale']['finalPrice'] == decimal.Decimal('125000.50') and prop['sale']['closedAt'] is None
+
+    with app_module.app.app_context():
+        for date_format in ('http', 'iso'):
+            monkeypatch.setattr(app_module.app.json, 'date_format', date_format)
+            body = json.loads(app_module.app.json.dumps(prop))
+            assert body['documents'][0]['uploadedAt'] == body['createdAt']
+            assert body['socialLogs'][0]['postedAt'] == body['createdAt']
+            assert body['sale']['finalPrice'] == body['price']
+
+
+def test_missing_property(monkeypatch):
+    monkeypatch.setattr(app_module, 'execute_procedure', lambda name, args: ([], None))
+    assert app_module.fetch_property_detail(7) == (None, None)
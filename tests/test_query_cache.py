@@ -0,0 +1,107 @@
+from query_cache import MemoryCacheBackend, QueryCache, make_key
+
+
+class Loader:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result, self.error
+
+
+def test_make_key_depends_on_statement_and_params():
+    assert make_key('query', 'SELECT 1', (1,)) == make_key('query', 'SELECT 1', [1])
+    assert make_key('query', 'SELECT 1', (1,)) != make_key('query', 'SELECT 1', (2,))
+    assert make_key('query', 'SELECT 1', ()) != make_key('proc', 'SELECT 1', ())
+
+
+def test_read_through_returns_copies():
+    cache = QueryCache(MemoryCacheBackend())
+    loader = Loader([{'id': 1}])
+    rows, _ = cache.fetch('k', loader, ttl=60)
+    rows[0]['id'] = 99
+    assert cache.fetch('k', loader, ttl=60) == ([{'id': 1}], None)
+    assert loader.calls == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_invalidate_removes_only_tagged_entries():
+    cache = QueryCache(MemoryCacheBackend())
+    users, client = Loader(['u']), Loader(['c'])
+    cache.fetch('users', users, ttl=60, tags=('users', 'user:5'))
+    cache.fetch('client', client, ttl=60, tags=('client:12',))
+    assert cache.invalidate('user:5') == 1
+    cache.fetch('users', users, ttl=60, tags=('users',))
+    cache.fetch('client', client, ttl=60, tags=('client:12',))
+    assert (users.calls, client.calls) == (2, 1)
+
+
+def test_tags_can_be_computed_from_the_result():
+    cache = QueryCache(MemoryCacheBackend())
+    loader = Loader([{'agentId': 3}])
+    cache.fetch('k', loader, ttl=60, tags=lambda rows: [f"agent:{row['agentId']}" for row in rows])
+    cache.invalidate('agent:3')
+    cache.fetch('k', loader, ttl=60)
+    assert loader.calls == 2
+
+
+def test_errors_are_not_cached():
+    cache = QueryCache(MemoryCacheBackend())
+    loader = Loader(error="sin conexión")
+    assert cache.fetch('k', loader, ttl=60) == (None, "sin conexión")
+    cache.fetch('k', loader, ttl=60)
+    assert loader.calls == 2
+
+
+def test_value_loaded_during_an_invalidation_is_not_stored():
+    backend = MemoryCacheBackend()
+    cache = QueryCache(backend)
+
+    def loader():
+        cache.invalidate('users')   # Una escritura mientras se consultaba la BD
+        return ['viejo'], None
+
+    cache.fetch('k', loader, ttl=60, tags=('users',))
+    assert backend.get('k') is None
+
+
+def test_lru_eviction_by_size():
+    backend = MemoryCacheBackend(max_bytes=200)
+    backend.set('a', b'x' * 90, 60, (), backend.generation())
+    backend.set('b', b'x' * 90, 60, (), backend.generation())
+    backend.get('a')                    # 'b' pasa a ser el menos usado
+    backend.set('c', b'x' * 90, 60, (), backend.generation())
+    assert backend.get('b') is None
+    assert backend.get('a') is not None and backend.get('c') is not None
+    assert backend.evictions == 1
+
+
+def test_expired_entry_is_reloaded():
+    backend = MemoryCacheBackend()
+    cache = QueryCache(backend)
+    loader = Loader(['v'])
+    cache.fetch('k', loader, ttl=-1)
+    cache.fetch('k', loader, ttl=60)
+    assert loader.calls == 2
+
+
+def test_expired_entry_is_served_stale_only_when_allowed():
+    backend = MemoryCacheBackend(stale_ttl=3600)
+    circuit_open = [False]
+    cache = QueryCache(backend, serve_stale=lambda: circuit_open[0])
+    cache.fetch('k', Loader(['viejo']), ttl=-1)
+    failing = Loader(error="circuito abierto")
+    assert cache.fetch('k', failing, ttl=60) == (None, "circuito abierto")
+    circuit_open[0] = True
+    assert cache.fetch('k', failing, ttl=60) == (['viejo'], None)
+    assert cache.stats()['stale_hits'] == 1
+
+
+def test_invalidated_entry_is_never_served_stale():
+    cache = QueryCache(MemoryCacheBackend(stale_ttl=3600), serve_stale=lambda: True)
+    cache.fetch('k', Loader(['viejo']), ttl=-1, tags=('users',))
+    cache.invalidate('users')
+    assert cache.fetch('k', Loader(error="circuito abierto"), ttl=60) == (None, "circuito abierto")
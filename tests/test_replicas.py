@@ -0,0 +1,59 @@
+import time
+
+from replicas import Replica, ReplicaRouter, gtid_subset, parse_gtid_set
+
+A = '3e11fa47-71ca-11e1-9e33-c80aa9429562'
+B = '4f22ab58-82db-22f2-af44-d91bba53a673'
+
+
+def test_parse_gtid_set():
+    assert parse_gtid_set(f'{A}:1-5:7,\n{B.upper()}:3') == {A: ((1, 5), (7, 7)), B: ((3, 3),)}
+    assert parse_gtid_set(f'{A}:1-5:web:1-2') == {A: ((1, 5),), f'{A}:web': ((1, 2),)}
+    assert parse_gtid_set('') is None
+    assert parse_gtid_set(None) is None
+    assert parse_gtid_set('no-es-un-gtid:1') is None
+
+
+def test_gtid_subset():
+    executed = parse_gtid_set(f'{A}:1-100,{B}:1-5')
+    assert gtid_subset(parse_gtid_set(f'{A}:1-100'), executed)
+    assert gtid_subset(parse_gtid_set(f'{A}:50,{B}:5'), executed)
+    assert not gtid_subset(parse_gtid_set(f'{A}:101'), executed)
+    assert not gtid_subset(parse_gtid_set(f'{B}:1-6'), executed)
+    assert not gtid_subset(parse_gtid_set(f'{A}:1-100:web:1'), executed)
+
+
+def replica(name, gtid_executed, lag=0.0):
+    r = Replica(name, pool=None)
+    r.lag = lag
+    r.checked_at = time.time()
+    r.gtid_executed = parse_gtid_set(gtid_executed)
+    return r
+
+
+def test_has_applied_requires_a_verifiable_token():
+    r = replica('r1', f'{A}:1-10')
+    assert r.has_applied(f'{A}:1-10')
+    assert not r.has_applied(f'{A}:11')
+    assert not r.has_applied('')       # Token vacío: la escritura no se pudo confirmar
+    r.gtid_executed = None
+    assert not r.has_applied(f'{A}:1')
+
+
+def test_router_reads_your_writes_from_replicas_that_applied_them():
+    behind, current = replica('r1', f'{A}:1-9'), replica('r2', f'{A}:1-10')
+    router = ReplicaRouter([behind, current])
+    router._ensure_monitor = lambda: None
+    assert router.choose(read_after=f'{A}:10') == (current, None)
+    assert router.choose(read_after=f'{A}:11') == (None, 'read_your_writes')
+    assert router.choose(read_after='') == (None, 'read_your_writes')
+    assert router.eligible(behind) and not router.eligible(behind, f'{A}:10')
+
+
+def test_router_skips_lagging_or_stale_replicas():
+    lagging, stale = replica('r1', f'{A}:1', lag=30), replica('r2', f'{A}:1')
+    stale.checked_at -= 60
+    router = ReplicaRouter([lagging, stale], max_lag=5)
+    router._ensure_monitor = lambda: None
+    assert router.choose() == (None, 'lag')
+    assert router.routed['lag'] == 1
@@ -0,0 +1,101 @@
+import threading
+
+from social_queue import PublishQueue, SocialPublishError
+
+
+class FakeClient:
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    def post(self, network, payload):
+        if network in self.failing:
+            raise SocialPublishError(f"{network}: caída")
+        return f"https://{network.lower()}.test/{payload['propertyId']}"
+
+
+class JobTable:
+    """Como SocialJobs: guarda la última versión y descarta las que llegan tarde."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.writes = []
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def save(self, job):
+        with self.lock:
+            self.writes.append((job['version'], job['status']))
+            current = self.jobs.get(job['id'])
+            if current is None or current['version'] < job['version']:
+                self.jobs[job['id']] = job
+        if job['finishedAt'] is not None:
+            self.done.set()
+
+
+def run_job(client, networks, save_logs=None, table=None):
+    table, logs = table or JobTable(), []
+    queue = PublishQueue(client, save_logs or (lambda rows: logs.extend(rows)), table.save, backoff=0)
+    try:
+        job_id, error = queue.enqueue({'propertyId': 7}, networks)
+        assert error is None
+        assert table.done.wait(5)
+    finally:
+        queue.shutdown()
+    return table.jobs[job_id], logs
+
+
+def test_completed_job_is_saved_with_results_per_network():
+    job, logs = run_job(FakeClient(), ['FACEBOOK', 'INSTAGRAM'])
+    assert job['status'] == 'COMPLETADO'
+    assert {net: res['status'] for net, res in job['results'].items()} == {
+        'FACEBOOK': 'PUBLICADO', 'INSTAGRAM': 'PUBLICADO'}
+    assert sorted(logs) == [(7, 'FACEBOOK', 'https://facebook.test/7'), (7, 'INSTAGRAM', 'https://instagram.test/7')]
+
+
+def test_partial_job_keeps_the_error_and_attempts_of_the_failed_network():
+    job, logs = run_job(FakeClient(failing={'TIKTOK'}), ['FACEBOOK', 'TIKTOK'])
+    assert job['status'] == 'PARCIAL'
+    assert job['results']['TIKTOK'] == {'status': 'FALLIDO', 'attempts': 3, 'error': 'TIKTOK: caída'}
+    assert logs == [(7, 'FACEBOOK', 'https://facebook.test/7')]
+
+
+def test_log_error_marks_the_job():
+    job, _ = run_job(FakeClient(), ['FACEBOOK'], save_logs=lambda rows: "tabla bloqueada")
+    assert job['status'] == 'ERROR_REGISTRO'
+    assert job['error'] == "tabla bloqueada"
+
+
+def test_enqueue_fails_without_publishing_if_the_job_cannot_be_saved():
+    posted = []
+    client = FakeClient()
+    client.post = lambda network, payload: posted.append(network)
+    queue = PublishQueue(client, lambda rows: None, lambda job: "sin conexión")
+    try:
+        assert queue.enqueue({'propertyId': 7}, ['FACEBOOK']) == (None, "sin conexión")
+    finally:
+        queue.shutdown()
+    assert posted == []
+
+
+def test_job_is_written_once_per_transition():
+    table = JobTable()
+    run_job(FakeClient(failing={'TIKTOK'}), ['FACEBOOK', 'INSTAGRAM', 'TIKTOK'], table=table)
+    assert table.writes == [(1, 'EN_PROCESO'), (2, 'PARCIAL')]
+
+
+def test_reset_after_fork_starts_a_new_executor():
+    table = JobTable()
+    queue = PublishQueue(FakeClient(), lambda rows: None, table.save, backoff=0)
+    try:
+        queue.enqueue({'propertyId': 7}, ['FACEBOOK'])
+        assert table.done.wait(5)
+        inherited = queue._executor
+        queue.reset_after_fork()
+        assert queue._executor is None and queue._running == {}
+        table.done.clear()
+        job_id, _ = queue.enqueue({'propertyId': 8}, ['FACEBOOK'])
+        assert table.done.wait(5) and table.jobs[job_id]['status'] == 'COMPLETADO'
+        assert queue._executor is not inherited
+    finally:
+        queue.shutdown()
+        inherited.shutdown()